@@ -0,0 +1,43 @@
+"""
+Declarative acceptance rules for scraped places
+
+A place is processed in stages, and each stage's rules run as soon as the
+fields they read are known:
+
+- "place": after the place page is read (cheap, no extra requests)
+- "email": after the website has been crawled for an email
+
+A place rejected at the "place" stage never has its website crawled.
+"""
+from collections import namedtuple
+from typing import Dict, Iterable, Optional
+
+Rule = namedtuple("Rule", ["stage", "reason", "check"])
+
+STAGES = ("place", "email")
+
+
+def present(value) -> bool:
+    return bool(value) and value != "N/A"
+
+
+# Checked in order within each stage; the first failing rule names the reason
+ACCEPTANCE_RULES = [
+    Rule("place", "missing phone", lambda record: present(record["Phone"])),
+    Rule("place", "no email and no website to crawl",
+         lambda record: present(record["Email"]) or present(record["Website"])),
+    Rule("email", "no email found", lambda record: present(record["Email"])),
+]
+
+
+def rejection_reason(record: Dict, stage: str, rules: Iterable[Rule] = ACCEPTANCE_RULES) -> Optional[str]:
+    """Reason the record fails a stage, or None when it passes"""
+    for rule in rules:
+        if rule.stage == stage and not rule.check(record):
+            return rule.reason
+    return None
+
+
+def skipped_entry(record: Dict, reason: str) -> Dict:
+    """Row for DatabaseManager.insert_skipped_entry"""
+    return {"Position": record.get("position", ""), "Name": record.get("Name", ""), "Reason": reason}
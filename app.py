@@ -1,8 +1,18 @@
+import os
+import json
+import tempfile
 import time
+import uuid
 import pandas as pd
 import streamlit as st
 from urllib.parse import quote
 import logging
+from exporter import EXPORT_FORMATS, ExportWriter
+from jobs import JobWorkerPool, poll_job, submit_job
+from database import DEFAULT_DB_PATH, EXPORT_HEADER, SEARCH_ORDERS, run_sync
+from query_cache import load_results, lookup_query, search_leads
+from metrics import METRICS_WINDOW_SECONDS, load_summaries, render_prometheus
+from validation import validate_frame
 
 # Setup basic logging
 logging.basicConfig(level=logging.INFO)
@@ -84,24 +94,106 @@ def generate_business_data(query):
 # ------------------------------
 # Main search function
 # ------------------------------
-def search_businesses(query, progress_callback=None):
-    """Main function to search for businesses"""
+DISPLAY_COLUMNS = ["Name", "Address", "Phone", "Website", "Email", "Rating"]
+DB_PATH = os.environ.get("SCRAPU_DB", DEFAULT_DB_PATH)
+JOB_WORKERS = int(os.environ.get("SCRAPU_JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = 1.0
+# Longest the UI waits on one job, queue time included
+JOB_WAIT_SECONDS = float(os.environ.get("SCRAPU_JOB_WAIT_MINUTES", "15")) * 60
+CACHE_FRESH_SECONDS = float(os.environ.get("SCRAPU_CACHE_FRESH_HOURS", "6")) * 3600
+CACHE_STALE_SECONDS = float(os.environ.get("SCRAPU_CACHE_STALE_DAYS", "7")) * 86400
+HOT_QUERY_ENTRIES = 256
+SEARCH_PAGE_SIZE = 25
+EXPORT_MIME_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/octet-stream"}
+
+@st.cache_resource
+def get_job_workers():
+    """Background scrape worker processes shared by every browser session
     
-    if progress_callback:
-        progress_callback(f"🔍 Searching for: {query}")
-        time.sleep(1)
-        progress_callback("📊 Analyzing search results...")
-        time.sleep(1)
-        progress_callback("✅ Processing business information...")
-        time.sleep(1)
+    Call start() on the result before relying on it; it replaces workers
+    that died since the last call.
+    """
+    return JobWorkerPool(DB_PATH, concurrency=JOB_WORKERS)
+
+def to_record(row):
+    """Map a businesses table row to the columns shown in the UI"""
+    return {column: row.get(column.lower()) or "N/A" for column in DISPLAY_COLUMNS}
+
+@st.cache_data(max_entries=HOT_QUERY_ENTRIES, show_spinner=False)
+def load_cached_results(query_key, session_id, since):
+    """Records of one cached session; keyed on session id, so a refresh is a new entry"""
+    return [to_record(row) for row in load_results(query_key, since=since, db_path=DB_PATH)]
+
+def prepare_export(session_id, fmt, records):
+    """Write shown results to a temp file; a session's rows are streamed from a DB cursor
+    
+    Results without a session (sample data) are written from `records`.
+    Returns the file path and the number of rows written.
+    """
+    fd, path = tempfile.mkstemp(prefix="business_leads_", suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        if session_id:
+            rows = run_sync(lambda db: db.export(session_id, path, fmt), DB_PATH)
+        else:
+            with ExportWriter(path, EXPORT_HEADER, fmt) as writer:
+                writer.write([[record.get(column, "") for column in EXPORT_HEADER] for record in records])
+            rows = writer.rows_written
+    except Exception:
+        os.remove(path)
+        raise
+    return path, rows
+
+def discard_export():
+    """Delete the temp file of the last prepared download, if any"""
+    export = st.session_state.export
+    st.session_state.export = None
+    if export and os.path.exists(export["path"]):
+        os.remove(export["path"])
+
+def spans_frame(summaries):
+    """Span summaries as a table, biggest share of time first"""
+    columns = ["count", "errors", "total", "mean", "p50", "p95", "max"]
+    if not summaries:
+        return pd.DataFrame(columns=columns)
+    frame = pd.DataFrame.from_dict(summaries, orient="index")[columns]
+    return frame.sort_values("total", ascending=False).round(3)
+
+def iter_job_results(job_id, on_progress=None):
+    """Poll a background job, yielding each business once as it is written
     
-    # Generate appropriate sample data
-    businesses = generate_business_data(query)
+    Raises RuntimeError when the job fails or is still unfinished after
+    JOB_WAIT_SECONDS.
+    """
+    last_id = 0
+    deadline = time.time() + JOB_WAIT_SECONDS
+    while True:
+        get_job_workers().start()  # a worker that died mid-job is replaced and the job requeued
+        state = poll_job(job_id, DB_PATH, after_id=last_id)
+        for row in state["businesses"]:
+            last_id = row["member_id"]
+            yield to_record(row)
+        
+        session = state["session"]
+        if on_progress and session.get("progress"):
+            on_progress(json.loads(session["progress"]))
+        if session.get("status") == "failed":
+            raise RuntimeError(session.get("error") or "Scrape failed")
+        if session.get("status") == "completed":
+            return
+        if time.time() > deadline:
+            raise RuntimeError(f"Job #{job_id} did not finish within {JOB_WAIT_SECONDS / 60:.0f} minutes; "
+                               "its results will be cached if it completes later")
+        time.sleep(JOB_POLL_SECONDS)
+
+def search_businesses(query, use_sample_data=False, on_progress=None, job_id=None):
+    """Yield businesses for a query as soon as each one is found"""
     
-    if progress_callback:
-        progress_callback(f"🎉 Found {len(businesses)} businesses!")
+    if use_sample_data:
+        yield from generate_business_data(query)
+        return
     
-    return businesses
+    yield from iter_job_results(job_id, on_progress=on_progress)
 
 # ------------------------------
 # Streamlit UI
@@ -120,11 +212,28 @@ if 'scraping_complete' not in st.session_state:
     st.session_state.scraping_complete = False
 if 'scraped_data' not in st.session_state:
     st.session_state.scraped_data = []
+if 'owner' not in st.session_state:
+    st.session_state.owner = uuid.uuid4().hex
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
+if 'cache_hit' not in st.session_state:
+    st.session_state.cache_hit = None
+if 'metrics_session' not in st.session_state:
+    st.session_state.metrics_session = None
+if 'job_error' not in st.session_state:
+    st.session_state.job_error = None
+if 'export' not in st.session_state:
+    st.session_state.export = None
+if 'search_cursors' not in st.session_state:
+    st.session_state.search_cursors = [None]
+    st.session_state.search_key = None
 
 # Sidebar for settings
 with st.sidebar:
     st.header("⚙️ Settings")
     query = st.text_input("Search query", "IT services in Delhi", key="query")
+    use_sample_data = st.checkbox("Use sample data", value=False, help="Skip the live Google Maps scrape")
+    force_refresh = st.checkbox("Force fresh scrape", value=False, help="Ignore results cached from earlier searches")
     
     start_btn = st.button("🚀 Find Businesses", key="start_btn", type="primary", use_container_width=True)
     
@@ -136,95 +245,209 @@ with st.sidebar:
     - Software companies in Pune
     """)
 
-# Main content
-if start_btn:
-    st.session_state.scraping_complete = False
-    st.session_state.scraped_data = []
+scrape_tab, search_tab = st.tabs(["🚀 Find new leads", "🗂️ Search stored leads"])
+
+with scrape_tab:
+    # Main content
+    if start_btn:
+        discard_export()
+        st.session_state.job_error = None
+        st.session_state.scraping_complete = False
+        st.session_state.job_id = None
+        st.session_state.cache_hit = None
+        if not use_sample_data:
+            get_job_workers().start()
+            hit = None
+            if not force_refresh:
+                hit = lookup_query(query, owner=st.session_state.owner, db_path=DB_PATH,
+                                   fresh_seconds=CACHE_FRESH_SECONDS, stale_seconds=CACHE_STALE_SECONDS)
+            if hit and hit["status"] != "miss":
+                session = hit["session"]
+                st.session_state.scraped_data = load_cached_results(hit["query_key"], session["id"], session["start_time"])
+                st.session_state.cache_hit = hit
+                st.session_state.metrics_session = session["id"]
+                st.session_state.scraping_complete = True
+            else:
+                # Join an identical search that is already running instead of starting another
+                active_job = hit["active_job"] if hit else None
+                st.session_state.job_id = active_job or submit_job(query, owner=st.session_state.owner, db_path=DB_PATH)
+
+    # A queued job keeps running across reruns; pick its results back up
+    if (start_btn and not st.session_state.cache_hit) or st.session_state.job_id:
+        st.session_state.scraped_data = []
     
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    def update_progress(message, progress=None):
-        status_text.write(f"**{message}**")
-        if progress is not None:
-            progress_bar.progress(progress)
-    
-    # Simulate progress
-    for i in range(5):
-        progress = (i + 1) * 20
-        if i == 0:
-            update_progress("🔄 Initializing search...", progress)
-        elif i == 1:
-            update_progress("🔍 Searching business databases...", progress)
-        elif i == 2:
-            update_progress("📊 Analyzing results...", progress)
-        elif i == 3:
-            update_progress("✅ Processing information...", progress)
-        else:
-            update_progress("🎉 Finalizing results...", progress)
-        time.sleep(0.5)
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        live_table = st.dataframe(pd.DataFrame(columns=DISPLAY_COLUMNS), use_container_width=True, height=400)
     
-    # Perform search
-    scraped_data = search_businesses(
-        query, 
-        progress_callback=update_progress
-    )
+        phase_labels = {
+            "search": "🔍 Opening Google Maps search...",
+            "scroll": "📜 Loading search results...",
+            "details": "📊 Extracting business details...",
+            "done": "✅ Finishing up...",
+        }
     
-    st.session_state.scraped_data = scraped_data
-    st.session_state.scraping_complete = True
+        def update_progress(progress):
+            timings = ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in progress["phase_times"].items())
+            message = phase_labels.get(progress["phase"], progress["phase"])
+            if progress["cards_total"]:
+                message += f" {progress['cards_done']}/{progress['cards_total']} cards, {progress['leads']} leads"
+            if progress.get("network", {}).get("requests_blocked"):
+                message += f", {progress['network']['requests_blocked']} requests blocked"
+            elapsed = f"{progress['elapsed']:.0f}s elapsed"
+            if "budget" in progress:
+                elapsed += f", {progress['budget']['remaining']:.0f}s of budget left"
+            status_text.write(f"**{message}** ({elapsed}{'; ' + timings if timings else ''})")
+            if progress["cards_total"]:
+                progress_bar.progress(min(progress["cards_done"] / progress["cards_total"], 1.0))
     
-    update_progress("✅ Search complete!", 100)
+        if st.session_state.job_id:
+            status_text.write(f"**⏳ Job #{st.session_state.job_id} queued...**")
+        try:
+            for business in search_businesses(query, use_sample_data=use_sample_data and not st.session_state.job_id,
+                                              on_progress=update_progress, job_id=st.session_state.job_id):
+                st.session_state.scraped_data.append(business)
+                live_table.add_rows(pd.DataFrame([business])[DISPLAY_COLUMNS])
+        except RuntimeError as e:
+            # Shown after the rerun below, which would wipe an st.error() made now
+            st.session_state.job_error = str(e)
+    
+        st.session_state.metrics_session = st.session_state.job_id
+        st.session_state.job_id = None
+        st.session_state.scraping_complete = True
+        progress_bar.progress(1.0)
+        status_text.write("**✅ Search complete!**")
+        st.rerun()
 
-# Display results
-if st.session_state.scraping_complete:
-    if st.session_state.scraped_data:
-        df = pd.DataFrame(st.session_state.scraped_data)
+    # Display results
+    if st.session_state.scraping_complete:
+        if st.session_state.job_error:
+            st.error(f"❌ {st.session_state.job_error}")
+        if st.session_state.scraped_data:
+            df = pd.DataFrame(st.session_state.scraped_data)[DISPLAY_COLUMNS]
         
-        st.success(f"🎉 Found {len(df)} businesses!")
+            st.success(f"🎉 Found {len(df)} businesses!")
+            hit = st.session_state.cache_hit
+            if hit:
+                age_minutes = hit["session"]["age_seconds"] / 60
+                note = f"⚡ Served from a search cached {age_minutes:.0f} min ago."
+                if hit["status"] == "stale":
+                    note += " A fresh scrape is running in the background; search again later for updated results."
+                st.caption(note)
         
-        # Display results
-        st.dataframe(df, use_container_width=True, height=400)
+            # Display results
+            st.dataframe(df, use_container_width=True, height=400)
         
-        # Show statistics
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Businesses", len(df))
-        with col2:
-            emails = sum(1 for x in df['Email'] if "@" in str(x))
-            st.metric("Emails Found", emails)
-        with col3:
-            websites = sum(1 for x in df['Website'] if "http" in str(x))
-            st.metric("Websites", websites)
+            # Show statistics
+            checked = validate_frame(df)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Businesses", len(df))
+            with col2:
+                st.metric("Emails Found", int(checked['email'].notna().sum()))
+            with col3:
+                st.metric("Websites", int(checked['website_domain'].notna().sum()))
         
-        # Download button
-        csv = df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download CSV",
-            data=csv,
-            file_name=f"business_leads_{query.replace(' ', '_')}.csv",
-            mime="text/csv",
-            use_container_width=True
-        )
+            # The export file is only written when asked for, then reused across reruns
+            format_col, download_col = st.columns([1, 3])
+            with format_col:
+                export_format = st.selectbox("Export format", EXPORT_FORMATS, key="export_format",
+                                             label_visibility="collapsed")
+            export_key = (st.session_state.metrics_session, export_format, len(st.session_state.scraped_data))
+            export = st.session_state.export
+            with download_col:
+                if export is None or export["key"] != export_key:
+                    if st.button(f"📦 Prepare {export_format.upper()} download", use_container_width=True):
+                        discard_export()
+                        try:
+                            path, rows = prepare_export(st.session_state.metrics_session, export_format,
+                                                        st.session_state.scraped_data)
+                        except RuntimeError as e:
+                            st.error(f"❌ {e}")
+                        else:
+                            st.session_state.export = {"key": export_key, "path": path, "rows": rows}
+                            st.rerun()
+                else:
+                    with open(export["path"], "rb") as export_file:
+                        st.download_button(
+                            label=f"📥 Download {export_format.upper()} ({export['rows']} leads)",
+                            data=export_file,
+                            file_name=f"business_leads_{query.replace(' ', '_')}.{export_format}",
+                            mime=EXPORT_MIME_TYPES[export_format],
+                            use_container_width=True
+                        )
+        elif not st.session_state.job_error:
+            st.warning("No businesses found. Try a different search query.")
+    
+        with st.expander("🩺 Diagnostics"):
+            if st.session_state.metrics_session:
+                # A scrape's own spans are shown however long ago it ran
+                session_spans = spans_frame(
+                    load_summaries(DB_PATH, window_seconds=None, session_id=st.session_state.metrics_session)
+                )
+                st.write(f"**Where scrape #{st.session_state.metrics_session} spent its time** (seconds)")
+                st.bar_chart(session_spans["total"])
+                st.dataframe(session_spans, use_container_width=True)
+            recent = load_summaries(DB_PATH, window_seconds=METRICS_WINDOW_SECONDS)
+            st.write("**All scrapes in the last 24 hours** (seconds)")
+            st.dataframe(spans_frame(recent), use_container_width=True)
+            st.code(render_prometheus(recent), language="text")
+
     else:
-        st.warning("No businesses found. Try a different search query.")
-
-else:
-    st.info("👆 Enter a search query and click 'Find Businesses'")
-    
-    # Quick search examples
-    st.write("### 🚀 Quick Search Examples:")
-    examples = [
-        "IT services in Delhi",
-        "Restaurants in Mumbai",
-        "Hotels in Bangalore", 
-        "Software companies in Pune"
-    ]
-    
-    cols = st.columns(2)
-    for i, example in enumerate(examples):
-        with cols[i % 2]:
-            if st.button(f"🔍 {example}", key=f"btn_{example}"):
-                st.session_state.query = example
+        st.info("👆 Enter a search query and click 'Find Businesses'")
+    
+        # Quick search examples
+        st.write("### 🚀 Quick Search Examples:")
+        examples = [
+            "IT services in Delhi",
+            "Restaurants in Mumbai",
+            "Hotels in Bangalore", 
+            "Software companies in Pune"
+        ]
+    
+        cols = st.columns(2)
+        for i, example in enumerate(examples):
+            with cols[i % 2]:
+                if st.button(f"🔍 {example}", key=f"btn_{example}"):
+                    st.session_state.query = example
+                    st.rerun()
+
+with search_tab:
+    st.write("Search every lead found so far, across all earlier queries")
+    text_col, order_col, score_col = st.columns([3, 1, 1])
+    with text_col:
+        search_text = st.text_input("Search stored leads", placeholder="dentist pune", key="search_text")
+    with order_col:
+        search_order = st.selectbox("Sort by", list(SEARCH_ORDERS), key="search_order")
+    with score_col:
+        min_score = st.number_input("Min quality", min_value=0, max_value=100, value=0, step=10, key="search_min_score")
+    
+    # Cursors of the pages visited so far; a new search starts again at page 1
+    search_key = (search_text, search_order, min_score)
+    if st.session_state.search_key != search_key:
+        st.session_state.search_key = search_key
+        st.session_state.search_cursors = [None]
+    
+    if search_text.strip():
+        page = search_leads(search_text, limit=SEARCH_PAGE_SIZE, cursor=st.session_state.search_cursors[-1],
+                            order=search_order, min_score=min_score or None, db_path=DB_PATH)
+        page_number = len(st.session_state.search_cursors)
+        if page["rows"]:
+            records = [dict(to_record(row), Query=row["query"], Quality=row["data_quality_score"]) for row in page["rows"]]
+            st.dataframe(pd.DataFrame(records), use_container_width=True, hide_index=True)
+        else:
+            st.info("No stored leads match this search.")
+        
+        prev_col, page_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("⬅️ Previous", key="search_prev", disabled=page_number == 1):
+                st.session_state.search_cursors.pop()
+                st.rerun()
+        with page_col:
+            st.caption(f"Page {page_number}, {len(page['rows'])} leads")
+        with next_col:
+            if st.button("Next ➡️", key="search_next", disabled=page["next_cursor"] is None):
+                st.session_state.search_cursors.append(page["next_cursor"])
                 st.rerun()
 
 # Add information section
@@ -237,10 +460,10 @@ with st.expander("ℹ️ About this tool"):
     **Features:**
     - Search for businesses by type and location
     - View contact information (phone, email, website)
-    - Download results as CSV
+    - Download results as CSV, NDJSON or Parquet
     - Clean, professional interface
     
-    **Current Mode:** Demonstration with sample data
+    **Current Mode:** Live Google Maps search, results stream in as they are found (sample data available from the sidebar)
     """)
 
 st.markdown("---")
@@ -0,0 +1,267 @@
+"""
+Headless batch scraping of many queries into the leads database
+
+Usage: python batch.py queries.jsonl [--db leads.db] [--concurrency 2]
+
+The query file is JSONL (objects with a "query" field, or bare JSON
+strings), CSV (a "query" column, else the first column) or plain text
+with one query per line. Queries that already have a completed session
+with results are skipped, so re-running the same file after a crash
+resumes it; failed and empty queries run again.
+Places scraped in the last --refresh-days days, by any query, are
+passed over, so daily --refresh runs spend their time on new listings.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+from database import DEFAULT_DB_PATH, DatabaseManager, normalize_query
+from metrics import REGISTRY, Tracer
+from place_index import KNOWN_PLACE_REFRESH_DAYS, PlaceIndex
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = 2
+BATCH_OWNER = "batch"
+
+
+def read_queries(path: str) -> List[str]:
+    """Queries from a JSONL, CSV or text file, in order, without repeats"""
+    extension = os.path.splitext(path)[1].lower()
+    queries: List[str] = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if extension == ".csv":
+            rows = list(csv.reader(f))
+            header = [name.strip().lower() for name in rows[0]] if rows else []
+            column = 0
+            if "query" in header:
+                column = header.index("query")
+                rows = rows[1:]
+            queries.extend(row[column] for row in rows if len(row) > column)
+        elif extension in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    queries.append(entry["query"] if isinstance(entry, dict) else str(entry))
+        else:
+            queries.extend(line for line in f if not line.lstrip().startswith("#"))
+
+    unique, seen = [], set()
+    for query in queries:
+        key = normalize_query(query)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(query.strip())
+    return unique
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def run_query(db: DatabaseManager, query: str, scrape_kwargs: Dict) -> Dict:
+    """Scrape one query into its own session; returns its stats"""
+    # Imported here so --help and file parsing work without Selenium
+    from scraper import get_email_cache, scrape_google_maps
+
+    session_id = await db.create_session(query, 1)
+    await db.update_session(session_id, owner=BATCH_OWNER)
+    tracer = Tracer()
+    skipped: List[Dict] = []
+    known: List[Dict] = []
+    linked = 0
+    start = time.time()
+    try:
+        records = await asyncio.to_thread(
+            scrape_google_maps, query,
+            logger=lambda message: logger.info(f"[{query}] {message}"),
+            tracer=tracer,
+            on_skip=skipped.append,
+            on_known=known.append,
+            **scrape_kwargs,
+        )
+        # Queries share one DatabaseManager, so writes are timed here rather
+        # than through db.tracer
+        with tracer.span("db_write", rows=len(records)):
+            for record in records:
+                await db.insert_business(dict(record, query=query), session_id)
+            for entry in skipped:
+                await db.insert_skipped_entry(entry, session_id)
+            # Places passed over as known still belong to this session's results
+            linked = await db.link_known_places(session_id, query, known)
+            await db.end_session(session_id, status="completed",
+                                 total_businesses=len(records) + linked, successful_scrapes=len(records))
+        status = "completed"
+    except Exception as e:
+        logger.exception(f"Query '{query}' failed")
+        await db.end_session(session_id, status="failed", error=str(e))
+        records, status = [], "failed"
+    known_places = scrape_kwargs.get("known_places")
+    if known_places is not None:
+        try:
+            await known_places.save(db)
+        except Exception as e:
+            logger.warning(f"Could not save known places for '{query}': {e}")
+    try:
+        await get_email_cache().persist(db)
+    except Exception as e:
+        logger.warning(f"Could not save the email cache for '{query}': {e}")
+    try:
+        await db.save_spans(session_id, tracer.spans())
+    except Exception as e:
+        logger.warning(f"Could not save metrics for '{query}': {e}")
+    seconds = time.time() - start
+    logger.info(f"{status}: '{query}' -> {len(records)} leads, {linked} known places in {seconds:.1f}s")
+    return {"query": query, "status": status, "leads": len(records), "seconds": seconds}
+
+
+async def run_batch(
+    queries: Sequence[str],
+    db_path: str = DEFAULT_DB_PATH,
+    concurrency: int = BATCH_CONCURRENCY,
+    refresh: bool = False,
+    workers: Optional[int] = None,
+    max_cards: Optional[int] = None,
+    budget_seconds: Optional[float] = None,
+    target_leads: Optional[int] = None,
+    refresh_days: Optional[float] = KNOWN_PLACE_REFRESH_DAYS,
+) -> Dict:
+    """Scrape queries `concurrency` at a time and return a throughput summary
+
+    Places scraped within `refresh_days` are not opened again; None
+    re-opens every place.
+    """
+    from driver_pool import DriverPool
+    from scraper import (
+        DETAIL_WORKERS, DRIVER_MAX_PAGES, DRIVER_MAX_RSS_MB, DRIVER_WATCHDOG_SECONDS, get_email_cache, setup_driver,
+    )
+
+    concurrency = max(1, concurrency)
+    # Split the detail workers between concurrent queries; each query also
+    # holds one driver for its search page.
+    workers = workers or max(1, DETAIL_WORKERS // concurrency)
+    pool = DriverPool(
+        setup_driver, size=concurrency, max_size=concurrency * (workers + 1),
+        max_pages=DRIVER_MAX_PAGES, max_rss_mb=DRIVER_MAX_RSS_MB, watchdog_seconds=DRIVER_WATCHDOG_SECONDS,
+    )
+    scrape_kwargs = {"pool": pool, "workers": workers}
+    if max_cards:
+        scrape_kwargs["max_cards"] = max_cards
+    if budget_seconds:
+        scrape_kwargs["budget_seconds"] = budget_seconds
+    if target_leads:
+        scrape_kwargs["target_leads"] = target_leads
+
+    results: List[Dict] = []
+    skipped = 0
+    writes: Dict = {}
+    start = time.time()
+    try:
+        async with DatabaseManager(db_path) as db:
+            interrupted = await db.interrupt_sessions(BATCH_OWNER)
+            if interrupted:
+                logger.info(f"Marked {interrupted} sessions from an earlier run as interrupted")
+            if refresh_days is not None:
+                scrape_kwargs["known_places"] = await PlaceIndex.load(db, refresh_days)
+            await get_email_cache().load(db)
+
+            pending = []
+            for query in queries:
+                if not refresh and await db.find_latest_session(query):
+                    skipped += 1
+                    continue
+                pending.append(query)
+            logger.info(f"{len(pending)} queries to run, {skipped} already completed")
+
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def bounded(query: str):
+                async with semaphore:
+                    results.append(await run_query(db, query, scrape_kwargs))
+
+            await asyncio.gather(*(bounded(query) for query in pending))
+        writes = db.flush_stats()  # after close(), so the final flush is counted
+    finally:
+        drivers = pool.stats()
+        pool.close()
+
+    elapsed = time.time() - start
+    minutes = elapsed / 60 if elapsed else 0
+    latencies = [result["seconds"] for result in results]
+    leads = sum(result["leads"] for result in results)
+    return {
+        "queries": len(results),
+        "skipped": skipped,
+        "failed": sum(1 for result in results if result["status"] == "failed"),
+        "leads": leads,
+        "elapsed": elapsed,
+        "queries_per_minute": len(results) / minutes if minutes else 0.0,
+        "leads_per_minute": leads / minutes if minutes else 0.0,
+        "p50_seconds": percentile(latencies, 50),
+        "p95_seconds": percentile(latencies, 95),
+        "spans": REGISTRY.snapshot(),
+        "drivers": drivers,
+        "writes": writes,
+    }
+
+
+def format_summary(summary: Dict) -> str:
+    slowest = sorted(summary.get("spans", {}).items(), key=lambda item: -item[1]["total"])[:5]
+    drivers = summary.get("drivers", {})
+    writes = summary.get("writes", {})
+    recycled = ", ".join(f"{count} for {reason}" for reason, count in drivers.get("recycled", {}).items())
+    return "\n".join([
+        f"Queries run:     {summary['queries']} ({summary['failed']} failed, {summary['skipped']} skipped as completed)",
+        f"Leads found:     {summary['leads']}",
+        f"Elapsed:         {summary['elapsed']:.1f}s",
+        f"Throughput:      {summary['queries_per_minute']:.2f} queries/min, {summary['leads_per_minute']:.1f} leads/min",
+        f"Query latency:   p50 {summary['p50_seconds']:.1f}s, p95 {summary['p95_seconds']:.1f}s",
+        f"Drivers:         {drivers.get('created', 0)} live at the end, recycled {recycled or 'none'}, "
+        f"{drivers.get('reaped', 0)} zombies reaped, {drivers.get('orphans_killed', 0)} orphans killed",
+        f"DB writes:       {writes.get('rows_flushed', 0)} rows in {writes.get('flushes', 0)} flushes, "
+        f"{writes.get('rows_per_second', 0.0):.0f} rows/s while flushing, {writes.get('failed_flushes', 0)} failed",
+    ] + [
+        f"  {name:<16} {s['total']:.1f}s total over {s['count']} spans (p95 {s['p95']:.2f}s)"
+        for name, s in slowest
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape a file of queries into the leads database")
+    parser.add_argument("queries", help="JSONL, CSV or text file of search queries")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="queries scraped at once")
+    parser.add_argument("--workers", type=int, default=None, help="detail workers per query")
+    parser.add_argument("--max-cards", type=int, default=None, help="place cards per query")
+    parser.add_argument("--budget", type=float, default=None, help="seconds per query")
+    parser.add_argument("--target-leads", type=int, default=None, help="stop a query after this many leads")
+    parser.add_argument("--refresh", action="store_true", help="re-run queries that already completed")
+    parser.add_argument("--refresh-days", type=float, default=KNOWN_PLACE_REFRESH_DAYS,
+                        help="re-open places last scraped more than this many days ago")
+    parser.add_argument("--all-places", action="store_true", help="re-open every place, known or not")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    queries = read_queries(args.queries)
+    summary = asyncio.run(run_batch(
+        queries, db_path=args.db, concurrency=args.concurrency, refresh=args.refresh,
+        workers=args.workers, max_cards=args.max_cards,
+        budget_seconds=args.budget, target_leads=args.target_leads,
+        refresh_days=None if args.all_places else args.refresh_days,
+    ))
+    print(format_summary(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark: raw-HTML email extraction vs. the BeautifulSoup get_text path
+
+Usage: python benchmarks/bench_email_extraction.py [--repeat N]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_extraction import best_email  # noqa: E402
+
+
+def legacy_extract(page: str) -> str:
+    """The original per-page path from extract_emails_from_website"""
+    email_pattern = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+    found_emails = set(email_pattern.findall(BeautifulSoup(page, "html.parser").get_text()))
+    return list(found_emails)[0] if found_emails else "N/A"
+
+
+def make_page(blocks: int) -> str:
+    """Synthetic business homepage with nav, scripts and a footer email"""
+    block = (
+        '<div class="section"><h2>Our services</h2><p>We have served the community for years. '
+        'Call us or drop by the office.</p><img src="/img/team@2x.png" alt="team">'
+        '<ul><li><a href="/about">About</a></li><li><a href="/contact">Contact</a></li></ul>'
+        '<script>window.dataLayer = window.dataLayer || []; dataLayer.push({"event": "view"});</script></div>\n'
+    )
+    footer = '<footer><a href="mailto:info@acme-plumbing.com">info@acme-plumbing.com</a></footer>'
+    return "<html><head><title>Acme</title></head><body>" + block * blocks + footer + "</body></html>"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'page size':>12} {'legacy ms':>12} {'raw ms':>12} {'speedup':>9}")
+    for blocks in (10, 100, 1000):
+        page = make_page(blocks)
+        page_bytes = page.encode("utf-8")
+        number = max(1, 2000 // blocks)
+        legacy = min(timeit.repeat(lambda: legacy_extract(page), number=number, repeat=args.repeat)) / number
+        raw = min(timeit.repeat(lambda: best_email([page_bytes], "https://acme-plumbing.com"), number=number, repeat=args.repeat)) / number
+        print(f"{len(page_bytes):>10} B {legacy * 1000:>12.3f} {raw * 1000:>12.3f} {legacy / raw:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
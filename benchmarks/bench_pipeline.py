@@ -0,0 +1,183 @@
+"""
+Offline throughput benchmark: scraper, email harvester and DB writes against local fixtures
+
+Usage: python benchmarks/bench_pipeline.py [--places 200] [--parts harvester,db,scraper] [--json]
+
+The scraper part needs Chrome; it is reported as skipped when no browser
+can be started. Compare runs on the same machine to catch regressions.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture_server import FixtureServer  # noqa: E402
+
+PARTS = ("harvester", "db", "scraper")
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of its reaped children (e.g. Chrome)"""
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 / 1024 / 1024 if sys.platform == "darwin" else 1 / 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+def bench_harvester(server: FixtureServer, concurrency: int, per_host: int) -> Dict:
+    from email_harvester import EmailHarvester
+
+    sites = [place["website"] for place in server.places if place["website"]]
+    harvester = EmailHarvester(max_concurrency=concurrency, per_host_limit=per_host)
+    start = time.perf_counter()
+    try:
+        futures = [harvester.submit(site) for site in sites]
+        emails = sum(1 for future in futures if "@" in future.result())
+    finally:
+        harvester.close()
+    seconds = time.perf_counter() - start
+    expected = sum(1 for place in server.places if place["website"] and place["email"])
+    return {
+        "sites": len(sites),
+        "emails": emails,
+        "expected_emails": expected,
+        "seconds": seconds,
+        "sites_per_sec": len(sites) / seconds,
+        "emails_per_sec": emails / seconds,
+    }
+
+
+def bench_db(server: FixtureServer, rows: int, batch_size: int) -> Dict:
+    from database import DatabaseManager
+
+    places = server.places
+    records = [
+        {
+            "Name": f"{places[i % len(places)]['name']} #{i}",
+            "Address": places[i % len(places)]["address"],
+            "Phone": places[i % len(places)]["phone"] or "N/A",
+            "Website": places[i % len(places)]["website"] or "N/A",
+            "Email": places[i % len(places)]["email"] or "N/A",
+            "Rating": places[i % len(places)]["rating"],
+            "query": "fixture benchmark",
+            "position": i + 1,
+        }
+        for i in range(rows)
+    ]
+
+    async def run(path: str) -> Tuple[float, Dict]:
+        async with DatabaseManager(path, batch_size=batch_size) as db:
+            session_id = await db.create_session("fixture benchmark", 1)
+            start = time.perf_counter()
+            for record in records:
+                await db.insert_business(record, session_id)
+            await db.end_session(session_id, total_businesses=rows)
+            return time.perf_counter() - start, db.flush_stats()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seconds, writes = asyncio.run(run(os.path.join(tmp, "bench.db")))
+    return {
+        "rows": rows, "batch_size": batch_size, "seconds": seconds, "rows_per_sec": rows / seconds,
+        "flushes": writes["flushes"], "flush_rows_per_sec": writes["rows_per_second"],
+    }
+
+
+def bench_scraper(server: FixtureServer, workers: int, max_cards: int) -> Dict:
+    try:
+        import scraper
+    except ImportError as e:
+        return {"skipped": f"scraper dependencies missing: {e}"}
+
+    scraper.MAPS_BASE_URL = server.maps_base_url
+    progress: Dict = {}
+    start = time.perf_counter()
+    try:
+        leads = scraper.scrape_google_maps(
+            "fixture benchmark", logger=lambda message: None, workers=workers,
+            max_cards=max_cards, on_progress=progress.update,
+        )
+    except Exception as e:
+        return {"skipped": f"could not run a browser: {e}"}
+    finally:
+        scraper.shutdown_email_harvester()
+        scraper.shutdown_driver_pool()
+    seconds = time.perf_counter() - start
+    if not progress.get("cards_total"):
+        return {"skipped": "no cards scraped (is Chrome installed?)"}
+    cards = progress.get("cards_done", 0)
+    emails = sum(1 for lead in leads if "@" in str(lead["Email"]))
+    return {
+        "cards": cards,
+        "leads": len(leads),
+        "expected_leads": min(server.expected_leads(), max_cards),
+        "seconds": seconds,
+        "cards_per_sec": cards / seconds,
+        "emails_per_sec": emails / seconds,
+        "phase_times": progress.get("phase_times", {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--places", type=int, default=200, help="synthetic places served")
+    parser.add_argument("--parts", default=",".join(PARTS), help="comma-separated subset of " + ", ".join(PARTS))
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every fixture response")
+    parser.add_argument("--harvest-concurrency", type=int, default=16)
+    parser.add_argument("--harvest-per-host", type=int, default=2)
+    parser.add_argument("--db-rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4, help="scraper detail workers")
+    parser.add_argument("--max-cards", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    parts = [part.strip() for part in args.parts.split(",") if part.strip()]
+    unknown = set(parts) - set(PARTS)
+    if unknown:
+        parser.error(f"unknown parts: {', '.join(sorted(unknown))}")
+
+    results: Dict[str, Dict] = {}
+    with FixtureServer(places=args.places, latency_ms=args.latency_ms) as server:
+        if "harvester" in parts:
+            results["harvester"] = bench_harvester(server, args.harvest_concurrency, args.harvest_per_host)
+        if "db" in parts:
+            results["db"] = bench_db(server, args.db_rows, args.batch_size)
+        if "scraper" in parts:
+            results["scraper"] = bench_scraper(server, args.workers, args.max_cards)
+        results["fixture_requests"] = {"count": server.requests}
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    if "harvester" in results:
+        r = results["harvester"]
+        print(f"harvester  {r['sites']} sites in {r['seconds']:.2f}s: {r['sites_per_sec']:.1f} sites/s, "
+              f"{r['emails_per_sec']:.1f} emails/s ({r['emails']}/{r['expected_emails']} found)")
+    if "db" in results:
+        r = results["db"]
+        print(f"db         {r['rows']} rows in {r['seconds']:.2f}s: {r['rows_per_sec']:.0f} rows/s "
+              f"(batch_size {r['batch_size']}; {r['flushes']} flushes at {r['flush_rows_per_sec']:.0f} rows/s)")
+    if "scraper" in results:
+        r = results["scraper"]
+        if "skipped" in r:
+            print(f"scraper    skipped: {r['skipped']}")
+        else:
+            print(f"scraper    {r['cards']} cards in {r['seconds']:.2f}s: {r['cards_per_sec']:.2f} cards/s, "
+                  f"{r['emails_per_sec']:.2f} emails/s ({r['leads']}/{r['expected_leads']} leads)")
+    rss = results["peak_rss_mb"]
+    print(f"peak RSS   {rss['self']:.0f} MB (this process), {rss['children']:.0f} MB (largest child)")
+
+
+if __name__ == "__main__":
+    main()
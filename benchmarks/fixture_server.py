@@ -0,0 +1,239 @@
+"""
+Local fixture server with synthetic Google Maps and business website pages
+
+Serves a Maps-like search feed that grows as it is scrolled, place pages
+with the selectors in extractors.PLACE_SELECTORS, and one website (plus
+contact page) per business. Everything is generated from a seed, so runs
+are repeatable.
+
+Usage: python benchmarks/fixture_server.py [--places 200] [--port 8765]
+       SCRAPU_MAPS_BASE_URL=http://127.0.0.1:8765/maps streamlit run app.py
+"""
+import argparse
+import html
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import quote, unquote
+
+FEED_PAGE_SIZE = 20
+FEED_LOAD_DELAY_MS = 150
+
+_FEED_PAGE = """<!doctype html>
+<html><head><title>{title} - Google Maps</title></head>
+<body>
+<div role="feed" aria-label="Results for {title}" style="height:700px;overflow-y:auto"></div>
+<script>
+const places = {places};
+const feed = document.querySelector('div[role="feed"]');
+let shown = 0, loading = false;
+function more() {{
+    const end = Math.min(shown + {page_size}, places.length);
+    for (let i = shown; i < end; i++) {{
+        const card = document.createElement('div');
+        card.className = 'Nv2PK';
+        card.setAttribute('role', 'article');
+        card.style.height = '120px';
+        const link = document.createElement('a');
+        link.href = places[i].href;
+        link.setAttribute('aria-label', places[i].name);
+        link.textContent = places[i].name;
+        const stars = document.createElement('span');
+        stars.setAttribute('role', 'img');
+        stars.setAttribute('aria-label', places[i].rating + ' stars');
+        card.append(link, stars);
+        feed.appendChild(card);
+    }}
+    shown = end;
+    loading = false;
+}}
+more();
+feed.addEventListener('scroll', () => {{
+    if (!loading && shown < places.length && feed.scrollTop + feed.clientHeight >= feed.scrollHeight - 10) {{
+        loading = true;
+        setTimeout(more, {delay});
+    }}
+}});
+</script>
+</body></html>
+"""
+
+_PLACE_PAGE = """<!doctype html>
+<html><head><title>{name} - Google Maps</title></head>
+<body><div role="main">
+<h1 class="DUwDvf">{name}</h1>
+<span aria-label="{rating} star rating">{rating}</span>
+<button aria-label="Address: {address}">{address}</button>
+{phone}
+{website}
+</div></body></html>
+"""
+
+_SITE_PAGE = """<!doctype html>
+<html><head><title>{title}</title><link rel="stylesheet" href="/static/site.css"></head>
+<body>
+<nav><a href="./">Home</a> <a href="contact">Contact</a></nav>
+{filler}
+<footer>{footer}</footer>
+</body></html>
+"""
+
+
+class FixtureServer:
+    """Threaded HTTP server for synthetic places; `url` is set once started
+
+    Each place i is dict(name, address, phone, rating, website, email,
+    email_page). Websites are served on distinct 127.x.y.z hosts on Linux,
+    so per-host limits in the harvester behave as they would on the web.
+    """
+
+    def __init__(
+        self,
+        places: int = 200,
+        port: int = 0,
+        latency_ms: float = 0,
+        seed: int = 7,
+        website_ratio: float = 0.85,
+        phone_ratio: float = 0.9,
+        email_ratio: float = 0.7,
+        distinct_hosts: Optional[bool] = None,
+    ):
+        self.latency = latency_ms / 1000.0
+        self.distinct_hosts = sys.platform.startswith("linux") if distinct_hosts is None else distinct_hosts
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("0.0.0.0", port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.maps_base_url = f"{self.url}/maps"
+        self._thread: Optional[threading.Thread] = None
+
+        rng = random.Random(seed)
+        self.places: List[Dict] = []
+        for i in range(places):
+            has_email = rng.random() < email_ratio
+            self.places.append({
+                "name": f"Fixture Business {i}",
+                "address": f"{rng.randint(1, 999)} Example Road, Testville",
+                "phone": f"+1 555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}" if rng.random() < phone_ratio else None,
+                "rating": f"{rng.uniform(3, 5):.1f}",
+                "website": self.site_url(i) if rng.random() < website_ratio else None,
+                "email": f"info@business{i}.test" if has_email else None,
+                "email_page": rng.choice(["home", "contact"]) if has_email else None,
+            })
+
+    def site_url(self, index: int) -> str:
+        host = f"127.{(index // 250) % 250}.{index % 250 + 1}.1" if self.distinct_hosts else "127.0.0.1"
+        return f"http://{host}:{self.port}/site/{index}/"
+
+    def place_href(self, index: int) -> str:
+        name = quote(self.places[index]["name"].replace(" ", "+"), safe="+")
+        return f"{self.url}/maps/place/{name}/data=!4m2!3m1!1s0x{index:x}:0x{index * 7919:x}"
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def expected_leads(self) -> int:
+        """Places the scraper should keep: a phone and a findable email"""
+        return sum(1 for place in self.places if place["phone"] and place["website"] and place["email"])
+
+    def render(self, path: str) -> Optional[bytes]:
+        """Body for a request path, or None for 404"""
+        parts = [unquote(part) for part in path.split("?")[0].strip("/").split("/")]
+        if parts[:2] == ["maps", "search"] and len(parts) >= 3:
+            feed = [{"href": self.place_href(i), "name": place["name"], "rating": place["rating"]}
+                    for i, place in enumerate(self.places)]
+            return _FEED_PAGE.format(
+                title=html.escape(parts[2]), places=json.dumps(feed),
+                page_size=FEED_PAGE_SIZE, delay=FEED_LOAD_DELAY_MS,
+            ).encode("utf-8")
+        if parts[:2] == ["maps", "place"] and len(parts) >= 4:
+            index = int(parts[3].rsplit("1s0x", 1)[-1].split(":")[0], 16)
+            place = self.places[index]
+            phone = f'<button aria-label="Phone: {place["phone"]}">{place["phone"]}</button>' if place["phone"] else ""
+            website = (f'<a data-tooltip="Open website" href="{place["website"]}">Website</a>'
+                       if place["website"] else "")
+            return _PLACE_PAGE.format(name=html.escape(place["name"]), rating=place["rating"],
+                                      address=html.escape(place["address"]), phone=phone,
+                                      website=website).encode("utf-8")
+        if parts[0] == "site" and len(parts) >= 2 and parts[1].isdigit():
+            index = int(parts[1])
+            place = self.places[index]
+            page = "contact" if len(parts) >= 3 and parts[2] == "contact" else "home"
+            footer = ""
+            if place["email"] and place["email_page"] == page:
+                footer = f'<a href="mailto:{place["email"]}">{place["email"]}</a>'
+            filler = "\n".join(
+                f"<section><h2>Service {n}</h2><p>{place['name']} has served Testville since {1990 + n}.</p></section>"
+                for n in range(30)
+            )
+            return _SITE_PAGE.format(title=html.escape(place["name"]), filler=filler, footer=footer).encode("utf-8")
+        if parts[0] == "static":
+            return b"body { font-family: sans-serif; }"
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                try:
+                    body = server.render(self.path)
+                except (IndexError, ValueError):
+                    body = None
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/css" if self.path.startswith("/static/") else "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic Maps and business website pages")
+    parser.add_argument("--places", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    with FixtureServer(places=args.places, port=args.port, latency_ms=args.latency_ms) as server:
+        print(f"Serving {args.places} places; set SCRAPU_MAPS_BASE_URL={server.maps_base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
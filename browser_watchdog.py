@@ -0,0 +1,214 @@
+"""
+Memory and process supervision for pooled Chrome browsers
+
+Chrome's memory grows over a long session, so the driver pool recycles a
+browser once it has served `max_pages` pages or its process tree uses
+more than `max_rss_mb`. Memory is the proportional set size (PSS) of the
+chromedriver process and everything below it, read from /proc, so pages
+shared between Chrome's processes count once in total rather than once
+per process. The page's JS heap from CDP Performance.getMetrics is the
+fallback where /proc is unavailable.
+
+The watchdog also reaps exited child processes and kills browsers left
+behind by a crashed chromedriver or a pool that quit without cleaning up.
+"""
+import logging
+import os
+import signal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PREFIX = "scrapu-chrome-"  # DriverPool's temporary profile directories
+_PROC = "/proc"
+
+
+def _page_size() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return 4096
+
+
+def process_table() -> Dict[int, Tuple[int, str]]:
+    """pid -> (parent pid, state letter) for every process in /proc; empty elsewhere"""
+    table: Dict[int, Tuple[int, str]] = {}
+    try:
+        entries = os.listdir(_PROC)
+    except OSError:
+        return table
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"{_PROC}/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces and parentheses; fields follow the last ")"
+        fields = stat[stat.rfind(")") + 2:].split()
+        if len(fields) >= 2:
+            table[int(entry)] = (int(fields[1]), fields[0])
+    return table
+
+
+def process_tree(root_pid: int, table: Optional[Dict[int, Tuple[int, str]]] = None) -> List[int]:
+    """root_pid and all of its descendants"""
+    table = process_table() if table is None else table
+    children: Dict[int, List[int]] = {}
+    for pid, (ppid, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    tree, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        if pid in table:
+            tree.append(pid)
+            stack.extend(children.get(pid, ()))
+    return tree
+
+
+def rss_bytes(pids: Iterable[int]) -> int:
+    """Summed resident set size; pages shared between the processes count once per process"""
+    total = 0
+    page_size = _page_size()
+    for pid in pids:
+        try:
+            with open(f"{_PROC}/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def pss_bytes(pids: Iterable[int]) -> int:
+    """Summed proportional set size; shared pages are split between the processes mapping them
+
+    Falls back to a process's RSS where /proc/<pid>/smaps_rollup is
+    missing (kernels before 4.14).
+    """
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"{_PROC}/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except FileNotFoundError:
+            total += rss_bytes([pid])
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def driver_pid(driver) -> Optional[int]:
+    """pid of the chromedriver process behind a Selenium driver"""
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+def js_heap_bytes(driver) -> Optional[int]:
+    """Current page's JS heap from CDP Performance.getMetrics"""
+    try:
+        driver.execute_cdp_cmd("Performance.enable", {})
+        metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    except Exception:
+        return None
+    values = {metric["name"]: metric["value"] for metric in metrics}
+    heap = values.get("JSHeapTotalSize")
+    return int(heap) if heap is not None else None
+
+
+def browser_memory(driver) -> Dict:
+    """pss_bytes of the browser's process tree (or None), js_heap_bytes, processes and tabs"""
+    memory = {"pss_bytes": None, "js_heap_bytes": None, "processes": 0, "tabs": None}
+    pid = driver_pid(driver)
+    if pid is not None:
+        tree = process_tree(pid)
+        if tree:
+            memory["processes"] = len(tree)
+            memory["pss_bytes"] = pss_bytes(tree)
+    if memory["pss_bytes"] is None:
+        memory["js_heap_bytes"] = js_heap_bytes(driver)
+    try:
+        memory["tabs"] = len(driver.window_handles)
+    except Exception:
+        pass
+    return memory
+
+
+def _command_name(pid: int) -> str:
+    try:
+        with open(f"{_PROC}/{pid}/comm") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def reap_children() -> int:
+    """Collect exit statuses of finished chrome/chromedriver children so they do not linger as zombies
+
+    Other children (e.g. multiprocessing workers) are left for their
+    owners to wait on.
+    """
+    reaped = 0
+    table = process_table()
+    me = os.getpid()
+    for pid, (ppid, state) in table.items():
+        if ppid != me or state != "Z" or "chrome" not in _command_name(pid).lower():
+            continue
+        try:
+            if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                reaped += 1
+        except ChildProcessError:
+            continue
+    return reaped
+
+
+def _profile_dir(pid: int) -> Optional[str]:
+    """The --user-data-dir of a pool browser process, or None for anything else"""
+    try:
+        with open(f"{_PROC}/{pid}/cmdline", "rb") as f:
+            args = f.read().decode("utf-8", "replace").split("\0")
+    except OSError:
+        return None
+    for arg in args:
+        if arg.startswith("--user-data-dir=") and PROFILE_PREFIX in arg:
+            return arg.split("=", 1)[1]
+    return None
+
+
+def kill_orphan_browsers(live_profiles: Set[str] = frozenset()) -> int:
+    """Kill pool browsers whose chromedriver is gone or whose profile was removed
+
+    A browser counts as orphaned when it was re-parented to init (its
+    chromedriver died) or its profile directory no longer exists (its
+    pool quit it); browsers using one of `live_profiles` are never touched.
+    Only processes owned by this user are considered.
+    """
+    killed = 0
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    table = process_table()
+    for pid, (ppid, state) in table.items():
+        if state == "Z":
+            continue
+        profile = _profile_dir(pid)
+        if profile is None or profile in live_profiles:
+            continue
+        if uid is not None:
+            try:
+                if os.stat(f"{_PROC}/{pid}").st_uid != uid:
+                    continue
+            except OSError:
+                continue
+        if ppid != 1 and os.path.isdir(profile):
+            continue
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+            logger.warning(f"Killed orphaned browser process {pid} ({profile})")
+        except OSError:
+            continue
+    return killed
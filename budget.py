@@ -0,0 +1,116 @@
+"""
+Time-budget scheduling for one Google Maps scrape
+
+A scrape gets a total time budget and, optionally, a target lead count.
+ScrapeBudget decides, from what it has observed so far, whether more
+scrolling can still pay off: it keeps enough time in reserve to finish
+the detail pages already queued and the email crawls they trigger, and
+it pauses asking for cards while the queued ones should already yield
+the target. The yield estimate starts from a prior, so a pause is only
+provisional: once processed cards show a lower yield, more cards are
+wanted again.
+"""
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+# Starting estimates, replaced by observations as the scrape runs
+PRIOR_CARD_SECONDS = 2.0
+PRIOR_EMAIL_SECONDS = 5.0
+PRIOR_LEAD_YIELD = 0.5
+PRIOR_WEIGHT = 4  # how many observations the priors are worth
+CARD_SAFETY_FACTOR = 1.25
+MIN_LEAD_YIELD = 0.05
+SMOOTHING = 0.3  # EWMA weight of each new duration
+
+
+class ScrapeBudget:
+    """Adaptive split of a scrape's time between scrolling, details and email crawls
+
+    Thread-safe: detail workers and email callbacks record durations
+    while the scrolling thread asks whether to keep going.
+    """
+
+    def __init__(self, total_seconds: float, target_leads: Optional[int] = None, workers: int = 4):
+        self.total_seconds = total_seconds
+        self.target_leads = target_leads
+        self.workers = max(1, workers)
+        self.start = time.time()
+        self.deadline = self.start + total_seconds
+        self._card_seconds = PRIOR_CARD_SECONDS
+        self._email_seconds = PRIOR_EMAIL_SECONDS
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.time())
+
+    def expired(self) -> bool:
+        return time.time() >= self.deadline
+
+    def record_card(self, seconds: float):
+        """A place page took `seconds` on one worker"""
+        with self._lock:
+            self._card_seconds += SMOOTHING * (seconds - self._card_seconds)
+
+    def record_email(self, seconds: float):
+        """An email crawl took `seconds` from submit to result"""
+        with self._lock:
+            self._email_seconds += SMOOTHING * (seconds - self._email_seconds)
+
+    def lead_yield(self, leads: int, processed: int) -> float:
+        """Smoothed share of processed cards that became leads"""
+        estimate = (leads + PRIOR_LEAD_YIELD * PRIOR_WEIGHT) / (processed + PRIOR_WEIGHT)
+        return max(MIN_LEAD_YIELD, estimate)
+
+    def cards_wanted(self, leads: int, processed: int) -> Optional[int]:
+        """Unprocessed cards needed to reach the target, or None without a target"""
+        if self.target_leads is None:
+            return None
+        missing = max(0, self.target_leads - leads)
+        return math.ceil(missing / self.lead_yield(leads, processed) * CARD_SAFETY_FACTOR)
+
+    def email_tail(self) -> float:
+        """Time to keep free at the end for the last email crawls"""
+        with self._lock:
+            return min(self._email_seconds, self.total_seconds / 4)
+
+    def reserve(self, pending_cards: int) -> float:
+        """Seconds needed to finish queued cards and their email crawls"""
+        with self._lock:
+            card_seconds = self._card_seconds
+        return math.ceil(pending_cards / self.workers) * card_seconds + self.email_tail()
+
+    def can_scroll(self, cards_found: int, processed: int) -> bool:
+        """Whether there is still time to load one more card and finish it"""
+        if self.expired():
+            return False
+        pending = max(0, cards_found - processed)
+        return self.remaining() > self.reserve(pending + 1)
+
+    def enough_queued(self, cards_found: int, processed: int, leads: int) -> bool:
+        """Whether the queued cards should yield the target at the current yield estimate
+
+        Scrolling can pause while this holds, but should resume once it
+        stops holding: the estimate is re-made as cards are processed.
+        """
+        wanted = self.cards_wanted(leads, processed)
+        return wanted is not None and max(0, cards_found - processed) >= wanted
+
+    def detail_deadline(self) -> float:
+        """Last moment to start a place page whose email can still arrive in time"""
+        return self.deadline - self.email_tail()
+
+    def satisfied(self, leads: int) -> bool:
+        return self.target_leads is not None and leads >= self.target_leads
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            card_seconds, email_seconds = self._card_seconds, self._email_seconds
+        return {
+            "total_seconds": self.total_seconds,
+            "remaining": self.remaining(),
+            "target_leads": self.target_leads,
+            "card_seconds": card_seconds,
+            "email_seconds": email_seconds,
+        }
@@ -4,24 +4,241 @@ Database operations for the Google Maps scraper
 """
 import sqlite3
 import json
+import re
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Awaitable, Callable, List, Dict, Optional, Set, TypeVar
 import asyncio
+import time
+from contextlib import asynccontextmanager
 import aiosqlite
+import pandas as pd
+
+from exporter import DEFAULT_CHUNK_SIZE, ExportWriter, iter_chunks
+from validation import RESCORE_CHUNK_SIZE, assess_record, validate_frame
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_DB_PATH = "leads.db"
+
+# Applied to every connection. WAL lets readers run alongside the writer and
+# synchronous=NORMAL only fsyncs at checkpoints, which is safe under WAL.
+# auto_vacuum only takes effect on a new file (see enable_incremental_vacuum).
+PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative = KiB, so 64 MiB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+STATEMENT_CACHE_SIZE = 256
+
+INSERT_SESSION_SQL = "INSERT INTO scrape_sessions (query, total_pages, query_key) VALUES (?, ?, ?)"
+# Re-scraping a known place refreshes its row instead of adding a duplicate.
+# Fields that came back empty keep their previously scraped value; score and
+# status always follow the latest scrape.
+INSERT_BUSINESS_SQL = """
+    INSERT INTO businesses 
+    (name, address, phone, website, email, query, page_number, position, data_quality_score,
+     session_id, place_key, rating, query_key, validation_status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(place_key) DO UPDATE SET
+        name = COALESCE(NULLIF(NULLIF(excluded.name, ''), 'N/A'), businesses.name),
+        address = COALESCE(NULLIF(NULLIF(excluded.address, ''), 'N/A'), businesses.address),
+        phone = COALESCE(NULLIF(NULLIF(excluded.phone, ''), 'N/A'), businesses.phone),
+        website = COALESCE(NULLIF(NULLIF(excluded.website, ''), 'N/A'), businesses.website),
+        email = COALESCE(NULLIF(NULLIF(excluded.email, ''), 'N/A'), businesses.email),
+        rating = COALESCE(NULLIF(NULLIF(excluded.rating, ''), 'N/A'), businesses.rating),
+        query = excluded.query,
+        query_key = excluded.query_key,
+        page_number = excluded.page_number,
+        position = excluded.position,
+        data_quality_score = excluded.data_quality_score,
+        validation_status = excluded.validation_status,
+        session_id = excluded.session_id,
+        scraped_at = CURRENT_TIMESTAMP
+"""
+# The business row holds the latest sighting; this records every session that
+# found it, so overlapping queries and sessions each keep their results
+INSERT_MEMBERSHIP_SQL = """
+    INSERT INTO session_businesses (session_id, business_id, position, query_key)
+    SELECT ?, id, ?, ? FROM businesses WHERE place_key = ?
+    ON CONFLICT(session_id, business_id) DO UPDATE SET position = excluded.position
+"""
+CLAIM_JOB_SQL = """
+    UPDATE scrape_sessions
+    SET status = 'running', worker_id = ?, claimed_at = CURRENT_TIMESTAMP,
+        start_time = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+    WHERE id = (
+        SELECT q.id FROM scrape_sessions q
+        WHERE q.status = 'queued'
+        ORDER BY
+            (SELECT COUNT(*) FROM scrape_sessions r WHERE r.status = 'running' AND r.owner = q.owner),
+            COALESCE((SELECT MAX(c.claimed_at) FROM scrape_sessions c WHERE c.owner = q.owner), ''),
+            q.id
+        LIMIT 1
+    )
+    AND status = 'queued'
+    RETURNING id, query, owner
+"""
+EXPORT_HEADER = ['Name', 'Address', 'Phone', 'Website', 'Email']
+EXPORT_SESSION_SQL = """
+    SELECT b.name, b.address, b.phone, b.website, b.email
+    FROM session_businesses sb JOIN businesses b ON b.id = sb.business_id
+    WHERE sb.session_id = ? ORDER BY sb.position, sb.id
+"""
+INSERT_SPAN_SQL = """
+    INSERT INTO scrape_metrics (session_id, name, offset_seconds, seconds, ok, attrs)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+INSERT_SKIPPED_SQL = """
+    INSERT INTO skipped_entries (session_id, position, name, reason)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Columns searched by search_businesses; the FTS table mirrors them from businesses
+FTS_COLUMNS = ['name', 'address', 'website', 'email', 'query']
+# order name -> (sort expression, direction); pages are keyed on (sort value, id)
+SEARCH_ORDERS = {
+    'relevance': ('businesses_fts.rank', 'ASC'),
+    'newest': ('b.scraped_at', 'DESC'),
+    'quality': ('b.data_quality_score', 'DESC'),
+}
+SEARCH_COLUMNS = """
+    b.id, b.name, b.address, b.phone, b.website, b.email, b.rating, b.query,
+    b.data_quality_score, b.validation_status, b.scraped_at
+"""
+
+_FEATURE_ID_PATTERN = re.compile(r"!1s(0x[0-9a-f]+:0x[0-9a-f]+)", re.I)
+_CID_PATTERN = re.compile(r"[?&]cid=(\d+)")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_NON_DIGIT = re.compile(r"\D+")
+_WHITESPACE = re.compile(r"\s+")
+_SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a search: case- and whitespace-insensitive query text"""
+    return _WHITESPACE.sub(' ', str(query or '')).strip().lower()
+
+
+def fts_query(text: str) -> str:
+    """FTS5 MATCH expression requiring every word of `text`, each as a prefix
+    
+    Words are quoted, so FTS5 operators and punctuation in user input are
+    searched for literally rather than parsed.
+    """
+    return " ".join(f'"{token}"*' for token in _SEARCH_TOKEN.findall(str(text or '').lower()))
+
+
+def place_key(business_data: Dict) -> str:
+    """Stable identity for a place: its Maps feature id/CID, else name plus phone or address"""
+    href = business_data.get('href') or ''
+    match = _FEATURE_ID_PATTERN.search(href)
+    if match:
+        return f"fid:{match.group(1).lower()}"
+    match = _CID_PATTERN.search(href)
+    if match:
+        return f"cid:{match.group(1)}"
+    
+    name = _NON_ALNUM.sub('', str(business_data.get('Name') or '').lower())
+    phone = _NON_DIGIT.sub('', str(business_data.get('Phone') or ''))[-10:]
+    if phone:
+        return f"np:{name}|{phone}"
+    address = _NON_ALNUM.sub('', str(business_data.get('Address') or '').lower())
+    return f"na:{name}|{address}"
+
+
 class DatabaseManager:
-    """Async database manager for storing scraped data"""
+    """Async database manager for storing scraped data
+    
+    Holds one long-lived connection for its lifetime. Use it as
+    `async with DatabaseManager(path) as db:` to open, migrate and close
+    it explicitly; methods called outside that block connect lazily.
     
-    def __init__(self, db_path: str = "leads.db"):
+    Business and skipped-entry rows are write-behind buffered and flushed
+    with executemany once `batch_size` rows are waiting, every
+    `flush_interval` seconds, on `end_session()` and on `close()`.
+    Producers wait once `max_buffered` rows are pending.
+    """
+    
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, batch_size: int = 100,
+                 flush_interval: float = 2.0, max_buffered: Optional[int] = None):
         self.db_path = db_path
-        self.batch_size = 100
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered or batch_size * 10
+        self._db: Optional[aiosqlite.Connection] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._pending_flush: Optional[asyncio.Task] = None
+        self._business_rows: List[tuple] = []
+        self._skipped_rows: List[tuple] = []
+        # Optional metrics.Tracer; flushes are recorded as db_flush spans
+        self.tracer = None
+        self._flush_stats = {"flushes": 0, "rows_flushed": 0, "flush_seconds": 0.0, "failed_flushes": 0}
+    
+    async def __aenter__(self) -> "DatabaseManager":
+        await self.connect()
+        await self.initialize()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def connect(self) -> aiosqlite.Connection:
+        """Open the shared connection and apply tuned pragmas"""
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._db is None:
+                db = await aiosqlite.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE)
+                for pragma, value in PRAGMAS.items():
+                    await db.execute(f"PRAGMA {pragma} = {value}")
+                db.row_factory = aiosqlite.Row
+                self._write_lock = asyncio.Lock()
+                self._flush_lock = asyncio.Lock()
+                self._db = db
+                self._flusher = asyncio.create_task(self._flush_periodically())
+        return self._db
+    
+    async def close(self):
+        """Flush buffered rows and close the shared connection"""
+        if self._db is None:
+            return
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        try:
+            await self.flush()
+        finally:
+            db, self._db = self._db, None
+            await db.close()
+    
+    @asynccontextmanager
+    async def _read(self):
+        """Yield the shared connection for queries"""
+        yield await self.connect()
+    
+    @asynccontextmanager
+    async def _transaction(self):
+        """Yield the shared connection for writes, committing on success"""
+        db = await self.connect()
+        async with self._write_lock:
+            try:
+                yield db
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
         
     async def initialize(self):
         """Initialize database tables"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS businesses (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -65,135 +282,739 @@ class DatabaseManager:
                 )
             """)
             
-            await db.commit()
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS email_cache (
+                    domain TEXT PRIMARY KEY,
+                    email TEXT NOT NULL,
+                    cached_at REAL NOT NULL
+                )
+            """)
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_email_cache_cached_at ON email_cache (cached_at)"
+            )
+            
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS scrape_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id INTEGER,
+                    name TEXT NOT NULL,
+                    offset_seconds REAL,
+                    seconds REAL NOT NULL,
+                    ok INTEGER DEFAULT 1,
+                    attrs TEXT,
+                    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (session_id) REFERENCES scrape_sessions (id)
+                )
+            """)
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_scrape_metrics_session_id ON scrape_metrics (session_id)"
+            )
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_scrape_metrics_recorded_at ON scrape_metrics (recorded_at)"
+            )
+            
+            await self._migrate(db)
+    
+    async def _migrate(self, db):
+        """Apply schema migrations newer than the file's user_version"""
+        async with db.execute("PRAGMA user_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        for target, migration in enumerate(self._migrations(), start=1):
+            if version < target:
+                logger.info(f"Migrating {self.db_path} to schema version {target}")
+                await migration(db)
+                await db.execute(f"PRAGMA user_version = {target}")
+    
+    def _migrations(self):
+        return [self._migrate_dedup_indexes, self._migrate_job_queue, self._migrate_query_keys,
+                self._migrate_known_places, self._migrate_retention_indexes, self._migrate_full_text_search,
+                self._migrate_session_businesses]
+    
+    async def _add_column(self, db, table: str, column: str, definition: str):
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if column not in columns:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
+    async def _migrate_dedup_indexes(self, db):
+        """v1: session and place-key columns, lookup indexes, unique place key"""
+        await self._add_column(db, "businesses", "session_id", "INTEGER")
+        await self._add_column(db, "businesses", "place_key", "TEXT")
+        
+        async with db.execute("SELECT id, name, address, phone FROM businesses WHERE place_key IS NULL") as cursor:
+            rows = await cursor.fetchall()
+        await db.executemany(
+            "UPDATE businesses SET place_key = ? WHERE id = ?",
+            [(place_key({'Name': r[1], 'Address': r[2], 'Phone': r[3]}), r[0]) for r in rows]
+        )
+        # Keep the newest row of every duplicate group before enforcing uniqueness
+        await db.execute("""
+            DELETE FROM businesses WHERE id NOT IN (
+                SELECT MAX(id) FROM businesses GROUP BY place_key
+            )
+        """)
+        
+        await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_businesses_place_key ON businesses (place_key)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_businesses_query ON businesses (query, scraped_at)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_businesses_scraped_at ON businesses (scraped_at)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_businesses_session_id ON businesses (session_id)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_skipped_entries_session_id ON skipped_entries (session_id)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_scrape_sessions_query ON scrape_sessions (query, start_time)")
+    
+    async def _migrate_job_queue(self, db):
+        """v2: columns that let scrape_sessions double as a durable job queue"""
+        await self._add_column(db, "scrape_sessions", "owner", "TEXT DEFAULT 'anonymous'")
+        await self._add_column(db, "scrape_sessions", "worker_id", "TEXT")
+        await self._add_column(db, "scrape_sessions", "claimed_at", "TIMESTAMP")
+        await self._add_column(db, "scrape_sessions", "heartbeat_at", "TIMESTAMP")
+        await self._add_column(db, "scrape_sessions", "progress", "TEXT")
+        await self._add_column(db, "scrape_sessions", "error", "TEXT")
+        # Rating is shown alongside results the UI reads back from the queue
+        await self._add_column(db, "businesses", "rating", "TEXT")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_scrape_sessions_status ON scrape_sessions (status, owner)")
+    
+    async def _migrate_query_keys(self, db):
+        """v3: normalized query keys so identical searches can share results"""
+        await self._add_column(db, "scrape_sessions", "query_key", "TEXT")
+        await self._add_column(db, "businesses", "query_key", "TEXT")
+        for table in ("scrape_sessions", "businesses"):
+            async with db.execute(f"SELECT DISTINCT query FROM {table} WHERE query_key IS NULL") as cursor:
+                queries = [row[0] for row in await cursor.fetchall()]
+            await db.executemany(
+                f"UPDATE {table} SET query_key = ? WHERE query = ? AND query_key IS NULL",
+                [(normalize_query(query), query) for query in queries]
+            )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scrape_sessions_query_key ON scrape_sessions (query_key, status, end_time)"
+        )
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_businesses_query_key ON businesses (query_key, scraped_at)")
+    
+    async def _migrate_known_places(self, db):
+        """v4: every place page read, so later runs can skip recently scraped places"""
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS known_places (
+                place_key TEXT PRIMARY KEY,
+                href TEXT,
+                name TEXT,
+                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_scraped TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                scrape_count INTEGER DEFAULT 1
+            )
+        """)
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_known_places_last_scraped ON known_places (last_scraped)")
+        # Stored leads already carry a feature id/CID key when their link had one
+        await db.execute("""
+            INSERT OR IGNORE INTO known_places (place_key, name, first_seen, last_scraped)
+            SELECT place_key, name, scraped_at, scraped_at FROM businesses
+            WHERE place_key LIKE 'fid:%' OR place_key LIKE 'cid:%'
+        """)
+    
+    async def _migrate_retention_indexes(self, db):
+        """v5: timestamp indexes so retention can delete expired rows in ranges"""
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_scrape_sessions_start_time ON scrape_sessions (start_time)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_skipped_entries_skipped_at ON skipped_entries (skipped_at)")
+    
+    async def _migrate_full_text_search(self, db):
+        """v6: FTS5 index over business text columns, kept in sync by triggers"""
+        columns = ", ".join(FTS_COLUMNS)
+        new_values = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+        old_values = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+        await db.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS businesses_fts USING fts5(
+                {columns}, content='businesses', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        """)
+        await db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS businesses_fts_insert AFTER INSERT ON businesses BEGIN
+                INSERT INTO businesses_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        """)
+        await db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS businesses_fts_delete AFTER DELETE ON businesses BEGIN
+                INSERT INTO businesses_fts (businesses_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        # Only text changes touch the index, so re-scoring rows stays cheap
+        await db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS businesses_fts_update AFTER UPDATE OF {columns} ON businesses BEGIN
+                INSERT INTO businesses_fts (businesses_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO businesses_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        """)
+        await db.execute("INSERT INTO businesses_fts (businesses_fts) VALUES ('rebuild')")
+    
+    async def _migrate_session_businesses(self, db):
+        """v7: which sessions found which businesses, independent of the deduplicated row"""
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS session_businesses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NOT NULL,
+                business_id INTEGER NOT NULL,
+                position INTEGER,
+                query_key TEXT,
+                found_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (session_id, business_id),
+                FOREIGN KEY (session_id) REFERENCES scrape_sessions (id),
+                FOREIGN KEY (business_id) REFERENCES businesses (id)
+            )
+        """)
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_session_businesses_query_key ON session_businesses (query_key, found_at)"
+        )
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_session_businesses_found_at ON session_businesses (found_at)"
+        )
+        # Earlier sessions only kept the rows no later session overwrote
+        await db.execute("""
+            INSERT OR IGNORE INTO session_businesses (session_id, business_id, position, query_key, found_at)
+            SELECT session_id, id, position, query_key, scraped_at FROM businesses
+            WHERE session_id IS NOT NULL ORDER BY id
+        """)
     
     async def create_session(self, query: str, total_pages: int) -> int:
         """Create a new scrape session"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                "INSERT INTO scrape_sessions (query, total_pages) VALUES (?, ?)",
-                (query, total_pages)
-            )
-            await db.commit()
+        async with self._transaction() as db:
+            cursor = await db.execute(INSERT_SESSION_SQL, (query, total_pages, normalize_query(query)))
             return cursor.lastrowid
     
     async def update_session(self, session_id: int, **kwargs):
         """Update session statistics"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             fields = ", ".join([f"{k} = ?" for k in kwargs.keys()])
             values = list(kwargs.values()) + [session_id]
             await db.execute(
                 f"UPDATE scrape_sessions SET {fields} WHERE id = ?",
                 values
             )
-            await db.commit()
+    
+    async def end_session(self, session_id: int, status: str = 'completed', **kwargs):
+        """Flush buffered rows and mark a session finished"""
+        await self.flush()
+        await self.update_session(
+            session_id, status=status, end_time=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'), **kwargs
+        )
+    
+    async def enqueue_job(self, query: str, owner: str = 'anonymous') -> int:
+        """Queue a scrape for a background worker; returns its session id"""
+        async with self._transaction() as db:
+            cursor = await db.execute(
+                "INSERT INTO scrape_sessions (query, total_pages, owner, status, query_key) VALUES (?, 1, ?, 'queued', ?)",
+                (query, owner, normalize_query(query))
+            )
+            return cursor.lastrowid
+    
+    async def claim_next_job(self, worker_id: str) -> Optional[Dict]:
+        """Atomically move the fairest queued job to running and return it
+        
+        Owners with the fewest running jobs go first, then the owner served
+        least recently, then the oldest job, so one user's batch cannot
+        starve everyone else.
+        """
+        async with self._transaction() as db:
+            async with db.execute(CLAIM_JOB_SQL, (worker_id,)) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row else None
+    
+    async def heartbeat_job(self, session_id: int, progress: Optional[Dict] = None):
+        """Record that a running job is alive, with its latest progress"""
+        async with self._transaction() as db:
+            await db.execute(
+                "UPDATE scrape_sessions SET heartbeat_at = CURRENT_TIMESTAMP, progress = COALESCE(?, progress) WHERE id = ?",
+                (json.dumps(progress) if progress is not None else None, session_id)
+            )
+    
+    async def requeue_stale_jobs(self, stale_seconds: int = 300) -> int:
+        """Put running jobs whose worker stopped heartbeating back in the queue"""
+        async with self._transaction() as db:
+            cursor = await db.execute("""
+                UPDATE scrape_sessions SET status = 'queued', worker_id = NULL
+                WHERE status = 'running' AND worker_id IS NOT NULL
+                AND COALESCE(heartbeat_at, claimed_at, start_time) < datetime('now', ?)
+            """, (f'-{int(stale_seconds)} seconds',))
+            return cursor.rowcount
+    
+    async def find_active_job(self, query: str, stale_seconds: int = 300) -> Optional[int]:
+        """Id of a queued or live running job for the same normalized query, if any
+        
+        A running session only counts while a worker owns it and has
+        heartbeated within `stale_seconds`; batch sessions and ones left
+        behind by a dead process are never worth waiting for.
+        """
+        async with self._read() as db:
+            async with db.execute(
+                "SELECT id FROM scrape_sessions WHERE query_key = ? AND (status = 'queued' OR "
+                "(status = 'running' AND worker_id IS NOT NULL "
+                "AND COALESCE(heartbeat_at, claimed_at, start_time) >= datetime('now', ?))) "
+                "ORDER BY id DESC LIMIT 1",
+                (normalize_query(query), f'-{int(stale_seconds)} seconds')
+            ) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+    
+    async def find_latest_session(self, query: str, max_age_seconds: Optional[float] = None) -> Optional[Dict]:
+        """Newest completed session for the normalized query that stored results, with its age_seconds
+        
+        Sessions that failed or found nothing are left out, so they are
+        neither served from the cache nor skipped when a batch resumes.
+        """
+        sql = """
+            SELECT *, (julianday('now') - julianday(end_time)) * 86400.0 AS age_seconds
+            FROM scrape_sessions
+            WHERE query_key = ? AND status = 'completed' AND end_time IS NOT NULL
+            AND EXISTS (SELECT 1 FROM session_businesses sb WHERE sb.session_id = scrape_sessions.id)
+        """
+        params: list = [normalize_query(query)]
+        if max_age_seconds is not None:
+            sql += " AND end_time >= datetime('now', ?)"
+            params.append(f'-{int(max_age_seconds)} seconds')
+        sql += " ORDER BY end_time DESC LIMIT 1"
+        async with self._read() as db:
+            async with db.execute(sql, params) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row else None
+    
+    async def interrupt_sessions(self, owner: str) -> int:
+        """Mark an owner's sessions left running by a crashed process as interrupted"""
+        async with self._transaction() as db:
+            cursor = await db.execute(
+                "UPDATE scrape_sessions SET status = 'interrupted' "
+                "WHERE owner = ? AND status = 'running' AND worker_id IS NULL",
+                (owner,)
+            )
+            return cursor.rowcount
+    
+    async def link_known_places(self, session_id: int, query: str, cards: List[Dict]) -> int:
+        """Add stored places a session passed over as already known to it; returns places linked
+        
+        cards carry the href and feed position of each place. They are
+        matched on place_key, so a place that never became a business row
+        is left out.
+        """
+        rows = [(session_id, card.get('position', 0), normalize_query(query), place_key({'href': card['href']}))
+                for card in cards if card.get('href')]
+        if not rows:
+            return 0
+        await self.flush()
+        async with self._transaction() as db:
+            before = db.total_changes
+            await db.executemany(INSERT_MEMBERSHIP_SQL, rows)
+            return db.total_changes - before
+    
+    async def get_businesses_by_session(self, session_id: int, after_id: int = 0) -> List[Dict]:
+        """Businesses found by a session in the order they were written
+        
+        Each row carries its member_id; pass the last one seen as after_id
+        to get only businesses written since.
+        """
+        async with self._read() as db:
+            async with db.execute(
+                "SELECT b.*, sb.id AS member_id FROM session_businesses sb "
+                "JOIN businesses b ON b.id = sb.business_id "
+                "WHERE sb.session_id = ? AND sb.id > ? ORDER BY sb.id",
+                (session_id, after_id)
+            ) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
     
     async def insert_business(self, business_data: Dict, session_id: int) -> bool:
-        """Insert a business record"""
+        """Queue a business record for the next batch flush"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO businesses 
-                    (name, address, phone, website, email, query, page_number, position, data_quality_score)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    business_data.get('Name', ''),
-                    business_data.get('Address', ''),
-                    business_data.get('Phone', ''),
-                    business_data.get('Website', ''),
-                    business_data.get('Email', ''),
-                    business_data.get('query', ''),
-                    business_data.get('page_number', 0),
-                    business_data.get('position', 0),
-                    self._calculate_quality_score(business_data)
-                ))
-                await db.commit()
-                return True
+            score, status = assess_record(business_data)
+            await self._buffer('_business_rows', (
+                business_data.get('Name', ''),
+                business_data.get('Address', ''),
+                business_data.get('Phone', ''),
+                business_data.get('Website', ''),
+                business_data.get('Email', ''),
+                business_data.get('query', ''),
+                business_data.get('page_number', 0),
+                business_data.get('position', 0),
+                score,
+                session_id,
+                place_key(business_data),
+                business_data.get('Rating', ''),
+                normalize_query(business_data.get('query', '')),
+                status
+            ))
+            return True
         except Exception as e:
             logger.error(f"Failed to insert business: {e}")
             return False
     
     async def insert_skipped_entry(self, skipped_data: Dict, session_id: int) -> bool:
-        """Insert a skipped entry record"""
+        """Queue a skipped entry record for the next batch flush"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO skipped_entries (session_id, position, name, reason)
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    session_id,
-                    skipped_data.get('Position', ''),
-                    skipped_data.get('Name', ''),
-                    skipped_data.get('Reason', '')
-                ))
-                await db.commit()
-                return True
+            await self._buffer('_skipped_rows', (
+                session_id,
+                skipped_data.get('Position', ''),
+                skipped_data.get('Name', ''),
+                skipped_data.get('Reason', '')
+            ))
+            return True
         except Exception as e:
             logger.error(f"Failed to insert skipped entry: {e}")
             return False
     
+    def _buffered(self) -> int:
+        return len(self._business_rows) + len(self._skipped_rows)
+    
+    async def _buffer(self, buffer_name: str, row: tuple):
+        """Append a row, applying backpressure and triggering batch flushes"""
+        await self.connect()
+        while self._buffered() >= self.max_buffered:
+            await self.flush()
+        # Look the buffer up only now: flush() swaps in fresh lists
+        getattr(self, buffer_name).append(row)
+        if self._buffered() >= self.batch_size and (self._pending_flush is None or self._pending_flush.done()):
+            self._pending_flush = asyncio.create_task(self._flush_quietly())
+    
+    async def _flush_quietly(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Background flush failed: {e}")
+    
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffered():
+                await self._flush_quietly()
+    
+    async def flush(self) -> int:
+        """Write all buffered rows in one transaction; returns rows written"""
+        if self._flush_lock is None:
+            return 0
+        async with self._flush_lock:
+            businesses, self._business_rows = self._business_rows, []
+            skipped, self._skipped_rows = self._skipped_rows, []
+            if not businesses and not skipped:
+                return 0
+            started = time.perf_counter()
+            started_at = time.time()
+            count = len(businesses) + len(skipped)
+            try:
+                async with self._transaction() as db:
+                    if businesses:
+                        await db.executemany(INSERT_BUSINESS_SQL, businesses)
+                        # (session_id, position, query_key, place_key) of each row
+                        await db.executemany(INSERT_MEMBERSHIP_SQL, [
+                            (row[9], row[7], row[12], row[10]) for row in businesses if row[9] is not None
+                        ])
+                    if skipped:
+                        await db.executemany(INSERT_SKIPPED_SQL, skipped)
+            except Exception:
+                # Keep the rows so the next flush retries them
+                self._business_rows[:0] = businesses
+                self._skipped_rows[:0] = skipped
+                self._flush_stats["failed_flushes"] += 1
+                if self.tracer is not None:
+                    self.tracer.record("db_flush", started_at, time.time() - started_at, False, {"rows": count})
+                raise
+            self._flush_stats["flushes"] += 1
+            self._flush_stats["rows_flushed"] += count
+            self._flush_stats["flush_seconds"] += time.perf_counter() - started
+            if self.tracer is not None:
+                self.tracer.record("db_flush", started_at, time.time() - started_at, True, {"rows": count})
+            return count
+    
+    def flush_stats(self) -> Dict:
+        """Batch writer counters, including rows flushed per second of flush time"""
+        stats = dict(self._flush_stats, buffered=self._buffered())
+        seconds = stats["flush_seconds"]
+        stats["rows_per_second"] = stats["rows_flushed"] / seconds if seconds else 0.0
+        return stats
+    
+    async def save_spans(self, session_id: int, spans: List[Dict]):
+        """Persist a scrape's tracing spans"""
+        async with self._transaction() as db:
+            await db.executemany(INSERT_SPAN_SQL, [
+                (session_id, span['name'], span['offset'], span['seconds'], int(span['ok']),
+                 json.dumps(span['attrs']) if span['attrs'] else None)
+                for span in spans
+            ])
+    
+    async def get_spans(self, session_id: int) -> List[Dict]:
+        """A session's spans in the order they started"""
+        async with self._read() as db:
+            async with db.execute(
+                "SELECT name, offset_seconds, seconds, ok, attrs FROM scrape_metrics "
+                "WHERE session_id = ? ORDER BY offset_seconds",
+                (session_id,)
+            ) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+    
+    async def get_span_durations(self, session_id: Optional[int] = None,
+                                 window_seconds: Optional[float] = None) -> Dict[str, tuple]:
+        """{span name: ([seconds, ...], error count)} for a session or a recent window"""
+        sql, params = "SELECT name, seconds, ok FROM scrape_metrics WHERE 1 = 1", []
+        if session_id is not None:
+            sql += " AND session_id = ?"
+            params.append(session_id)
+        if window_seconds is not None:
+            sql += " AND recorded_at >= datetime('now', ?)"
+            params.append(f'-{int(window_seconds)} seconds')
+        durations: Dict[str, tuple] = {}
+        async with self._read() as db:
+            async with db.execute(sql, params) as cursor:
+                async for name, seconds, ok in cursor:
+                    values, errors = durations.get(name, ([], 0))
+                    values.append(seconds)
+                    durations[name] = (values, errors + (0 if ok else 1))
+        return durations
+    
     async def get_session_stats(self, session_id: int) -> Dict:
         """Get session statistics"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read() as db:
             async with db.execute(
                 "SELECT * FROM scrape_sessions WHERE id = ?", (session_id,)
             ) as cursor:
                 row = await cursor.fetchone()
                 return dict(row) if row else {}
     
+    async def export(self, session_id: int, filename: str, fmt: str = 'csv',
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+        """Stream a session's businesses to CSV, NDJSON or Parquet; returns rows written"""
+        await self.flush()
+        async with self._read() as db:
+            with ExportWriter(filename, EXPORT_HEADER, fmt) as writer:
+                async for rows in iter_chunks(db, EXPORT_SESSION_SQL, (session_id,), chunk_size):
+                    writer.write(rows)
+                return writer.rows_written
+    
     async def export_to_csv(self, session_id: int, filename: str) -> bool:
         """Export session data to CSV"""
         try:
-            import csv
-            async with aiosqlite.connect(self.db_path) as db:
-                async with db.execute(
-                    "SELECT name, address, phone, website, email FROM businesses WHERE query = (SELECT query FROM scrape_sessions WHERE id = ?)",
-                    (session_id,)
-                ) as cursor:
-                    rows = await cursor.fetchall()
-                    
-                    with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
-                        writer = csv.writer(f)
-                        writer.writerow(['Name', 'Address', 'Phone', 'Website', 'Email'])
-                        writer.writerows(rows)
-                    return True
+            await self.export(session_id, filename, 'csv')
+            return True
         except Exception as e:
             logger.error(f"Failed to export to CSV: {e}")
             return False
     
-    def _calculate_quality_score(self, business_data: Dict) -> float:
-        """Calculate data quality score for a business"""
-        score = 0.0
-        fields = ['Name', 'Address', 'Phone', 'Website', 'Email']
-        
-        for field in fields:
-            if business_data.get(field) and business_data[field] != 'N/A':
-                score += 20.0
+    async def rescore_businesses(self, chunk_size: int = RESCORE_CHUNK_SIZE) -> Dict[str, int]:
+        """Re-validate every business with validation.validate_frame and write scores back in bulk
         
-        # Bonus for valid email format
-        email = business_data.get('Email', '')
-        if email and email != 'N/A' and '@' in email and '.' in email:
-            score += 10.0
-        
-        return min(score, 100.0)
+        Rows are read in id order, chunk by chunk, so the oldest copy of a
+        duplicate keeps its status. Returns the number of rows per
+        validation_status.
+        """
+        await self.flush()
+        columns = ['id', 'Name', 'Address', 'Phone', 'Website', 'Email']
+        seen_keys: set = set()
+        counts: Dict[str, int] = {}
+        last_id = 0
+        while True:
+            async with self._read() as db:
+                async with db.execute(
+                    "SELECT id, name, address, phone, website, email FROM businesses WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk_size)
+                ) as cursor:
+                    rows = [tuple(row) for row in await cursor.fetchall()]
+            if not rows:
+                break
+            frame = pd.DataFrame(rows, columns=columns)
+            checked = validate_frame(frame, seen_keys)
+            async with self._transaction() as db:
+                await db.executemany(
+                    "UPDATE businesses SET data_quality_score = ?, validation_status = ? WHERE id = ?",
+                    zip(checked['quality_score'].tolist(), checked['validation_status'].tolist(),
+                        frame['id'].tolist())
+                )
+            for status, count in checked['validation_status'].value_counts().items():
+                counts[status] = counts.get(status, 0) + int(count)
+            last_id = rows[-1][0]
+        return counts
     
-    async def get_businesses_by_query(self, query: str) -> List[Dict]:
-        """Get all businesses for a specific query"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+    async def get_businesses_by_query(self, query: str, since: Optional[str] = None) -> List[Dict]:
+        """Businesses found by a query (normalized), optionally only by sessions since a timestamp
+        
+        A business counts for every query that found it, even when a later
+        query scraped it again.
+        """
+        await self.flush()
+        async with self._read() as db:
             async with db.execute(
-                "SELECT * FROM businesses WHERE query = ? ORDER BY scraped_at DESC",
-                (query,)
+                "SELECT * FROM businesses WHERE id IN ("
+                "    SELECT business_id FROM session_businesses WHERE query_key = ? AND found_at >= ?"
+                ") ORDER BY scraped_at DESC, position",
+                (normalize_query(query), since or '')
             ) as cursor:
                 rows = await cursor.fetchall()
                 return [dict(row) for row in rows]
     
-    async def cleanup_old_sessions(self, days: int = 30):
-        """Clean up old sessions and data"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                DELETE FROM scrape_sessions 
-                WHERE start_time < datetime('now', '-{} days')
-            """.format(days))
-            await db.commit()
+    async def search_businesses(self, text: str, limit: int = 50, cursor: Optional[tuple] = None,
+                                order: str = 'relevance', min_score: Optional[float] = None) -> Dict:
+        """One page of stored businesses matching every word of `text` (as prefixes)
+        
+        Returns {"rows": [...], "next_cursor": ...}; pass next_cursor back
+        for the following page, which is None after the last one. Pages are
+        keyset-paginated on (sort value, id), so a deep page costs the same
+        as the first. `order` is one of SEARCH_ORDERS.
+        """
+        match = fts_query(text)
+        if not match:
+            return {"rows": [], "next_cursor": None}
+        sort, direction = SEARCH_ORDERS[order]
+        sql = (
+            f"SELECT {SEARCH_COLUMNS}, {sort} AS sort_value FROM businesses_fts "
+            f"JOIN businesses b ON b.id = businesses_fts.rowid WHERE businesses_fts MATCH ?"
+        )
+        params: list = [match]
+        if min_score is not None:
+            sql += " AND b.data_quality_score >= ?"
+            params.append(min_score)
+        if cursor is not None:
+            after = '>' if direction == 'ASC' else '<'
+            sql += f" AND ({sort} {after} ? OR ({sort} = ? AND b.id > ?))"
+            params.extend([cursor[0], cursor[0], cursor[1]])
+        sql += f" ORDER BY {sort} {direction}, b.id LIMIT ?"
+        params.append(limit + 1)
+        
+        await self.flush()
+        async with self._read() as db:
+            async with db.execute(sql, params) as result:
+                rows = [dict(row) for row in await result.fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1]['sort_value'], rows[-1]['id'])
+        for row in rows:
+            del row['sort_value']
+        return {"rows": rows, "next_cursor": next_cursor}
+    
+    async def load_email_cache(self, max_age_seconds: float, limit: int) -> List[tuple]:
+        """Get (domain, email, cached_at) rows younger than max_age_seconds, newest first"""
+        async with self._read() as db:
+            async with db.execute(
+                "SELECT domain, email, cached_at FROM email_cache "
+                "WHERE cached_at >= strftime('%s', 'now') - ? ORDER BY cached_at DESC LIMIT ?",
+                (max_age_seconds, limit)
+            ) as cursor:
+                return [tuple(row) for row in await cursor.fetchall()]
+    
+    async def save_email_cache(self, entries: List[tuple]):
+        """Upsert (domain, email, cached_at) rows into the email cache"""
+        async with self._transaction() as db:
+            await db.executemany("""
+                INSERT INTO email_cache (domain, email, cached_at) VALUES (?, ?, ?)
+                ON CONFLICT(domain) DO UPDATE SET email = excluded.email, cached_at = excluded.cached_at
+            """, entries)
+    
+    async def get_known_place_keys(self, max_age_days: Optional[float] = None) -> Set[str]:
+        """Keys of places scraped within max_age_days (ever, for None)"""
+        sql, params = "SELECT place_key FROM known_places", ()
+        if max_age_days is not None:
+            sql += " WHERE last_scraped >= datetime('now', ?)"
+            params = (f'-{float(max_age_days)} days',)
+        async with self._read() as db:
+            async with db.execute(sql, params) as cursor:
+                return {row[0] for row in await cursor.fetchall()}
+    
+    async def save_known_places(self, places: List[tuple]):
+        """Upsert (place_key, href, name) rows as scraped now"""
+        async with self._transaction() as db:
+            await db.executemany("""
+                INSERT INTO known_places (place_key, href, name) VALUES (?, ?, ?)
+                ON CONFLICT(place_key) DO UPDATE SET
+                    href = excluded.href,
+                    name = COALESCE(NULLIF(NULLIF(excluded.name, ''), 'N/A'), known_places.name),
+                    last_scraped = CURRENT_TIMESTAMP,
+                    scrape_count = known_places.scrape_count + 1
+            """, places)
+    
+    async def get_expired_rows(self, table: str, column: str, cutoff: str, limit: int,
+                               condition: str = "") -> List[Dict]:
+        """Up to `limit` rows of `table` with `column` before cutoff, oldest first, with their rowid
+        
+        table, column and condition come from retention.RETENTION_TABLES,
+        never from user input.
+        """
+        async with self._read() as db:
+            async with db.execute(
+                f"SELECT rowid AS _rowid, * FROM {table} WHERE {column} < ? {condition} "
+                f"ORDER BY {column} LIMIT ?",
+                (cutoff, limit)
+            ) as cursor:
+                return [dict(row) for row in await cursor.fetchall()]
+    
+    async def delete_expired_rows(self, table: str, column: str, cutoff: str, rowids: List[int]) -> int:
+        """Delete the given rows if they are still older than cutoff; returns rows deleted"""
+        if not rowids:
+            return 0
+        placeholders = ", ".join("?" * len(rowids))
+        async with self._transaction() as db:
+            cursor = await db.execute(
+                f"DELETE FROM {table} WHERE rowid IN ({placeholders}) AND {column} < ?",
+                (*rowids, cutoff)
+            )
+            return cursor.rowcount
+    
+    async def get_pragma(self, name: str):
+        async with self._read() as db:
+            async with db.execute(f"PRAGMA {name}") as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+    
+    async def incremental_vacuum(self, pages: int) -> int:
+        """Return up to `pages` free pages to the filesystem; returns pages released"""
+        async with self._transaction() as db:
+            async with db.execute("PRAGMA freelist_count") as cursor:
+                before = (await cursor.fetchone())[0]
+            # sqlite3's execute() steps a pragma only once, which frees a single
+            # page; executescript runs it to completion
+            await db.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            async with db.execute("PRAGMA freelist_count") as cursor:
+                after = (await cursor.fetchone())[0]
+        return before - after
+    
+    async def checkpoint(self):
+        """Copy WAL pages into the main file without waiting for readers or writers"""
+        async with self._transaction() as db:
+            await db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    
+    async def enable_incremental_vacuum(self) -> bool:
+        """Switch an existing file to auto_vacuum=INCREMENTAL; False if it already was
+        
+        This runs a full VACUUM, which rewrites the file and blocks writers
+        while it runs, so it is a one-off maintenance step.
+        """
+        if await self.get_pragma("auto_vacuum") == 2:
+            return False
+        await self.flush()
+        db = await self.connect()
+        async with self._write_lock:
+            if db.in_transaction:
+                await db.commit()
+            await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await db.execute("VACUUM")
+        return True
+    
+    async def cleanup_old_sessions(self, days: int = 30, archive_dir: Optional[str] = None) -> Dict:
+        """Delete sessions and their rows older than `days` in small batches
+        
+        See retention.purge_expired; returns its report.
+        """
+        from retention import purge_expired
+        
+        return await purge_expired(self, days, archive_dir=archive_dir)
+
+
+T = TypeVar("T")
+
+
+def run_sync(operation: Callable[[DatabaseManager], Awaitable[T]], db_path: str = DEFAULT_DB_PATH,
+             initialize: bool = True) -> T:
+    """Run `await operation(db)` on a DatabaseManager opened for the call, from synchronous code
+
+    With initialize=False the schema is not created or migrated, so
+    read-only callers such as job polling never take the write lock.
+    """
+    async def _run():
+        if initialize:
+            async with DatabaseManager(db_path) as db:
+                return await operation(db)
+        db = DatabaseManager(db_path)
+        try:
+            return await operation(db)
+        finally:
+            await db.close()
+    return asyncio.run(_run())
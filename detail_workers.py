@@ -0,0 +1,119 @@
+"""
+Concurrent place-detail workers for the Google Maps scraper
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from driver_pool import DriverPool
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class DetailWorkers:
+    """A set of threads running `handler(driver, item)` on pooled drivers
+
+    Each worker checks out its own driver and pulls (index, item) pairs
+    from a shared queue until the queue is closed and drained, `stop()`
+    is called or `deadline` (an epoch timestamp) passes. A failing item
+    never stops its worker; a failing driver is swapped for a fresh one,
+    and so is one the pool wants recycled (see DriverPool.page_done).
+    Every non-None result is passed to `on_result(index, result)` from
+    the worker thread that produced it. Driver checkouts are recorded
+    on `tracer` (a metrics.Tracer) when one is given.
+    """
+
+    def __init__(
+        self,
+        pool: DriverPool,
+        handler: Callable[[object, object], Optional[Dict]],
+        on_result: Callable[[int, Dict], None],
+        workers: int = 4,
+        deadline: Optional[float] = None,
+        log: Callable[[str], None] = logger.info,
+        tracer=None,
+    ):
+        self.pool = pool
+        self.tracer = tracer
+        self.handler = handler
+        self.on_result = on_result
+        self.deadline = deadline
+        self.log = log
+        self.processed = 0
+        self._work: "queue.Queue" = queue.Queue()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, args=(n + 1,), name=f"detail-worker-{n + 1}", daemon=True)
+            for n in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, index: int, item):
+        """Queue one item; `index` identifies it in on_result callbacks"""
+        self._work.put((index, item))
+
+    def close(self):
+        """Signal that no more items will be submitted"""
+        for _ in self._threads:
+            self._work.put(_DONE)
+
+    def stop(self):
+        """Ask workers to finish their current item and exit"""
+        self._stop.set()
+        self.close()
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for every worker thread to exit"""
+        end = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            thread.join(None if end is None else max(0, end - time.time()))
+
+    def is_alive(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _expired(self) -> bool:
+        return self._stop.is_set() or (self.deadline is not None and time.time() >= self.deadline)
+
+    def _run(self, worker_id: int):
+        pooled = None
+        try:
+            pooled = self.pool.checkout(tracer=self.tracer)
+        except Exception as e:
+            self.log(f"⚠️ Detail worker {worker_id} could not get a driver: {e}")
+            return
+        try:
+            while not self._expired():
+                try:
+                    entry = self._work.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if entry is _DONE:
+                    return
+                index, item = entry
+                failed = False
+                try:
+                    result = self.handler(pooled.driver, item)
+                except Exception as e:
+                    self.log(f"⚠️ Error scraping business card {index + 1}: {e}")
+                    result, failed = None, True
+                finally:
+                    with self._lock:
+                        self.processed += 1
+                if result is not None:
+                    self.on_result(index, result)
+                # A failed page still counts towards recycling; a dead driver is replaced at once
+                if (failed and not self.pool.is_healthy(pooled)) or self.pool.page_done(pooled):
+                    self.pool.checkin(pooled, healthy=False)
+                    pooled = None
+                    pooled = self.pool.checkout(tracer=self.tracer)
+        except Exception as e:
+            self.log(f"⚠️ Detail worker {worker_id} stopped: {e}")
+        finally:
+            if pooled is not None:
+                self.pool.checkin(pooled)
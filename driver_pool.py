@@ -0,0 +1,356 @@
+"""
+Reusable Chrome session pool for the Google Maps scraper
+"""
+import logging
+import queue
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from browser_watchdog import PROFILE_PREFIX, browser_memory, kill_orphan_browsers, reap_children
+
+logger = logging.getLogger(__name__)
+
+MAX_TABS = 3  # a browser with more open tabs than this is leaking them
+# Site storage cleared on every checkin besides that of the pages left open
+RESET_ORIGINS = ("https://www.google.com", "https://consent.google.com")
+
+
+def _free_port() -> int:
+    """Ask the OS for a currently unused TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class PooledDriver:
+    """A pooled browser plus the resources it owns"""
+
+    def __init__(self, driver, debug_port: int, profile_dir: str):
+        self.driver = driver
+        self.debug_port = debug_port
+        self.profile_dir = profile_dir
+        self.created_at = time.time()
+        self.jobs_served = 0
+        self.pages_served = 0
+        self.memory: Dict = {}  # latest browser_watchdog.browser_memory reading
+        self.startup_seconds = 0.0
+        self.startup_reported = False
+
+    def quit(self):
+        """Shut the browser down and remove its profile directory"""
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit driver on port {self.debug_port}: {e}")
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class DriverPool:
+    """Thread-safe pool of pre-warmed Chrome drivers
+
+    Each browser gets its own remote debugging port and user profile
+    directory so concurrent scrapes never collide. Drivers are health
+    checked on checkout and reset (extra tabs closed, cookies cleared)
+    on checkin.
+
+    A browser is recycled once it has served `max_pages` pages or, checked
+    every `memory_check_pages` pages, its process tree's PSS exceeds
+    `max_rss_mb` or it has more than MAX_TABS tabs open. Pages are counted
+    by `page_done` only; a `driver()` block counts as one page. Every
+    `watchdog_seconds` a background sweep reaps exited child processes,
+    kills orphaned pool browsers and recycles bloated idle ones.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., object],
+        size: int = 2,
+        max_size: Optional[int] = None,
+        checkout_timeout: float = 60.0,
+        warm: bool = True,
+        max_pages: Optional[int] = None,
+        max_rss_mb: Optional[float] = None,
+        memory_check_pages: int = 10,
+        watchdog_seconds: Optional[float] = None,
+    ):
+        self.factory = factory
+        self.size = size
+        self.max_size = max(max_size or size, size)
+        self.checkout_timeout = checkout_timeout
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.memory_check_pages = max(1, memory_check_pages)
+        self.watchdog_seconds = watchdog_seconds
+        self._idle: "queue.LifoQueue[PooledDriver]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._in_use: Dict[int, PooledDriver] = {}
+        self._recycled: Counter = Counter()
+        self._reaped = 0
+        self._orphans_killed = 0
+        self._stop_watchdog = threading.Event()
+        if warm:
+            self.warm()
+        if watchdog_seconds:
+            threading.Thread(target=self._watch, name="driver-watchdog", daemon=True).start()
+
+    def warm(self, count: Optional[int] = None):
+        """Start browsers until `count` (default: pool size) are idle"""
+        target = self.size if count is None else count
+        while self._idle.qsize() < target:
+            pooled = self._spawn()
+            if pooled is None:
+                break
+            self._idle.put(pooled)
+
+    def _spawn(self) -> Optional[PooledDriver]:
+        """Launch a new browser if the pool has room for it"""
+        with self._lock:
+            if self._closed or self._created >= self.max_size:
+                return None
+            self._created += 1
+        port = _free_port()
+        profile_dir = tempfile.mkdtemp(prefix=PROFILE_PREFIX)
+        started = time.time()
+        try:
+            driver = self.factory(debug_port=port, profile_dir=profile_dir)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+        logger.info(f"Started pooled driver on port {port}")
+        pooled = PooledDriver(driver, port, profile_dir)
+        pooled.startup_seconds = time.time() - started
+        return pooled
+
+    def _discard(self, pooled: PooledDriver):
+        """Quit a browser and free its slot"""
+        pooled.quit()
+        with self._lock:
+            self._created -= 1
+
+    def is_healthy(self, pooled: PooledDriver) -> bool:
+        """Check the browser still answers WebDriver commands"""
+        try:
+            pooled.driver.execute_script("return 1")
+            return len(pooled.driver.window_handles) > 0
+        except Exception:
+            return False
+
+    def _recycle_reason(self, pooled: PooledDriver, check_memory: bool) -> Optional[tuple]:
+        """Why a browser is due for replacement, as (reason, detail), or None"""
+        reason = None
+        if self.max_pages and pooled.pages_served >= self.max_pages:
+            reason, detail = "pages", f"served {pooled.pages_served} pages"
+        elif check_memory:
+            pooled.memory = browser_memory(pooled.driver)
+            used = pooled.memory["pss_bytes"]
+            if used is None:
+                used = pooled.memory["js_heap_bytes"]
+            tabs = pooled.memory["tabs"]
+            if self.max_rss_mb and used is not None and used > self.max_rss_mb * 1024 * 1024:
+                reason, detail = "memory", f"using {used / 1024 / 1024:.0f} MB"
+            elif tabs is not None and tabs > MAX_TABS:
+                reason, detail = "tabs", f"{tabs} tabs open"
+        return None if reason is None else (reason, detail)
+
+    def _count_recycle(self, pooled: PooledDriver, reason: str, detail: str):
+        """Log and count a browser about to be recycled"""
+        logger.info(f"Recycling driver on port {pooled.debug_port}: {detail}")
+        with self._lock:
+            self._recycled[reason] += 1
+
+    def _should_recycle(self, pooled: PooledDriver, check_memory: bool) -> bool:
+        """Whether a browser is due for replacement; logs and counts the reason"""
+        found = self._recycle_reason(pooled, check_memory)
+        if found is None:
+            return False
+        self._count_recycle(pooled, *found)
+        return True
+
+    def page_done(self, pooled: PooledDriver) -> bool:
+        """Count a page served by a checked-out driver; True if it should be recycled now
+
+        The caller recycles it with `checkin(pooled, healthy=False)` and a
+        fresh `checkout()`.
+        """
+        pooled.pages_served += 1
+        return self._should_recycle(pooled, pooled.pages_served % self.memory_check_pages == 0)
+
+    def _reset(self, pooled: PooledDriver) -> bool:
+        """Bring a browser back to a single blank tab with no cookies or site storage
+
+        delete_all_cookies() only reaches the current page's origin, so
+        cookies are cleared browser-wide over CDP, along with the storage
+        of the pages that were open and of RESET_ORIGINS.
+        """
+        driver = pooled.driver
+        try:
+            origins = set(RESET_ORIGINS)
+            handles = driver.window_handles
+            for handle in reversed(handles):
+                driver.switch_to.window(handle)
+                url = urlparse(driver.current_url)
+                if url.scheme in ("http", "https"):
+                    origins.add(f"{url.scheme}://{url.netloc}")
+                if handle != handles[0]:
+                    driver.close()
+            driver.get("about:blank")
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in sorted(origins):
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reset driver on port {pooled.debug_port}: {e}")
+            return False
+
+    def checkout(self, timeout: Optional[float] = None, tracer=None) -> PooledDriver:
+        """Take a healthy driver from the pool, starting one if needed
+
+        With a metrics.Tracer, the wait is recorded as a driver_checkout
+        span and a driver's startup time as driver_startup on first use.
+        """
+        started = time.time()
+        deadline = started + (self.checkout_timeout if timeout is None else timeout)
+        while True:
+            if self._closed:
+                raise RuntimeError("Driver pool is closed")
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                pooled = self._spawn()
+                if pooled is None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a free driver")
+                    try:
+                        pooled = self._idle.get(timeout=min(remaining, 1.0))
+                    except queue.Empty:
+                        continue
+
+            if self.is_healthy(pooled):
+                with self._lock:
+                    self._in_use[id(pooled)] = pooled
+                if tracer is not None:
+                    tracer.record("driver_checkout", started, time.time() - started)
+                    if not pooled.startup_reported:
+                        pooled.startup_reported = True
+                        tracer.record("driver_startup", started, pooled.startup_seconds)
+                return pooled
+
+            logger.warning(f"Discarding unhealthy driver on port {pooled.debug_port}")
+            self._discard(pooled)
+
+    def checkin(self, pooled: PooledDriver, healthy: bool = True):
+        """Return a driver to the pool after resetting it"""
+        with self._lock:
+            tracked = self._in_use.pop(id(pooled), None) is not None
+        if not tracked and self._closed:
+            return  # already quit by close()
+        pooled.jobs_served += 1
+        if self._closed or not healthy or not self._reset(pooled):
+            self._discard(pooled)
+            return
+        if self._should_recycle(pooled, check_memory=self.max_rss_mb is not None):
+            self._discard(pooled)
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None, tracer=None):
+        """Context manager yielding a raw WebDriver from the pool; counts as one page"""
+        pooled = self.checkout(timeout, tracer=tracer)
+        healthy = True
+        try:
+            yield pooled.driver
+        except Exception:
+            healthy = self.is_healthy(pooled)
+            raise
+        finally:
+            if healthy and self.page_done(pooled):
+                healthy = False
+            self.checkin(pooled, healthy=healthy)
+
+    def _take_idle(self, pooled: PooledDriver) -> bool:
+        """Remove one specific driver from the idle queue if it is still there"""
+        with self._idle.mutex:
+            try:
+                self._idle.queue.remove(pooled)
+            except ValueError:
+                return False
+            self._idle.not_full.notify()
+            return True
+
+    def sweep(self):
+        """Reap exited children, kill orphaned browsers and recycle bloated idle ones
+
+        Idle drivers stay available while they are measured; only the ones
+        being recycled are taken out of the queue, and only if no checkout
+        got to them first.
+        """
+        reaped = reap_children()
+        with self._idle.mutex:
+            idle: List[PooledDriver] = list(self._idle.queue)
+        with self._lock:
+            live = {pooled.profile_dir for pooled in self._in_use.values()}
+        live.update(pooled.profile_dir for pooled in idle)
+        killed = kill_orphan_browsers(live)
+        recycled = 0
+        for pooled in idle:
+            if self._closed:
+                break
+            found = self._recycle_reason(pooled, check_memory=True)
+            if found is not None and self._take_idle(pooled):
+                self._count_recycle(pooled, *found)
+                self._discard(pooled)
+                recycled += 1
+        with self._lock:
+            self._reaped += reaped
+            self._orphans_killed += killed
+        if recycled and not self._closed:
+            self.warm()
+
+    def _watch(self):
+        while not self._stop_watchdog.wait(self.watchdog_seconds):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"Driver watchdog sweep failed: {e}")
+
+    def stats(self) -> Dict:
+        """Current pool occupancy plus recycling and cleanup totals"""
+        with self._lock:
+            return {
+                "created": self._created,
+                "in_use": len(self._in_use),
+                "idle": self._idle.qsize(),
+                "max_size": self.max_size,
+                "recycled": dict(self._recycled),
+                "reaped": self._reaped,
+                "orphans_killed": self._orphans_killed,
+            }
+
+    def close(self):
+        """Quit every browser owned by the pool"""
+        self._stop_watchdog.set()
+        with self._lock:
+            self._closed = True
+            in_use: List[PooledDriver] = list(self._in_use.values())
+            self._in_use.clear()
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+        for pooled in in_use:
+            self._discard(pooled)
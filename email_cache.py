@@ -0,0 +1,152 @@
+"""
+Per-domain cache of harvested website emails
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+NO_EMAIL = "N/A"
+
+# Hosts where each business only owns a path (linktr.ee/<name>, facebook.com/<page>),
+# matched with their subdomains; their pages are cached per path, not per host
+SHARED_HOSTS = {
+    "linktr.ee", "beacons.ai", "taplink.cc", "linkin.bio", "bio.link",
+    "facebook.com", "fb.com", "instagram.com", "twitter.com", "x.com", "linkedin.com",
+    "youtube.com", "tiktok.com", "wa.me", "whatsapp.com", "t.me",
+    "sites.google.com", "g.page", "goo.gl", "maps.app.goo.gl", "bit.ly",
+    "wixsite.com", "justdial.com", "indiamart.com", "sulekha.com",
+}
+
+
+def domain_key(website_url: str) -> str:
+    """Lowercase host of a website without a leading www."""
+    if not website_url.startswith("http"):
+        website_url = "https://" + website_url
+    host = urlparse(website_url).netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def is_shared_host(host: str) -> bool:
+    return any(host == shared or host.endswith("." + shared) for shared in SHARED_HOSTS)
+
+
+def cache_key(website_url: str) -> str:
+    """Cache key for a website: its domain_key, plus path and query on SHARED_HOSTS"""
+    host = domain_key(website_url)
+    if not is_shared_host(host):
+        return host
+    if not website_url.startswith("http"):
+        website_url = "https://" + website_url
+    parts = urlparse(website_url)
+    key = host + parts.path.rstrip("/").lower()
+    return f"{key}?{parts.query}" if parts.query else key
+
+
+class EmailCache:
+    """Thread-safe LRU of site (see cache_key) -> email, backed by DatabaseManager
+
+    Negative results ("N/A") are cached too, with their own shorter TTL,
+    so domains without a public email are not recrawled on every query.
+    The in-memory tier answers lookups; `load()` warms it from SQLite and
+    `persist()` writes back entries added since the last persist.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 30 * 24 * 3600,
+        negative_ttl_seconds: float = 3 * 24 * 3600,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._dirty: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, email: str, cached_at: float, now: float) -> bool:
+        ttl = self.negative_ttl_seconds if email == NO_EMAIL else self.ttl_seconds
+        return now - cached_at > ttl
+
+    def _store(self, domain: str, email: str, cached_at: float):
+        self._entries[domain] = (email, cached_at)
+        self._entries.move_to_end(domain)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, website_url: str) -> Optional[str]:
+        """Cached email (or "N/A") for a website, None on a miss"""
+        domain = cache_key(website_url)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None or self._expired(entry[0], entry[1], now):
+                if entry is not None:
+                    del self._entries[domain]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(domain)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, website_url: str, email: str):
+        """Record the harvest result for a website's cache key"""
+        domain = cache_key(website_url)
+        now = time.time()
+        with self._lock:
+            self._store(domain, email or NO_EMAIL, now)
+            self._dirty[domain] = (email or NO_EMAIL, now)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    async def load(self, db) -> int:
+        """Warm the LRU with unexpired rows from the SQLite tier"""
+        rows = await db.load_email_cache(
+            max_age_seconds=max(self.ttl_seconds, self.negative_ttl_seconds),
+            limit=self.max_entries,
+        )
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            # Rows arrive newest first; insert oldest first so LRU order matches age
+            for domain, email, cached_at in reversed(rows):
+                if not self._expired(email, cached_at, now):
+                    self._store(domain, email, cached_at)
+                    loaded += 1
+        logger.info(f"Loaded {loaded} cached email domains")
+        return loaded
+
+    async def persist(self, db) -> int:
+        """Write entries added since the last persist to the SQLite tier"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        entries = [(domain, email, cached_at) for domain, (email, cached_at) in dirty.items()]
+        try:
+            await db.save_email_cache(entries)
+        except Exception:
+            with self._lock:
+                for domain, entry in dirty.items():
+                    self._dirty.setdefault(domain, entry)
+            raise
+        return len(entries)
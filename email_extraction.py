@@ -0,0 +1,110 @@
+"""
+Fast email extraction from raw HTML
+"""
+import html as html_lib
+import re
+from typing import Iterable, List, Optional, Set, Union
+from urllib.parse import unquote
+
+from email_cache import domain_key
+
+# Scans raw bytes so pages never need to be decoded or parsed into a tree
+EMAIL_BYTES_PATTERN = re.compile(rb"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)+")
+MAILTO_PATTERN = re.compile(rb"mailto:([^\"'?>\s]+)", re.I)
+CFEMAIL_PATTERN = re.compile(rb"data-cfemail=[\"']([0-9a-fA-F]+)[\"']|/cdn-cgi/l/email-protection#([0-9a-fA-F]+)")
+# Entity-encoded "@" and "." as used to hide addresses from naive scrapers
+ENTITY_HINT_PATTERN = re.compile(rb"&#0*64;|&#x0*40;|&commat;", re.I)
+ENTITY_EMAIL_PATTERN = re.compile(
+    rb"[a-zA-Z0-9_.+&#;-]+(?:@|&#0*64;|&#x0*40;|&commat;)[a-zA-Z0-9&#;-]+(?:(?:\.|&#0*46;|&#x0*2e;|&period;)[a-zA-Z0-9&#;-]+)+",
+    re.I,
+)
+
+# JSON/JS string escapes, as in markup embedded in scripts ("\u003e", "\"", "\/")
+JSON_ASCII_ESCAPE_PATTERN = re.compile(rb"\\u00([0-7][0-9a-fA-F])")
+
+HEX_ID_PATTERN = re.compile(r"[0-9a-f]{16,}")
+
+# Things that match the email pattern but are asset names or placeholders
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".bmp", ".avif")
+IGNORED_DOMAINS = {"example.com", "domain.com", "email.com", "sentry.io", "wixpress.com", "sentry-next.wixpress.com"}
+PREFERRED_LOCAL_PARTS = ("info", "contact", "hello", "enquiries", "enquiry", "sales", "office", "admin", "support")
+
+
+def decode_cfemail(encoded: str) -> Optional[str]:
+    """Decode a Cloudflare email-protection hex string"""
+    try:
+        data = bytes.fromhex(encoded)
+        key = data[0]
+        return bytes(b ^ key for b in data[1:]).decode("utf-8")
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+
+
+def unescape_json(page: bytes) -> bytes:
+    """Resolve ASCII \\uXXXX escapes and escaped quotes and slashes in raw bytes"""
+    page = JSON_ASCII_ESCAPE_PATTERN.sub(lambda m: bytes([int(m.group(1), 16)]), page)
+    return page.replace(b'\\"', b'"').replace(b"\\/", b"/")
+
+
+def _clean(candidate: str) -> Optional[str]:
+    email = candidate.strip().strip(".\\").lower()
+    if "@" not in email:
+        return None
+    local, _, domain = email.rpartition("@")
+    if not local or "." not in domain:
+        return None
+    if email.endswith(IMAGE_SUFFIXES) or domain in IGNORED_DOMAINS:
+        return None
+    # "package@1.2.3" version pins and hashed asset ids
+    if domain.split(".")[0].isdigit() or HEX_ID_PATTERN.fullmatch(local):
+        return None
+    return email
+
+
+def find_email_candidates(page: Union[bytes, str]) -> Set[str]:
+    """Every plausible email address in a page's raw HTML"""
+    if isinstance(page, str):
+        page = page.encode("utf-8", errors="ignore")
+    # Otherwise "\u003einfo@acme.com" and "mailto:info@acme.com\"" leak escape residue into matches
+    if b"\\" in page:
+        page = unescape_json(page)
+
+    raw: List[str] = [m.decode("utf-8", errors="ignore") for m in EMAIL_BYTES_PATTERN.findall(page)]
+    for match in MAILTO_PATTERN.findall(page):
+        raw.append(unquote(html_lib.unescape(match.decode("utf-8", errors="ignore"))))
+    for attr_hex, link_hex in CFEMAIL_PATTERN.findall(page):
+        decoded = decode_cfemail((attr_hex or link_hex).decode("ascii"))
+        if decoded:
+            raw.append(decoded)
+    if ENTITY_HINT_PATTERN.search(page):
+        for match in ENTITY_EMAIL_PATTERN.findall(page):
+            raw.append(html_lib.unescape(match.decode("utf-8", errors="ignore")))
+
+    candidates = set()
+    for candidate in raw:
+        email = _clean(candidate)
+        if email:
+            candidates.add(email)
+    return candidates
+
+
+def rank_emails(candidates: Iterable[str], website_url: Optional[str] = None) -> List[str]:
+    """Order candidates best first: same domain, then role inboxes, then shortest"""
+    site = domain_key(website_url) if website_url else ""
+
+    def score(email: str):
+        local, _, domain = email.rpartition("@")
+        same_domain = bool(site) and (domain == site or domain.endswith("." + site) or site.endswith("." + domain))
+        preferred = local in PREFERRED_LOCAL_PARTS
+        return (not same_domain, not preferred, len(email), email)
+
+    return sorted(set(candidates), key=score)
+
+
+def best_email(pages: Iterable[Union[bytes, str]], website_url: Optional[str] = None) -> str:
+    """Best-ranked email across pages, or N/A when none qualifies"""
+    candidates: Set[str] = set()
+    for page in pages:
+        candidates |= find_email_candidates(page)
+    ranked = rank_emails(candidates, website_url)
+    return ranked[0] if ranked else "N/A"
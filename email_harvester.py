@@ -0,0 +1,168 @@
+"""
+HTTP-first email harvester for business websites
+"""
+import logging
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from email_cache import EmailCache
+from email_extraction import find_email_candidates, rank_emails
+
+logger = logging.getLogger(__name__)
+
+CONTACT_PATHS = ["contact"]
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36"
+)
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+
+# Markers of pages whose content only appears after JavaScript runs
+_JS_SHELL_MARKERS = (
+    b"enable javascript",
+    b"javascript is required",
+    b"you need to enable javascript",
+    b"challenge-platform",
+    b"cf-browser-verification",
+)
+_EMPTY_APP_ROOT = re.compile(rb'<div[^>]+id=["\'](?:root|app|__next)["\'][^>]*>\s*</div>', re.I)
+_SCRIPT_OR_STYLE = re.compile(rb"<(script|style|noscript)\b.*?</\1\s*>", re.I | re.S)
+_TAG = re.compile(rb"<[^>]+>")
+_WHITESPACE = re.compile(rb"\s+")
+_MIN_VISIBLE_TEXT = 200
+
+
+def normalize_website(website_url: str) -> str:
+    """Add a scheme to bare website hosts"""
+    if not website_url.startswith("http"):
+        website_url = "https://" + website_url
+    return website_url
+
+
+def looks_js_rendered(html: bytes) -> bool:
+    """Heuristic for pages that are empty shells until scripts run"""
+    lowered = html.lower()
+    if any(marker in lowered for marker in _JS_SHELL_MARKERS):
+        return True
+    if _EMPTY_APP_ROOT.search(html):
+        return True
+    if b"<script" not in lowered:
+        return False
+    text = _WHITESPACE.sub(b" ", _TAG.sub(b" ", _SCRIPT_OR_STYLE.sub(b" ", html))).strip()
+    return len(text) < _MIN_VISIBLE_TEXT
+
+
+class EmailHarvester:
+    """Concurrent website email harvester over pooled keep-alive HTTP
+
+    Homepage and contact pages are fetched with a shared requests.Session
+    whose connection pool is sized to the global concurrency limit. A
+    per-host semaphore keeps us polite to any single site. Pages that are
+    clearly rendered client-side are handed to `browser_fallback`, a
+    callable taking the website URL and returning an email, "N/A" when the
+    rendered site has none, or None when it could not be rendered.
+    With a `cache`, known domains are answered without any request; only
+    sites that were actually read are cached, so a miss caused by a
+    network error or a busy browser pool is retried next time.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        per_host_limit: int = 2,
+        timeout: float = 10.0,
+        browser_fallback: Optional[Callable[[str], Optional[str]]] = None,
+        cache: Optional[EmailCache] = None,
+    ):
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.browser_fallback = browser_fallback
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="email-harvest")
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self.stats = {"http": 0, "browser_fallback": 0, "errors": 0}
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def fetch(self, url: str) -> Optional[bytes]:
+        """GET a page over the pooled session, capped at MAX_PAGE_BYTES"""
+        with self._host_limit(url):
+            try:
+                with self.session.get(url, timeout=self.timeout, stream=True, allow_redirects=True) as response:
+                    content_type = response.headers.get("Content-Type", "")
+                    if "html" not in content_type and "text" not in content_type:
+                        return None
+                    return response.raw.read(MAX_PAGE_BYTES, decode_content=True)
+            except Exception as e:
+                self._count("errors")
+                logger.debug(f"HTTP fetch failed for {url}: {e}")
+                return None
+
+    def harvest(self, website_url: str) -> str:
+        """Return one email for a website, or N/A when none is found"""
+        if not website_url or website_url == "N/A":
+            return "N/A"
+        website_url = normalize_website(website_url)
+        if self.cache is not None:
+            cached = self.cache.get(website_url)
+            if cached is not None:
+                return cached
+
+        email, checked = self._crawl(website_url)
+        if self.cache is not None and checked:
+            self.cache.put(website_url, email)
+        return email
+
+    def _crawl(self, website_url: str) -> Tuple[str, bool]:
+        """Crawl homepage and contact pages; also report whether the site was actually read"""
+        found_emails: Set[str] = set()
+        checked = False
+        for url in [website_url] + [urljoin(website_url, path) for path in CONTACT_PATHS]:
+            html = self.fetch(url)
+            if html is None:
+                continue
+            checked = True
+            if url == website_url and looks_js_rendered(html) and self.browser_fallback:
+                self._count("browser_fallback")
+                email = self.browser_fallback(website_url)
+                if email is None:
+                    self._count("errors")
+                    return "N/A", False
+                return email, True
+            self._count("http")
+            found_emails.update(find_email_candidates(html))
+            if found_emails:
+                break
+
+        ranked = rank_emails(found_emails, website_url)
+        return (ranked[0] if ranked else "N/A"), checked
+
+    def submit(self, website_url: str) -> "Future[str]":
+        """Harvest in the background; the future resolves like harvest()"""
+        return self._executor.submit(self.harvest, website_url)
+
+    def close(self):
+        """Stop background workers and close pooled connections"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,118 @@
+"""
+Streaming exports of scraped leads to CSV, NDJSON and Parquet
+"""
+import csv
+import io
+import json
+import logging
+from typing import AsyncIterator, Iterable, Iterator, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+DEFAULT_CHUNK_SIZE = 5000
+
+
+async def iter_chunks(db, sql: str, params: Sequence = (), chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[List[tuple]]:
+    """Yield query results from an aiosqlite connection chunk_size rows at a time"""
+    async with db.execute(sql, params) as cursor:
+        while True:
+            rows = await cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [tuple(row) for row in rows]
+
+
+def iter_csv_chunks(rows: Iterable[Sequence], header: Sequence[str], chunk_size: int = 1000) -> Iterator[bytes]:
+    """Encode rows as UTF-8 CSV (with BOM, for Excel), one chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson_chunks(rows: Iterable[Sequence], header: Sequence[str], chunk_size: int = 1000) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON objects keyed by header"""
+    lines: List[str] = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(header, row)), ensure_ascii=False))
+        if len(lines) >= chunk_size:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class ExportWriter:
+    """Incremental writer for one export file in a given format"""
+
+    def __init__(self, filename: str, header: Sequence[str], fmt: str = "csv"):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        self.filename = filename
+        self.header = list(header)
+        self.fmt = fmt
+        self.rows_written = 0
+        self._file = None
+        self._parquet = None
+
+    def __enter__(self) -> "ExportWriter":
+        if self.fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        else:
+            self._file = open(self.filename, "wb")
+            if self.fmt == "csv":
+                self._file.write(next(iter_csv_chunks([], self.header)))
+        return self
+
+    def write(self, rows: List[Sequence]):
+        """Append one chunk of rows"""
+        if not rows:
+            return
+        if self.fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            self._file.write(buffer.getvalue().encode("utf-8"))
+        elif self.fmt == "ndjson":
+            for chunk in iter_ndjson_chunks(rows, self.header, chunk_size=len(rows)):
+                self._file.write(chunk)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            columns = list(zip(*rows))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array([None if value is None else str(value) for value in column], type=pa.string())
+                 for column in columns],
+                names=self.header,
+            )
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.filename, batch.schema)
+            self._parquet.write_batch(batch)
+        self.rows_written += len(rows)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file is not None:
+            self._file.close()
+        if self.fmt == "parquet":
+            if self._parquet is None:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                schema = pa.schema([(name, pa.string()) for name in self.header])
+                self._parquet = pq.ParquetWriter(self.filename, schema)
+            self._parquet.close()
@@ -0,0 +1,100 @@
+"""
+Single-roundtrip DOM extraction for Google Maps pages
+"""
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Declarative selector tables. Each field names a CSS selector and the DOM
+# property (or "@attribute") to read from the first match. Fix selector
+# drift here rather than in the scraping loop.
+PLACE_SELECTORS: Dict[str, Dict] = {
+    "Name": {"css": "h1.DUwDvf", "read": "innerText"},
+    "Address": {"css": 'button[aria-label*="Address"]', "read": "innerText"},
+    "Phone": {"css": 'button[aria-label*="Phone"]', "read": "innerText"},
+    "Website": {"css": 'a[data-tooltip="Open website"]', "read": "href"},
+    "Rating": {"css": 'span[aria-label*="star rating"]', "read": "innerText"},
+    "Email": {"css": 'a[href^="mailto:"]', "read": "href", "strip_prefix": "mailto:"},
+}
+
+FEED_CARD_SELECTOR = 'a[href*="/maps/place/"]'
+FEED_CARD_CONTAINER = 'div[role="article"], div.Nv2PK'
+
+# Fields read from each feed card. A null css means "read from the card anchor
+# itself"; otherwise the selector is resolved inside the card's container.
+FEED_SELECTORS: Dict[str, Dict] = {
+    "Name": {"css": None, "read": "@aria-label"},
+    "Rating": {"css": 'span[role="img"][aria-label*="star"]', "read": "@aria-label"},
+}
+
+_READ_FIELD_JS = """
+function readField(root, spec) {
+    var el = spec.css ? root.querySelector(spec.css) : root;
+    if (!el) return null;
+    var value = spec.read.charAt(0) === '@'
+        ? el.getAttribute(spec.read.slice(1))
+        : el[spec.read];
+    if (value === null || value === undefined) return null;
+    value = String(value).trim();
+    if (spec.strip_prefix && value.indexOf(spec.strip_prefix) === 0) {
+        value = value.slice(spec.strip_prefix.length);
+    }
+    return value || null;
+}
+"""
+
+_PLACE_JS = _READ_FIELD_JS + """
+var selectors = arguments[0];
+var out = {};
+for (var field in selectors) {
+    try { out[field] = readField(document, selectors[field]); }
+    catch (e) { out[field] = null; }
+}
+return out;
+"""
+
+_FEED_JS = _READ_FIELD_JS + """
+var cardSelector = arguments[0], containerSelector = arguments[1], fields = arguments[2];
+var seen = {}, cards = [];
+var anchors = document.querySelectorAll(cardSelector);
+for (var i = 0; i < anchors.length; i++) {
+    var a = anchors[i];
+    var href = a.href;
+    if (!href || seen[href]) continue;
+    seen[href] = true;
+    var container = a.closest(containerSelector) || a.parentElement || a;
+    var card = {href: href};
+    for (var field in fields) {
+        var spec = fields[field];
+        try { card[field] = readField(spec.css ? container : a, spec); }
+        catch (e) { card[field] = null; }
+    }
+    cards.push(card);
+}
+return cards;
+"""
+
+
+def extract_place_details(driver, selectors: Dict[str, Dict] = PLACE_SELECTORS) -> Dict[str, str]:
+    """Read every place field in one execute_script call; missing fields become N/A"""
+    try:
+        raw = driver.execute_script(_PLACE_JS, selectors) or {}
+    except Exception as e:
+        logger.warning(f"Place extraction script failed: {e}")
+        raw = {}
+    return {field: raw.get(field) or "N/A" for field in selectors}
+
+
+def extract_feed_cards(
+    driver,
+    card_selector: str = FEED_CARD_SELECTOR,
+    container_selector: str = FEED_CARD_CONTAINER,
+    fields: Dict[str, Dict] = FEED_SELECTORS,
+) -> List[Dict[str, str]]:
+    """Return href plus feed fields for every unique place card in one call"""
+    cards = driver.execute_script(_FEED_JS, card_selector, container_selector, fields) or []
+    return [
+        {"href": card["href"], **{field: card.get(field) or "N/A" for field in fields}}
+        for card in cards
+    ]
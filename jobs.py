@@ -0,0 +1,241 @@
+"""
+Background scrape jobs backed by the scrape_sessions table
+
+Usage: python jobs.py [--db leads.db] [--workers 2]
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+from database import DEFAULT_DB_PATH, DatabaseManager, run_sync
+from metrics import Tracer
+
+logger = logging.getLogger(__name__)
+
+JOB_CONCURRENCY = 2
+POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 2.0
+STALE_JOB_SECONDS = 300
+
+
+def submit_job(query: str, owner: str = "anonymous", db_path: str = DEFAULT_DB_PATH) -> int:
+    """Queue a scrape from synchronous code; returns the session id"""
+    return run_sync(lambda db: db.enqueue_job(query, owner), db_path)
+
+
+def poll_job(session_id: int, db_path: str = DEFAULT_DB_PATH, after_id: int = 0) -> Dict:
+    """Current session row plus the businesses written after member_id `after_id`
+
+    Pass the member_id of the last business seen to read only new rows.
+    """
+    async def _poll(db: DatabaseManager):
+        return {
+            "session": await db.get_session_stats(session_id),
+            "businesses": await db.get_businesses_by_session(session_id, after_id=after_id),
+        }
+    # Read-only: skip initialize() so polling never takes the write lock
+    return run_sync(_poll, db_path, initialize=False)
+
+
+class WorkerStopping(Exception):
+    """The worker was asked to stop while a job was running"""
+
+
+async def _next_record(stream, stop: Optional[threading.Event]) -> Optional[Dict]:
+    """The scrape's next record, None when it is done; raises WorkerStopping once `stop` is set"""
+    fetch = asyncio.ensure_future(asyncio.to_thread(next, stream, None))
+    while True:
+        done, _ = await asyncio.wait({fetch}, timeout=POLL_INTERVAL)
+        if done:
+            return fetch.result()
+        if stop is not None and stop.is_set():
+            raise WorkerStopping()
+
+
+async def run_job(db: DatabaseManager, job: Dict, worker_id: str, stop: Optional[threading.Event] = None):
+    """Scrape one claimed job, writing businesses as they stream in
+
+    When `stop` is set mid-scrape, what was found so far is written and
+    the job goes back in the queue for another worker.
+    """
+    # Imported here so only worker processes pay for Selenium
+    from scraper import get_email_cache, iter_scrape_google_maps
+
+    session_id, query = job["id"], job["query"]
+    latest_progress: Dict = {}
+    skipped: collections.deque = collections.deque()
+    tracer = Tracer()
+    db.tracer = tracer
+    stream = iter_scrape_google_maps(
+        query,
+        logger=lambda message: logger.info(f"[{worker_id} job {session_id}] {message}"),
+        on_progress=latest_progress.update,
+        tracer=tracer,
+        on_skip=skipped.append,
+    )
+    found = 0
+
+    # On a timer rather than per record: a scrape can go minutes without a
+    # lead, and must neither look stale nor freeze the UI's progress meanwhile
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                while skipped:
+                    await db.insert_skipped_entry(skipped.popleft(), session_id)
+                await db.heartbeat_job(session_id, dict(latest_progress) or None)
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {session_id} failed: {e}")
+
+    beating = asyncio.create_task(heartbeat())
+    try:
+        while True:
+            record = await _next_record(stream, stop)
+            if record is None:
+                break
+            found += 1
+            await db.insert_business(dict(record, query=query), session_id)
+            while skipped:
+                await db.insert_skipped_entry(skipped.popleft(), session_id)
+        beating.cancel()
+        while skipped:
+            await db.insert_skipped_entry(skipped.popleft(), session_id)
+        await db.heartbeat_job(session_id, dict(latest_progress))
+        await db.end_session(session_id, status="completed", total_businesses=found, successful_scrapes=found)
+    except WorkerStopping:
+        logger.info(f"Job {session_id} stopped with its worker after {found} leads; queued again")
+        while skipped:
+            await db.insert_skipped_entry(skipped.popleft(), session_id)
+        await db.flush()
+        await db.update_session(session_id, status="queued", worker_id=None)
+    except Exception as e:
+        logger.exception(f"Job {session_id} failed")
+        while skipped:
+            await db.insert_skipped_entry(skipped.popleft(), session_id)
+        await db.end_session(session_id, status="failed", error=str(e), total_businesses=found)
+    finally:
+        beating.cancel()
+        try:
+            stream.close()
+        except ValueError:
+            pass  # still running in a to_thread worker after cancellation
+        db.tracer = None
+        try:
+            await db.save_spans(session_id, tracer.spans())
+        except Exception as e:
+            logger.warning(f"Could not save metrics for job {session_id}: {e}")
+        try:
+            await get_email_cache().persist(db)
+        except Exception as e:
+            logger.warning(f"Could not save the email cache after job {session_id}: {e}")
+
+
+async def worker_loop(db_path: str, worker_id: str, stop: Optional[threading.Event] = None):
+    """Claim and run jobs until `stop` is set"""
+    from scraper import get_email_cache
+
+    async with DatabaseManager(db_path) as db:
+        requeued = await db.requeue_stale_jobs(STALE_JOB_SECONDS)
+        if requeued:
+            logger.info(f"{worker_id} requeued {requeued} stale jobs")
+        # Domains harvested by earlier runs and other workers are not crawled again
+        try:
+            await get_email_cache().load(db)
+        except Exception as e:
+            logger.warning(f"{worker_id} could not load the email cache: {e}")
+        while stop is None or not stop.is_set():
+            job = await db.claim_next_job(worker_id)
+            if job is None:
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            logger.info(f"{worker_id} claimed job {job['id']} ({job['owner']}): {job['query']}")
+            await run_job(db, job, worker_id, stop)
+    logger.info(f"{worker_id} stopped")
+
+
+def _worker_main(db_path: str, worker_id: str, stop: Optional[threading.Event] = None):
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(worker_loop(db_path, worker_id, stop))
+    except KeyboardInterrupt:
+        pass
+
+
+class JobWorkerPool:
+    """Fixed number of worker processes draining the job queue
+
+    The process count is the concurrency cap: at most `concurrency`
+    scrapes (and their browser pools) run at once on this box, however
+    many users submit jobs. `stop()` asks the workers to finish up
+    (write buffered rows, save the email cache, requeue an unfinished
+    job) and only terminates the ones that do not exit in time.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, concurrency: int = JOB_CONCURRENCY):
+        self.db_path = db_path
+        self.concurrency = concurrency
+        # spawn, not fork: the parent may be a threaded Streamlit server
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self._stop = self._context.Event()
+
+    def start(self):
+        """Start any worker processes that are not running"""
+        self._processes = [p for p in self._processes if p.is_alive()]
+        host = socket.gethostname()
+        while len(self._processes) < self.concurrency:
+            worker_id = f"{host}-{os.getpid()}-w{len(self._processes) + 1}-{int(time.time())}"
+            process = self._context.Process(
+                target=_worker_main, args=(self.db_path, worker_id, self._stop), name=worker_id, daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+
+    def stop(self, timeout: float = 10.0):
+        """Stop worker processes, terminating any still running after `timeout` seconds"""
+        self._stop.set()
+        deadline = time.time() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.time()))
+        for process in self._processes:
+            if process.is_alive():
+                logger.warning(f"Terminating job worker {process.name}, which did not stop in {timeout:.0f}s")
+                process.terminate()
+                process.join(1.0)
+        self._processes = []
+        self._stop = self._context.Event()
+
+    def alive(self) -> int:
+        return sum(1 for p in self._processes if p.is_alive())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background scrape workers")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--workers", type=int, default=JOB_CONCURRENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    run_sync(lambda db: db.flush(), args.db)  # create or migrate the schema before workers start
+
+    pool = JobWorkerPool(args.db, args.workers)
+    pool.start()
+    logger.info(f"Started {args.workers} job workers on {args.db}")
+    try:
+        while True:
+            time.sleep(5)
+            pool.start()  # replace any worker that died
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Tracing spans and metrics export for the Google Maps scraper
+
+A Tracer collects timed spans for one scrape (driver startup, search,
+scroll, card, email_crawl, db_flush, ...). Spans are saved per session
+in the scrape_metrics table, and `python metrics.py` serves the recent
+ones in Prometheus text format.
+
+Usage: python metrics.py [--db leads.db] [--port 9464]
+"""
+import argparse
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Sequence
+
+from database import DEFAULT_DB_PATH, run_sync
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = 9464
+METRICS_WINDOW_SECONDS = 24 * 60 * 60
+SPAN_HISTORY = 1000  # recent durations kept per span name for quantiles
+
+
+def summarize(durations: Sequence[float], errors: int = 0) -> Dict:
+    """count, errors, total, mean, p50, p95 and max of a list of seconds"""
+    values = sorted(durations)
+    if not values:
+        return {"count": 0, "errors": errors, "total": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    total = sum(values)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "total": total,
+        "mean": total / len(values),
+        "p50": values[(len(values) - 1) // 2],
+        "p95": values[max(0, int(round(0.95 * len(values))) - 1)],
+        "max": values[-1],
+    }
+
+
+class MetricsRegistry:
+    """Process-wide span totals with a bounded history for quantiles"""
+
+    def __init__(self, history: int = SPAN_HISTORY):
+        self.history = history
+        self._recent: Dict[str, Deque[float]] = {}
+        self._totals: Dict[str, List[float]] = {}  # name -> [count, seconds, errors]
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        with self._lock:
+            self._recent.setdefault(name, deque(maxlen=self.history)).append(seconds)
+            totals = self._totals.setdefault(name, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += 0 if ok else 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Per-name summary; count, total and errors cover the whole process lifetime"""
+        with self._lock:
+            recent = {name: list(values) for name, values in self._recent.items()}
+            totals = {name: list(values) for name, values in self._totals.items()}
+        snapshot = {}
+        for name, values in recent.items():
+            summary = summarize(values, errors=totals[name][2])
+            summary["count"], summary["total"] = totals[name][0], totals[name][1]
+            snapshot[name] = summary
+        return snapshot
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Tracer:
+    """Timed spans for one scrape, also counted in a parent registry
+
+    Safe to share between the scrape's worker threads. Span offsets are
+    seconds since the tracer was created.
+    """
+
+    def __init__(self, parent: Optional[MetricsRegistry] = REGISTRY):
+        self.parent = parent
+        self.started = time.time()
+        self._spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time the block; the yielded dict can collect extra attributes"""
+        start = time.time()
+        ok = True
+        try:
+            yield attrs
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.record(name, start, time.time() - start, ok, attrs)
+
+    def record(self, name: str, start: float, seconds: float, ok: bool = True, attrs: Optional[Dict] = None):
+        """Add a span measured elsewhere, e.g. across a callback"""
+        span = {
+            "name": name,
+            "offset": start - self.started,
+            "seconds": seconds,
+            "ok": ok,
+            "attrs": dict(attrs or {}),
+        }
+        with self._lock:
+            self._spans.append(span)
+        if self.parent is not None:
+            self.parent.record(name, seconds, ok)
+
+    def spans(self) -> List[Dict]:
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self) -> Dict[str, Dict]:
+        by_name: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        for span in self.spans():
+            by_name.setdefault(span["name"], []).append(span["seconds"])
+            errors[span["name"]] = errors.get(span["name"], 0) + (0 if span["ok"] else 1)
+        return {name: summarize(values, errors[name]) for name, values in by_name.items()}
+
+    def format_summary(self) -> str:
+        parts = [
+            f"{name} n={s['count']} total={s['total']:.1f}s p95={s['p95']:.2f}s"
+            for name, s in sorted(self.summary().items(), key=lambda item: -item[1]["total"])
+        ]
+        return "📈 Spans: " + ("; ".join(parts) if parts else "none")
+
+
+def render_prometheus(summaries: Dict[str, Dict], metric: str = "scrapu_span_seconds") -> str:
+    """Prometheus text exposition of span summaries"""
+    lines = [
+        f"# HELP {metric} Duration of scraper phases in seconds",
+        f"# TYPE {metric} summary",
+    ]
+    for name, summary in sorted(summaries.items()):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'{metric}{{span="{label}",quantile="0.5"}} {summary["p50"]:.6f}')
+        lines.append(f'{metric}{{span="{label}",quantile="0.95"}} {summary["p95"]:.6f}')
+        lines.append(f'{metric}_sum{{span="{label}"}} {summary["total"]:.6f}')
+        lines.append(f'{metric}_count{{span="{label}"}} {summary["count"]}')
+    lines.append(f"# HELP {metric.replace('_seconds', '_errors')}_total Spans that raised")
+    lines.append(f"# TYPE {metric.replace('_seconds', '_errors')}_total counter")
+    for name, summary in sorted(summaries.items()):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'{metric.replace("_seconds", "_errors")}_total{{span="{label}"}} {summary["errors"]}')
+    return "\n".join(lines) + "\n"
+
+
+def load_summaries(db_path: str = DEFAULT_DB_PATH, window_seconds: Optional[float] = METRICS_WINDOW_SECONDS,
+                   session_id: Optional[int] = None) -> Dict[str, Dict]:
+    """Span summaries from the database, for one session and/or a recent window; None means no window"""
+    durations = run_sync(
+        lambda db: db.get_span_durations(session_id=session_id, window_seconds=window_seconds), db_path
+    )
+    return {name: summarize(values, errors) for name, (values, errors) in durations.items()}
+
+
+def serve_metrics(db_path: str = DEFAULT_DB_PATH, port: int = METRICS_PORT,
+                  window_seconds: float = METRICS_WINDOW_SECONDS) -> ThreadingHTTPServer:
+    """Serve /metrics from the database in a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(load_summaries(db_path, window_seconds)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve scrape span metrics in Prometheus text format")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--port", type=int, default=METRICS_PORT)
+    parser.add_argument("--window", type=float, default=METRICS_WINDOW_SECONDS, help="seconds of history")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = serve_metrics(args.db, args.port, args.window)
+    logger.info(f"Serving http://localhost:{args.port}/metrics from {args.db}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
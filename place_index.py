@@ -0,0 +1,80 @@
+"""
+Cross-session index of places that have already been scraped
+
+Re-running a query mostly turns up places whose details we already have.
+The known_places table remembers every place page that was read, keyed
+on its Maps feature id or CID; PlaceIndex loads the recently scraped
+keys into a set at startup so the scraper can skip those cards without
+opening them. Places last read more than `refresh_days` ago are not
+loaded and are scraped again.
+"""
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database import DatabaseManager, place_key
+
+logger = logging.getLogger(__name__)
+
+KNOWN_PLACE_REFRESH_DAYS = 7
+
+
+def href_place_key(href: str) -> Optional[str]:
+    """Feature id/CID key for a place link, or None when the link has neither"""
+    key = place_key({"href": href})
+    return key if key.startswith(("fid:", "cid:")) else None
+
+
+class PlaceIndex:
+    """In-memory set of recently scraped place keys plus visits not yet saved
+
+    Thread-safe, so detail workers can record places as they read them.
+    A plain set is exact and costs well under 100 bytes per place, which
+    is small enough for millions of places, so no Bloom filter is needed.
+    """
+
+    def __init__(self, keys: Iterable[str] = (), refresh_days: Optional[float] = KNOWN_PLACE_REFRESH_DAYS):
+        self.refresh_days = refresh_days
+        self._keys = set(keys)
+        self._pending: Dict[str, Tuple[str, str, str]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    async def load(cls, db: DatabaseManager, refresh_days: Optional[float] = KNOWN_PLACE_REFRESH_DAYS) -> "PlaceIndex":
+        """Index of places scraped within `refresh_days` (all of them for None)"""
+        keys = await db.get_known_place_keys(max_age_days=refresh_days)
+        logger.info(f"Loaded {len(keys)} known places")
+        return cls(keys, refresh_days)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def is_known(self, href: str) -> bool:
+        key = href_place_key(href)
+        if key is None:
+            return False
+        with self._lock:
+            return key in self._keys
+
+    def record(self, href: str, name: str = ""):
+        """Remember that a place page was read in this run"""
+        key = href_place_key(href)
+        if key is None:
+            return
+        with self._lock:
+            self._keys.add(key)
+            self._pending[key] = (key, href, name)
+
+    def pop_pending(self) -> List[Tuple[str, str, str]]:
+        """(place_key, href, name) rows recorded since the last call"""
+        with self._lock:
+            rows, self._pending = list(self._pending.values()), {}
+        return rows
+
+    async def save(self, db: DatabaseManager) -> int:
+        """Persist recorded visits; returns how many places were written"""
+        rows = self.pop_pending()
+        if rows:
+            await db.save_known_places(rows)
+        return len(rows)
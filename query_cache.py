@@ -0,0 +1,82 @@
+"""
+Cross-session cache of search results for the Google Maps scraper
+
+A search is answered from the businesses table when a completed session
+for the same normalized query stored at least one business:
+
+- fresh (younger than `fresh_seconds`): served as is
+- stale (younger than `stale_seconds`): served as is while a refresh job
+  is queued in the background (stale-while-revalidate)
+- older or missing: a miss, the caller scrapes
+"""
+import logging
+from typing import Dict, List, Optional
+
+from database import DEFAULT_DB_PATH, DatabaseManager, normalize_query, run_sync
+
+logger = logging.getLogger(__name__)
+
+FRESH_SECONDS = 6 * 60 * 60
+STALE_SECONDS = 7 * 24 * 60 * 60
+
+
+async def lookup(
+    db: DatabaseManager,
+    query: str,
+    owner: str = "anonymous",
+    fresh_seconds: float = FRESH_SECONDS,
+    stale_seconds: float = STALE_SECONDS,
+    revalidate: bool = True,
+) -> Dict:
+    """Classify a query as fresh, stale or miss, queueing a refresh for stale hits
+
+    Returns a dict with status, query_key, the cached session (or None),
+    active_job (a queued/running job for the same query) and refresh_job
+    (the job queued by this call, if any).
+    """
+    stale_seconds = max(stale_seconds, fresh_seconds)
+    result = {
+        "status": "miss",
+        "query_key": normalize_query(query),
+        "session": None,
+        "active_job": await db.find_active_job(query),
+        "refresh_job": None,
+    }
+    session = await db.find_latest_session(query, max_age_seconds=stale_seconds)
+    if session is None:
+        return result
+
+    result["session"] = session
+    if session["age_seconds"] <= fresh_seconds:
+        result["status"] = "fresh"
+        return result
+
+    result["status"] = "stale"
+    if revalidate and result["active_job"] is None:
+        result["refresh_job"] = result["active_job"] = await db.enqueue_job(query, owner)
+        logger.info(f"Queued refresh job {result['refresh_job']} for stale query '{result['query_key']}'")
+    return result
+
+
+def lookup_query(
+    query: str,
+    owner: str = "anonymous",
+    db_path: str = DEFAULT_DB_PATH,
+    fresh_seconds: float = FRESH_SECONDS,
+    stale_seconds: float = STALE_SECONDS,
+) -> Dict:
+    """Synchronous lookup() for the UI"""
+    return run_sync(lambda db: lookup(db, query, owner, fresh_seconds, stale_seconds), db_path)
+
+
+def search_leads(text: str, limit: int = 50, cursor: Optional[tuple] = None, order: str = "relevance",
+                 min_score: Optional[float] = None, db_path: str = DEFAULT_DB_PATH) -> Dict:
+    """Synchronous DatabaseManager.search_businesses() for the UI"""
+    return run_sync(
+        lambda db: db.search_businesses(text, limit=limit, cursor=cursor, order=order, min_score=min_score), db_path
+    )
+
+
+def load_results(query: str, since: Optional[str] = None, db_path: str = DEFAULT_DB_PATH) -> List[Dict]:
+    """Businesses cached for a query, scraped at or after `since`"""
+    return run_sync(lambda db: db.get_businesses_by_query(query, since=since), db_path, initialize=False)
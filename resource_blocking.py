@@ -0,0 +1,159 @@
+"""
+Network-level request blocking for the Google Maps scraper
+
+Chrome is told through CDP (Network.setBlockedURLs) to refuse requests
+the scraper never needs, so they are cancelled before any bytes move.
+Each driver runs one preset at a time and switches when it moves
+between Google Maps and third-party business websites.
+
+Blocked and downloaded traffic is read back from Chrome's performance
+log; drivers must be created with `enable_network_log(options)` for
+NetworkStats to see anything.
+"""
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# File extensions and hosts per resource type. setBlockedURLs matches
+# URLs, not resource types, so types are approximated by what they load.
+RESOURCE_TYPE_EXTENSIONS: Dict[str, List[str]] = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "avif", "bmp"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "mp3", "ogg", "wav", "m4a", "mov"],
+    "stylesheet": ["css"],
+}
+RESOURCE_TYPE_HOSTS: Dict[str, List[str]] = {
+    "font": ["fonts.googleapis.com", "fonts.gstatic.com", "use.typekit.net"],
+}
+
+TRACKER_DOMAINS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "googleadservices.com", "adservice.google.com", "connect.facebook.net", "facebook.com/tr",
+    "hotjar.com", "clarity.ms", "segment.io", "segment.com", "mixpanel.com", "fullstory.com",
+    "newrelic.com", "nr-data.net", "scorecardresearch.com", "quantserve.com", "criteo.com",
+    "taboola.com", "outbrain.com", "adsrvr.org", "bing.com/bat", "linkedin.com/px", "tiktok.com/i18n/pixel",
+]
+
+# Embeds that only add weight to a page we read for contact details
+WIDGET_DOMAINS = [
+    "youtube.com/embed", "player.vimeo.com", "google.com/maps/embed", "maps.googleapis.com",
+    "platform.twitter.com", "widget.intercom.io", "embed.tawk.to", "client.crisp.chat",
+    "static.zdassets.com", "js.driftt.com", "recaptcha",
+]
+
+# Maps needs its own scripts and styles to render and scroll the feed;
+# business websites are only read for their HTML.
+PRESETS: Dict[str, Dict[str, List[str]]] = {
+    "maps": {
+        "resource_types": ["image", "font", "media"],
+        "domains": TRACKER_DOMAINS,
+    },
+    "site": {
+        "resource_types": ["image", "font", "media", "stylesheet"],
+        "domains": TRACKER_DOMAINS + WIDGET_DOMAINS,
+    },
+}
+
+# Rough transfer size of a request Chrome never made, by CDP resource type
+TYPICAL_BYTES = {
+    "Image": 40_000,
+    "Font": 50_000,
+    "Media": 500_000,
+    "Stylesheet": 25_000,
+    "Script": 60_000,
+    "XHR": 5_000,
+    "Fetch": 5_000,
+    "Ping": 500,
+}
+DEFAULT_TYPICAL_BYTES = 10_000
+
+
+def blocked_url_patterns(preset: str) -> List[str]:
+    """setBlockedURLs patterns for a preset name"""
+    config = PRESETS[preset]
+    patterns = []
+    for resource_type in config["resource_types"]:
+        for extension in RESOURCE_TYPE_EXTENSIONS.get(resource_type, []):
+            # Anchored at the end of the path so ".ico" does not catch "/icons.js"
+            patterns += [f"*.{extension}", f"*.{extension}?*"]
+        patterns.extend(f"*{host}*" for host in RESOURCE_TYPE_HOSTS.get(resource_type, []))
+    patterns.extend(f"*{domain}*" for domain in config["domains"])
+    return patterns
+
+
+def enable_network_log(options):
+    """Turn on Chrome's network-only performance log on ChromeOptions"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def apply_preset(driver, preset: Optional[str]):
+    """Switch a driver's blocklist; a no-op when the preset is already active"""
+    if getattr(driver, "_blocking_preset", None) == preset:
+        return
+    if getattr(driver, "_blocking_preset", None) is None:
+        driver.execute_cdp_cmd("Network.enable", {})
+    patterns = blocked_url_patterns(preset) if preset else []
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    driver._blocking_preset = preset
+
+
+class NetworkStats:
+    """Requests and bytes blocked versus downloaded, summed over drivers
+
+    `collect(driver)` drains the driver's performance log, so call it
+    after each page a driver finishes with. Safe to share between threads.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.requests_blocked = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved_estimate = 0
+        self._lock = threading.Lock()
+
+    def collect(self, driver):
+        """Fold a driver's pending network events into the totals"""
+        try:
+            entries = driver.get_log("performance")
+        except Exception:
+            return
+        self.add_events(entry["message"] for entry in entries)
+
+    def add_events(self, messages: Iterable[str]):
+        requests = blocked = downloaded = saved = 0
+        for message in messages:
+            # Most events are neither; skip them before paying for json.loads
+            if "Network.requestWillBeSent" in message:
+                requests += 1
+            elif "Network.loadingFinished" in message:
+                downloaded += json.loads(message)["message"]["params"].get("encodedDataLength", 0)
+            elif "Network.loadingFailed" in message and "blockedReason" in message:
+                params = json.loads(message)["message"]["params"]
+                blocked += 1
+                saved += TYPICAL_BYTES.get(params.get("type"), DEFAULT_TYPICAL_BYTES)
+        with self._lock:
+            self.requests += requests
+            self.requests_blocked += blocked
+            self.bytes_downloaded += int(downloaded)
+            self.bytes_saved_estimate += saved
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "requests_blocked": self.requests_blocked,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_saved_estimate": self.bytes_saved_estimate,
+            }
+
+    def summary(self) -> str:
+        stats = self.snapshot()
+        return (
+            f"🚫 Blocked {stats['requests_blocked']} of {stats['requests']} requests "
+            f"(~{stats['bytes_saved_estimate'] / 1e6:.1f} MB saved, "
+            f"{stats['bytes_downloaded'] / 1e6:.1f} MB downloaded)"
+        )
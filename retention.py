@@ -0,0 +1,172 @@
+"""
+Retention cleanup for the leads database
+
+Rows older than the retention period are deleted table by table in small
+batches, each in its own short transaction, walking the timestamp index
+oldest first. Scrapes writing at the same time only ever wait for one
+batch. Expired rows can be archived to gzipped NDJSON files first, and
+freed pages are returned to the filesystem with incremental vacuum.
+
+Usage: python retention.py [--db leads.db] [--days 30] [--archive-dir archive]
+       python retention.py --enable-incremental-vacuum   (one-off full VACUUM)
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import DEFAULT_DB_PATH, DatabaseManager, run_sync
+from exporter import iter_ndjson_chunks
+from jobs import STALE_JOB_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = 30
+DELETE_BATCH_SIZE = 500
+BATCH_PAUSE_SECONDS = 0.05  # lets queued writers in between batches
+VACUUM_PAGES_PER_STEP = 2000
+# A 'running' session whose worker has not checked in for this long is dead
+# (pre-heartbeat sessions and ones whose job never got requeued), not live
+STALE_RUNNING_SECONDS = 2 * STALE_JOB_SECONDS
+
+# (table, indexed timestamp column, extra condition); children before sessions
+RETENTION_TABLES = [
+    ("skipped_entries", "skipped_at", ""),
+    ("scrape_metrics", "recorded_at", ""),
+    ("session_businesses", "found_at", ""),
+    ("businesses", "scraped_at", ""),
+    ("known_places", "last_scraped", ""),
+    ("scrape_sessions", "start_time",
+     f"AND (status NOT IN ('queued', 'running') OR (status = 'running' AND "
+     f"COALESCE(heartbeat_at, claimed_at, start_time) < datetime('now', '-{STALE_RUNNING_SECONDS} seconds')))"),
+]
+
+
+class ArchiveWriter:
+    """Appends expired rows to one gzipped NDJSON file per table"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        self.files: Dict[str, str] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, table: str, rows: List[Dict]):
+        path = self.files.setdefault(table, os.path.join(self.directory, f"{table}-{self.stamp}.ndjson.gz"))
+        header = [column for column in rows[0] if column != "_rowid"]
+        # Each call adds a gzip member; readers see one continuous stream
+        with gzip.open(path, "ab") as f:
+            for chunk in iter_ndjson_chunks(([row[column] for column in header] for row in rows), header):
+                f.write(chunk)
+
+
+def _file_bytes(db_path: str) -> int:
+    return os.path.getsize(db_path) if os.path.exists(db_path) else 0
+
+
+async def purge_expired(
+    db: DatabaseManager,
+    days: float = RETENTION_DAYS,
+    batch_size: int = DELETE_BATCH_SIZE,
+    archive_dir: Optional[str] = None,
+    pause: float = BATCH_PAUSE_SECONDS,
+) -> Dict:
+    """Delete rows older than `days` from every retention table and reclaim the space
+
+    Returns rows deleted per table, pages and bytes reclaimed, the file
+    size before and after, and the archive files written.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    archive = ArchiveWriter(archive_dir) if archive_dir else None
+    await db.flush()
+    await db.checkpoint()
+    size_before = _file_bytes(db.db_path)
+    started = time.time()
+    deleted: Dict[str, int] = {}
+
+    for table, column, condition in RETENTION_TABLES:
+        deleted[table] = 0
+        while True:
+            rows = await db.get_expired_rows(table, column, cutoff, batch_size, condition)
+            if not rows:
+                break
+            if archive is not None:
+                await asyncio.to_thread(archive.write, table, rows)
+            count = await db.delete_expired_rows(table, column, cutoff, [row["_rowid"] for row in rows])
+            deleted[table] += count
+            if count == 0:
+                break  # every row was refreshed since it was read
+            await asyncio.sleep(pause)
+        if deleted[table]:
+            logger.info(f"Deleted {deleted[table]} rows from {table} older than {cutoff}")
+
+    page_size = await db.get_pragma("page_size")
+    pages = 0
+    if await db.get_pragma("auto_vacuum") == 2:
+        while True:
+            released = await db.incremental_vacuum(VACUUM_PAGES_PER_STEP)
+            pages += released
+            if released < VACUUM_PAGES_PER_STEP:
+                break
+            await asyncio.sleep(pause)
+    elif any(deleted.values()):
+        logger.info("auto_vacuum is not INCREMENTAL; freed pages will be reused but the file will not shrink "
+                    "(run `python retention.py --enable-incremental-vacuum` once)")
+
+    # Truncation only reaches the main file once the WAL is checkpointed
+    await db.checkpoint()
+    report = {
+        "cutoff": cutoff,
+        "deleted": deleted,
+        "rows_deleted": sum(deleted.values()),
+        "pages_reclaimed": pages,
+        "bytes_reclaimed": pages * page_size,
+        "file_bytes_before": size_before,
+        "file_bytes_after": _file_bytes(db.db_path),
+        "archives": sorted(archive.files.values()) if archive else [],
+        "seconds": time.time() - started,
+    }
+    logger.info(f"Retention: {report['rows_deleted']} rows deleted, {report['bytes_reclaimed'] / 1024 / 1024:.1f} MB "
+                f"reclaimed in {report['seconds']:.1f}s")
+    return report
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"Cutoff:          {report['cutoff']}"]
+    lines += [f"  {table:<18} {count} rows deleted" for table, count in report["deleted"].items()]
+    lines += [
+        f"Reclaimed:       {report['pages_reclaimed']} pages, {report['bytes_reclaimed'] / 1024 / 1024:.1f} MB",
+        f"File size:       {report['file_bytes_before'] / 1024 / 1024:.1f} MB -> "
+        f"{report['file_bytes_after'] / 1024 / 1024:.1f} MB (main file)",
+    ]
+    lines += [f"Archived to:     {path}" for path in report["archives"]]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete expired scrape data in small batches")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS, help="keep this many days of data")
+    parser.add_argument("--batch-size", type=int, default=DELETE_BATCH_SIZE, help="rows per delete transaction")
+    parser.add_argument("--archive-dir", default=None, help="write expired rows here as .ndjson.gz first")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="convert the file to auto_vacuum=INCREMENTAL (full VACUUM, blocks writers)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def run(db: DatabaseManager):
+        if args.enable_incremental_vacuum:
+            changed = await db.enable_incremental_vacuum()
+            logger.info("Converted to auto_vacuum=INCREMENTAL" if changed else "Already auto_vacuum=INCREMENTAL")
+        return await purge_expired(db, args.days, batch_size=args.batch_size, archive_dir=args.archive_dir)
+
+    print(format_report(run_sync(run, args.db)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,67 @@
-import re
+import os
 import time
-import random
+import atexit
+import collections
+import queue
+import threading
 import traceback
+from concurrent.futures import Future
 from urllib.parse import urljoin, quote
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import chromedriver_autoinstaller
+from acceptance import present, rejection_reason, skipped_entry
+from budget import ScrapeBudget
+from detail_workers import DetailWorkers
+from driver_pool import DriverPool
+from email_cache import EmailCache
+from email_extraction import best_email
+from email_harvester import EmailHarvester
+from metrics import Tracer
+from extractors import FEED_CARD_SELECTOR, PLACE_SELECTORS, extract_feed_cards, extract_place_details
+from resource_blocking import NetworkStats, apply_preset, enable_network_log
+from waits import WaitStats, wait_for, wait_for_feed_growth, wait_for_network_idle
+
+# Point at a fixture server (see benchmarks/fixture_server.py) to run offline
+MAPS_BASE_URL = os.environ.get("SCRAPU_MAPS_BASE_URL", "https://www.google.com/maps").rstrip("/")
+DETAIL_WORKERS = 4
+MAX_CARDS = 100
+BUDGET_SECONDS = 60  # whole scrape: search, scroll, details and emails
+TARGET_LEADS = None  # stop early after this many leads; None scrapes until the budget ends
+DRIVER_POOL_SIZE = 2
+BROWSER_FALLBACK_DRIVERS = 1  # pool slots left free for harvest_with_browser during a scrape
+DRIVER_POOL_MAX_SIZE = DETAIL_WORKERS + 1 + BROWSER_FALLBACK_DRIVERS  # workers, search driver, fallback
+DRIVER_MAX_PAGES = 200  # recycle a browser after this many pages
+DRIVER_MAX_RSS_MB = 1500  # ... or once its process tree's PSS (shared pages counted once) exceeds this
+DRIVER_WATCHDOG_SECONDS = 30
+HARVEST_CONCURRENCY = 16
+HARVEST_PER_HOST = 2
+BROWSER_FALLBACK_TIMEOUT = 10
+EMAIL_CACHE_SIZE = 10000
+EMAIL_CACHE_TTL_DAYS = 30
+EMAIL_CACHE_NEGATIVE_TTL_DAYS = 3
+BLOCK_RESOURCES = True  # CDP blocklists from resource_blocking.PRESETS
+PAGE_LOAD_STRATEGY = "eager"  # driver.get returns at DOMContentLoaded
+SEARCH_WAIT_SECONDS = 15
+FEED_GROWTH_SECONDS = 1
+FEED_END_MISSES = 3  # scroll steps without new cards before the feed counts as exhausted
+PLACE_WAIT_SECONDS = 5
+SITE_IDLE_SECONDS = 3
+
+_chromedriver_installed = False
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+_email_harvester = None
+_email_cache = None
 
 # Setup Selenium driver
-def setup_driver():
-    chromedriver_autoinstaller.install()
+def setup_driver(debug_port=9222, profile_dir=None):
+    global _chromedriver_installed
+    if not _chromedriver_installed:
+        chromedriver_autoinstaller.install()
+        _chromedriver_installed = True
     options = Options()
     options.add_argument("--headless=new")
     options.add_argument("--no-sandbox")
@@ -22,12 +70,16 @@ def setup_driver():
     options.add_argument("--disable-software-rasterizer")
     options.add_argument("--disable-extensions")
     options.add_argument("--window-size=1920,1080")
-    options.add_argument("--remote-debugging-port=9222")
+    options.add_argument(f"--remote-debugging-port={debug_port}")
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={profile_dir}")
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_argument(
         "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
         "(KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36"
     )
+    options.page_load_strategy = PAGE_LOAD_STRATEGY
+    enable_network_log(options)
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
     options.add_experimental_option(
@@ -52,142 +104,409 @@ def setup_driver():
             """
         },
     )
+    use_preset(driver, "maps")
     return driver
 
-# Extract emails from a website
-def extract_emails_from_website(driver, website_url):
+# Switch a driver between the Maps and third-party site blocklists
+def use_preset(driver, preset):
+    if BLOCK_RESOURCES:
+        apply_preset(driver, preset)
+
+# Shared pool of pre-warmed drivers, started on first use
+def get_driver_pool():
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            _driver_pool = DriverPool(
+                setup_driver, size=DRIVER_POOL_SIZE, max_size=DRIVER_POOL_MAX_SIZE,
+                max_pages=DRIVER_MAX_PAGES, max_rss_mb=DRIVER_MAX_RSS_MB,
+                watchdog_seconds=DRIVER_WATCHDOG_SECONDS,
+            )
+        return _driver_pool
+
+def shutdown_driver_pool():
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is not None:
+            _driver_pool.close()
+            _driver_pool = None
+
+atexit.register(shutdown_driver_pool)
+
+# Render a JS-only website in a pooled browser when plain HTTP sees an empty shell.
+# Runs outside any one scrape, so its network stats are drained and dropped.
+# Returns None when no browser was free in time or the site did not load, so
+# the harvester does not cache an "N/A" for a site it never read.
+def harvest_with_browser(website_url):
+    try:
+        with get_driver_pool().driver(timeout=BROWSER_FALLBACK_TIMEOUT) as driver:
+            return extract_emails_from_website(driver, website_url, NetworkStats())
+    except Exception:
+        return None
+
+# Process-wide domain -> email cache; warm it with `await cache.load(db)`
+def get_email_cache():
+    global _email_cache
+    with _driver_pool_lock:
+        if _email_cache is None:
+            _email_cache = EmailCache(
+                max_entries=EMAIL_CACHE_SIZE,
+                ttl_seconds=EMAIL_CACHE_TTL_DAYS * 24 * 3600,
+                negative_ttl_seconds=EMAIL_CACHE_NEGATIVE_TTL_DAYS * 24 * 3600,
+            )
+        return _email_cache
+
+# Shared HTTP email harvester, started on first use
+def get_email_harvester():
+    global _email_harvester
+    cache = get_email_cache()
+    with _driver_pool_lock:
+        if _email_harvester is None:
+            _email_harvester = EmailHarvester(
+                max_concurrency=HARVEST_CONCURRENCY,
+                per_host_limit=HARVEST_PER_HOST,
+                browser_fallback=harvest_with_browser,
+                cache=cache,
+            )
+        return _email_harvester
+
+def shutdown_email_harvester():
+    global _email_harvester
+    with _driver_pool_lock:
+        if _email_harvester is not None:
+            _email_harvester.close()
+            _email_harvester = None
+
+atexit.register(shutdown_email_harvester)
+
+# Extract emails from a website; raises when even its homepage cannot be loaded
+def extract_emails_from_website(driver, website_url, network=None, waits=None):
     if not website_url or website_url == "N/A":
         return "N/A"
     if not website_url.startswith("http"):
         website_url = "https://" + website_url
 
-    email_pattern = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
-    found_emails = set()
-
+    pages = []
     try:
+        use_preset(driver, "site")
         driver.get(website_url)
-        time.sleep(1)  # Reduced to save time
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        found_emails.update(email_pattern.findall(soup.get_text()))
+        wait_for_network_idle(driver, SITE_IDLE_SECONDS, name="site", network=network, stats=waits)
+        pages.append(driver.page_source)
 
         for link in ["contact"]:  # Limited to one page to save time
             try:
                 driver.get(urljoin(website_url, link))
-                time.sleep(1)
-                soup = BeautifulSoup(driver.page_source, "html.parser")
-                found_emails.update(email_pattern.findall(soup.get_text()))
+                wait_for_network_idle(driver, SITE_IDLE_SECONDS, name="site", network=network, stats=waits)
+                pages.append(driver.page_source)
             except:
                 pass
+    except Exception:
+        if not pages:
+            raise
+    finally:
+        if network is not None:
+            network.collect(driver)
+    return best_email(pages, website_url)
 
-        return list(found_emails)[0] if found_emails else "N/A"
-    except:
-        return "N/A"
+# Open one place page on a worker driver and build its record
+def scrape_place(driver, card, network=None, waits=None):
+    use_preset(driver, "maps")
+    driver.get(card["href"])
+    wait_for(
+        driver, EC.presence_of_element_located((By.CSS_SELECTOR, PLACE_SELECTORS["Name"]["css"])),
+        PLACE_WAIT_SECONDS, "place", stats=waits,
+    )
+
+    details = extract_place_details(driver)
+    if network is not None:
+        network.collect(driver)
+    record = {
+        "Name": details["Name"],
+        "Address": details["Address"],
+        "Phone": details["Phone"],
+        "Website": details["Website"],
+        "Email": details["Email"],
+        "Rating": details["Rating"],
+        "href": card["href"],
+        "position": card["position"]
+    }
+    return record
 
-# Main scraping function with 1-minute timeout
-def scrape_google_maps(query, logger=print):
-    driver = setup_driver()
-    scraped_data = []
+# Progress snapshot handed to on_progress callbacks
+def _progress(phase, phase_times, start_time, cards_total=0, cards_done=0, leads=0, network=None, waits=None):
+    progress = {
+        "phase": phase,
+        "cards_total": cards_total,
+        "cards_done": cards_done,
+        "leads": leads,
+        "elapsed": time.time() - start_time,
+        "phase_times": dict(phase_times),
+    }
+    if network is not None:
+        progress["network"] = network.snapshot()
+    if waits is not None:
+        progress["waits"] = waits.snapshot()
+    return progress
+
+# Streaming scrape: yields each qualifying business as soon as it is complete.
+# A failed search (no feed, a dead search driver) raises after logging, once
+# the records found so far have been yielded.
+# Detail workers start on the first cards while the feed is still being
+# scrolled; budget.ScrapeBudget decides when further scrolling stops paying
+# off within budget_seconds, and the scrape ends early once target_leads
+# (if given) have been yielded. With known_places (a place_index.PlaceIndex),
+# cards for places scraped recently in earlier runs are passed over without
+# being opened and do not count towards max_cards; on_known, if given, is
+# called from the consuming thread with each such card (href and feed
+# position) so the caller can link the stored place to its session. Every
+# place whose record is yielded or rejected is recorded in known_places for
+# the caller to save; one still waiting for its email when the scrape ends
+# is not, so the next run reads it again.
+# on_progress, if given, is called from the consuming thread with a dict of
+# phase, cards_total, cards_done, leads, elapsed, per-phase seconds, budget
+# and network (requests/bytes blocked and downloaded so far); the final "done"
+# snapshot also carries per-wait timings. on_skip, if given, is called from
+# the consuming thread with an insert_skipped_entry row for every place that
+# fails acceptance.ACCEPTANCE_RULES or is a duplicate.
+def iter_scrape_google_maps(query, logger=print, pool=None, workers=DETAIL_WORKERS, max_cards=MAX_CARDS,
+                            harvester=None, on_progress=None, tracer=None, on_skip=None,
+                            budget_seconds=BUDGET_SECONDS, target_leads=TARGET_LEADS, known_places=None,
+                            on_known=None):
+    tracer = tracer or Tracer()
+    with tracer.span("driver_pool"):
+        pool = pool or get_driver_pool()
+    harvester = harvester or get_email_harvester()
     seen_businesses = set()
-    start_time = time.time()
+    seen_lock = threading.Lock()
+    skipped = collections.Counter()
+    budget = ScrapeBudget(budget_seconds, target_leads=target_leads, workers=workers)
+    start_time = budget.start
+    phase_times = {}
+    report = on_progress or (lambda progress: None)
+    leads = 0
+    cards_found = 0
+    known_count = 0
+    pending_emails = 0
+    detail = None
+    network = NetworkStats()
+    wait_stats = WaitStats()
 
-    try:
-        search_url = f"https://www.google.com/maps/search/{quote(query)}"
-        logger(f"🔎 Opening: {search_url}")
-        driver.get(search_url)
-        time.sleep(5)  # Reduced to save time
-
-        scrollable_div = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'div[role="feed"]'))
-        )
-
-        last_height = driver.execute_script("return arguments[0].scrollHeight", scrollable_div)
-        while time.time() - start_time < 50:  # Leave 10 seconds for processing
-            driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scrollable_div)
-            time.sleep(random.uniform(1, 2))
-            new_height = driver.execute_script("return arguments[0].scrollHeight", scrollable_div)
-            if new_height == last_height:
-                break
-            last_height = new_height
-
-        cards = WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'a[href*="/maps/place/"]'))
-        )
-        cards = list({card.get_attribute("href"): card for card in cards}.values())[:10]  # Limit to 10 for speed
-
-        for i, card in enumerate(cards):
-            if time.time() - start_time >= 60:
-                logger("⏰ 1-minute timeout reached, stopping scrape")
-                break
+    # Worker threads and harvest callbacks feed one queue; this thread
+    # drains it so records and progress come out of the consumer's thread.
+    events = queue.Queue()
 
+    def progress(phase, final=False):
+        snapshot = _progress(phase, phase_times, start_time, cards_found, detail.processed if detail else 0,
+                             leads, network, wait_stats if final else None)
+        snapshot["budget"] = budget.snapshot()
+        snapshot["known_places"] = known_count
+        return snapshot
+
+    # Cheap "place" checks run on the worker as soon as the page is read,
+    # so a place that can never qualify is not crawled for an email.
+    def handle_card(driver, card):
+        started = time.time()
+        with tracer.span("card", position=card["position"]):
+            record = scrape_place(driver, card, network, wait_stats)
+        budget.record_card(time.time() - started)
+        reason = rejection_reason(record, "place")
+        key = (record["Name"], record["Address"])
+        with seen_lock:
+            if reason is None and key in seen_businesses:
+                reason = "duplicate"
+            elif reason is None:
+                seen_businesses.add(key)
+        if reason is not None:
+            events.put(("skip", record, reason))
+            return None
+        if not present(record["Email"]):
+            started = time.time()
+            record["Email"] = harvester.submit(record["Website"])
+            record["Email"].add_done_callback(lambda future: email_done(future, started))
+        return record
+
+    def email_done(future, started):
+        seconds = time.time() - started
+        budget.record_email(seconds)
+        tracer.record("email_crawl", started, seconds, not future.cancelled() and future.exception() is None)
+
+    def remember(record):
+        if known_places is not None:
+            known_places.record(record["href"], record["Name"])
+
+    def skip(record, reason):
+        remember(record)
+        skipped[reason] += 1
+        if on_skip is not None:
+            on_skip(skipped_entry(record, reason))
+
+    # Yield the records that are ready, waiting up to `timeout` for the first event
+    def drain(timeout):
+        nonlocal leads, pending_emails
+        while not budget.satisfied(leads):
             try:
-                href = card.get_attribute("href")
-                driver.execute_script("window.open(arguments[0]);", href)
-                driver.switch_to.window(driver.window_handles[-1])
-                time.sleep(1)  # Reduced to save time
-
-                try:
-                    name = driver.find_element(By.CSS_SELECTOR, 'h1.DUwDvf').text.strip()
-                except:
-                    name = "N/A"
-
-                try:
-                    address = driver.find_element(By.CSS_SELECTOR, 'button[aria-label*="Address"]').text.strip()
-                except:
-                    address = "N/A"
-
-                if (name, address) in seen_businesses:
-                    driver.close()
-                    driver.switch_to.window(driver.window_handles[0])
-                    continue
-                seen_businesses.add((name, address))
-
-                try:
-                    phone = driver.find_element(By.CSS_SELECTOR, 'button[aria-label*="Phone"]').text.strip()
-                except:
-                    phone = "N/A"
-
-                try:
-                    website = driver.find_element(By.CSS_SELECTOR, 'a[data-tooltip="Open website"]').get_attribute("href")
-                except:
-                    website = "N/A"
-
-                try:
-                    rating = driver.find_element(By.CSS_SELECTOR, 'span[aria-label*="star rating"]').text.strip()
-                except:
-                    rating = "N/A"
-
-                try:
-                    email = driver.find_element(By.CSS_SELECTOR, 'a[href^="mailto:"]').get_attribute("href").replace("mailto:", "")
-                except:
-                    email = "N/A"
-                if email == "N/A" and website != "N/A":
-                    email = extract_emails_from_website(driver, website)
-
-                if email != "N/A" and phone != "N/A":
-                    scraped_data.append({
-                        "Name": name,
-                        "Address": address,
-                        "Phone": phone,
-                        "Website": website,
-                        "Email": email,
-                        "Rating": rating
-                    })
-                    logger(f"✅ Found: {name} (Email: {email}, Phone: {phone})")
-
-                driver.close()
-                driver.switch_to.window(driver.window_handles[0])
-
-            except Exception as e:
-                logger(f"⚠️ Error scraping business card {i+1}: {str(e)}")
-                driver.close()
-                driver.switch_to.window(driver.window_handles[0])
+                kind, record, reason = events.get(timeout=timeout) if timeout else events.get_nowait()
+            except queue.Empty:
+                return
+            timeout = 0
+
+            if kind == "skip":
+                skip(record, reason)
+                continue
+            if kind == "card" and isinstance(record["Email"], Future):
+                pending_emails += 1
+                record["Email"].add_done_callback(lambda _, record=record: events.put(("email", record, None)))
+                continue
+            if kind == "email":
+                pending_emails -= 1
+                record = resolve_email(record, budget.deadline)
+
+            reason = rejection_reason(record, "email")
+            if reason is not None:
+                skip(record, reason)
                 continue
+            leads += 1
+            remember(record)
+            logger(f"✅ Found: {record['Name']} (Email: {record['Email']}, Phone: {record['Phone']})")
+            report(progress("details"))
+            yield record
+
+    try:
+        report(progress("search"))
+        phase_start = time.time()
+        with pool.driver(tracer=tracer) as driver:
+            # Workers get their drivers while the search page loads
+            detail = DetailWorkers(
+                pool,
+                handle_card,
+                lambda index, record: events.put(("card", record, None)),
+                workers=workers,
+                deadline=budget.detail_deadline(),
+                log=logger,
+                tracer=tracer,
+            )
+            use_preset(driver, "maps")
+            search_url = f"{MAPS_BASE_URL}/search/{quote(query)}"
+            logger(f"🔎 Opening: {search_url}")
+            with tracer.span("search"):
+                driver.get(search_url)
+                scrollable_div = wait_for(
+                    driver, EC.presence_of_element_located((By.CSS_SELECTOR, 'div[role="feed"]')),
+                    SEARCH_WAIT_SECONDS, "search", stats=wait_stats, required=True,
+                )
+                wait_for(
+                    driver, EC.presence_of_element_located((By.CSS_SELECTOR, FEED_CARD_SELECTOR)),
+                    10, "feed_cards", stats=wait_stats, jitter_floor=None, required=True,
+                )
+            phase_times["search"] = time.time() - phase_start
+            report(progress("scroll"))
+            phase_start = time.time()
+
+            # Hand new cards to the workers after every scroll step and keep
+            # scrolling while the budget expects more cards to be worth it.
+            # While the queued cards should already reach the target, scrolling
+            # only pauses: the search driver is kept, and scrolling resumes if
+            # the processed cards turn out to yield fewer leads than expected.
+            submitted = set()
+            known = set()
+            misses = 0
+            stop_reason = None
+            card_count = len(scrollable_div.find_elements(By.CSS_SELECTOR, FEED_CARD_SELECTOR))
+            while True:
+                for card in extract_feed_cards(driver):
+                    if len(submitted) >= max_cards:
+                        break
+                    if card["href"] in submitted or card["href"] in known:
+                        continue
+                    if known_places is not None and known_places.is_known(card["href"]):
+                        known.add(card["href"])
+                        if on_known is not None:
+                            on_known(dict(card, position=len(submitted) + len(known)))
+                        continue
+                    submitted.add(card["href"])
+                    # Positions stay feed positions, counting passed-over cards
+                    detail.submit(len(submitted) - 1, dict(card, position=len(submitted) + len(known)))
+                cards_found = len(submitted)
+                known_count = len(known)
+                network.collect(driver)
+                yield from drain(0)
+                report(progress("scroll"))
+                if budget.satisfied(leads):
+                    stop_reason = "target reached"
+                elif cards_found >= max_cards:
+                    stop_reason = f"{max_cards} cards queued"
+                elif misses >= FEED_END_MISSES:
+                    stop_reason = "no more results in the feed"
+                elif not budget.can_scroll(cards_found, detail.processed):
+                    stop_reason = "no time left to process more cards"
+                if stop_reason:
+                    break
+                if budget.enough_queued(cards_found, detail.processed, leads):
+                    yield from drain(0.25)
+                    detail.deadline = budget.detail_deadline()
+                    continue
+                with tracer.span("scroll", cards=card_count) as span:
+                    driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scrollable_div)
+                    new_count = wait_for_feed_growth(
+                        driver, scrollable_div, FEED_CARD_SELECTOR, card_count, FEED_GROWTH_SECONDS, stats=wait_stats
+                    )
+                    span["new_cards"] = new_count - card_count
+                misses = 0 if new_count > card_count else misses + 1
+                card_count = max(card_count, new_count)
+            phase_times["scroll"] = time.time() - phase_start
+
+        detail.close()
+        logger(f"📋 Queued {cards_found} place cards for {workers} workers (stopped scrolling: {stop_reason})")
+        if known_count:
+            logger(f"🗂️ Passed over {known_count} places already scraped in earlier runs")
+        phase_start = time.time()
+        report(progress("details"))
+
+        while (not budget.satisfied(leads) and not budget.expired()
+               and (detail.is_alive() or pending_emails or not events.empty())):
+            yield from drain(0.25)
+            # Later cards get less time as email crawls turn out slower
+            detail.deadline = budget.detail_deadline()
+            report(progress("details"))
+
+        phase_times["details"] = time.time() - phase_start
+        if budget.satisfied(leads):
+            logger(f"🎯 Reached the target of {target_leads} leads")
+        elif budget.expired():
+            logger(f"⏰ {budget_seconds:.0f}s budget used up, stopping scrape")
+        elif target_leads is not None:
+            logger(f"⚠️ Finished with {leads} of {target_leads} target leads and {budget.remaining():.0f}s "
+                   f"of budget left ({stop_reason})")
+        report(progress("done", final=True))
 
     except Exception as e:
+        # Callers record the failure (a job goes to "failed"); an empty
+        # result here must not look like a search that found nothing
         logger(f"❌ Scraping failed: {str(e)}")
         logger(traceback.format_exc())
+        raise
     finally:
-        driver.quit()
+        if detail is not None:
+            detail.stop()
+        if skipped:
+            logger("⏭️ Skipped: " + ", ".join(f"{reason} {count}" for reason, count in skipped.most_common()))
+        logger(network.summary())
+        logger(wait_stats.summary())
+        logger(tracer.format_summary())
+        logger(f"Scrape finished in {time.time() - start_time:.2f} seconds")
+
+# Wait for a background email harvest, giving up at the deadline
+def resolve_email(record, deadline):
+    email = record["Email"]
+    if isinstance(email, Future):
+        try:
+            email = email.result(timeout=max(0, deadline - time.time()))
+        except Exception:
+            email.cancel()
+            email = "N/A"
+    return dict(record, Email=email)
 
-    logger(f"Scrape completed in {time.time() - start_time:.2f} seconds")
-    return scraped_data
+# Main scraping function within the time budget; results in feed order
+def scrape_google_maps(query, logger=print, **kwargs):
+    scraped_data = list(iter_scrape_google_maps(query, logger=logger, **kwargs))
+    return sorted(scraped_data, key=lambda record: record["position"])
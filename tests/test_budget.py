@@ -0,0 +1,47 @@
+from budget import PRIOR_LEAD_YIELD, ScrapeBudget
+
+
+def test_pauses_then_resumes_when_observed_yield_is_below_the_prior():
+    budget = ScrapeBudget(60, target_leads=3)
+    # Nothing processed yet: the prior says the queued cards are enough
+    assert budget.enough_queued(cards_found=10, processed=0, leads=0)
+    assert budget.can_scroll(cards_found=10, processed=0)
+    # Those cards yielded fewer leads than the prior promised: scroll again
+    assert budget.lead_yield(leads=2, processed=10) < PRIOR_LEAD_YIELD
+    assert not budget.enough_queued(cards_found=10, processed=10, leads=2)
+
+
+def test_wants_more_cards_as_the_observed_yield_drops():
+    budget = ScrapeBudget(60, target_leads=5)
+    assert budget.cards_wanted(leads=0, processed=20) > budget.cards_wanted(leads=0, processed=0)
+    assert budget.cards_wanted(leads=5, processed=20) == 0
+
+
+def test_target_reached():
+    budget = ScrapeBudget(60, target_leads=3)
+    assert not budget.satisfied(2)
+    assert budget.satisfied(3)
+    assert not ScrapeBudget(60).satisfied(1000)
+
+
+def test_without_a_target_only_time_limits_scrolling():
+    budget = ScrapeBudget(60)
+    assert budget.cards_wanted(leads=0, processed=0) is None
+    assert not budget.enough_queued(cards_found=500, processed=0, leads=0)
+    assert budget.can_scroll(cards_found=8, processed=0)
+    # 200 queued cards at 2s each on 4 workers cannot finish in 60s
+    assert not budget.can_scroll(cards_found=200, processed=0)
+
+
+def test_reserve_follows_observed_card_times():
+    budget = ScrapeBudget(60, workers=2)
+    before = budget.reserve(4)
+    for _ in range(20):
+        budget.record_card(0.1)
+    assert budget.reserve(4) < before
+
+
+def test_expired_budget_stops_scrolling():
+    budget = ScrapeBudget(0, target_leads=3)
+    assert budget.expired()
+    assert not budget.can_scroll(cards_found=0, processed=0)
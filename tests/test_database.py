@@ -0,0 +1,87 @@
+import asyncio
+import sqlite3
+
+from database import DatabaseManager, place_key
+
+
+def business(name, position, **fields):
+    return dict({"Name": name, "Address": "MG Road", "Phone": "", "Website": "", "Email": "",
+                 "query": "cafes in pune", "position": position, "href": ""}, **fields)
+
+
+def run(path, operation):
+    async def _run():
+        async with DatabaseManager(str(path)) as db:
+            return await operation(db)
+    return asyncio.run(_run())
+
+
+def test_rescraping_a_place_replaces_its_score_and_status(tmp_path):
+    async def scrape(db):
+        session_id = await db.create_session("cafes in pune", 1)
+        await db.insert_business(business("Blue Cafe", 1, Phone="098765 43210", Email="hi@blue.in"), session_id)
+        await db.end_session(session_id)
+        before = (await db.get_businesses_by_session(session_id))[0]
+        # Same place (same name and phone) now without a usable email
+        await db.insert_business(business("Blue Cafe", 1, Phone="098765 43210", Email="logo@2x.png"), session_id)
+        await db.end_session(session_id)
+        return before, (await db.get_businesses_by_session(session_id))[0]
+
+    before, after = run(tmp_path / "leads.db", scrape)
+    assert before["validation_status"] == "valid"
+    assert after["id"] == before["id"]
+    assert after["validation_status"] == "partial"
+    assert after["data_quality_score"] < before["data_quality_score"]
+
+
+def test_place_key_prefers_the_maps_ids():
+    href = "https://www.google.com/maps/place/Cafe/data=!4m7!3m6!1s0x3bc2c1:0xA1B2!8m2"
+    assert place_key({"href": href, "Name": "Cafe"}) == "fid:0x3bc2c1:0xa1b2"
+    assert place_key({"href": "https://maps.google.com/?cid=123456789"}) == "cid:123456789"
+
+
+def test_place_key_falls_back_to_name_with_phone_or_address():
+    assert place_key({"Name": "Blue Cafe!", "Phone": "+91 98765 43210"}) == "np:bluecafe|9876543210"
+    assert place_key({"Name": "Blue Cafe", "Phone": "098765 43210"}) == "np:bluecafe|9876543210"
+    assert place_key({"Name": "Blue Cafe", "Address": "12, MG Road"}) == "na:bluecafe|12mgroad"
+
+
+def test_sessions_keep_the_places_they_found_after_an_upsert(tmp_path):
+    async def scrape(db):
+        first = await db.create_session("cafes in pune", 1)
+        await db.insert_business(business("Blue Cafe", 1), first)
+        await db.insert_business(business("Red Cafe", 2), first)
+        await db.end_session(first)
+        second = await db.create_session("coffee in pune", 1)
+        await db.insert_business(business("Red Cafe", 1, Email="hi@red.in"), second)
+        await db.end_session(second)
+        return (await db.get_businesses_by_session(first), await db.get_businesses_by_session(second),
+                await db.get_businesses_by_session(first, after_id=1))
+
+    first, second, after = run(tmp_path / "leads.db", scrape)
+    assert [row["name"] for row in first] == ["Blue Cafe", "Red Cafe"]
+    assert [row["name"] for row in second] == ["Red Cafe"]
+    assert first[1]["id"] == second[0]["id"]
+    assert second[0]["email"] == "hi@red.in"
+    assert [row["name"] for row in after] == ["Red Cafe"]
+
+
+def test_migration_backfills_session_membership(tmp_path):
+    path = tmp_path / "leads.db"
+
+    async def scrape(db):
+        session_id = await db.create_session("cafes in pune", 1)
+        await db.insert_business(business("Blue Cafe", 1), session_id)
+        await db.end_session(session_id)
+        return session_id
+
+    session_id = run(path, scrape)
+    # Back to a schema version 6 file, from before session_businesses existed
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE session_businesses")
+        conn.execute("PRAGMA user_version = 6")
+
+    rows = run(path, lambda db: db.get_businesses_by_session(session_id))
+    assert [row["name"] for row in rows] == ["Blue Cafe"]
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 7
@@ -0,0 +1,78 @@
+"""Tests for driver_pool.DriverPool"""
+import browser_watchdog
+from driver_pool import RESET_ORIGINS, DriverPool
+
+
+class RecordingDriver:
+    """WebDriver stand-in that records tab switches, closes and CDP commands"""
+
+    def __init__(self, urls):
+        self.tabs = dict(enumerate(urls))
+        self.current = 0
+        self.cdp = []
+        self.switch_to = self
+
+    @property
+    def window_handles(self):
+        return list(self.tabs)
+
+    @property
+    def current_url(self):
+        return self.tabs[self.current]
+
+    def window(self, handle):
+        self.current = handle
+
+    def close(self):
+        del self.tabs[self.current]
+
+    def get(self, url):
+        self.tabs[self.current] = url
+
+    def execute_script(self, script):
+        return 1
+
+    def execute_cdp_cmd(self, command, params):
+        self.cdp.append((command, params))
+
+    def quit(self):
+        pass
+
+
+def make_pool(driver):
+    return DriverPool(lambda debug_port, profile_dir: driver, size=1, warm=False)
+
+
+def test_checkin_clears_cookies_and_storage_for_every_open_origin():
+    driver = RecordingDriver(["https://www.google.com/maps/search/x", "https://shop.example:8443/contact", "about:blank"])
+    pool = make_pool(driver)
+    pool.checkin(pool.checkout())
+
+    assert driver.tabs == {0: "about:blank"}
+    assert driver.cdp[0] == ("Network.clearBrowserCookies", {})
+    cleared = {params["origin"] for command, params in driver.cdp[1:] if command == "Storage.clearDataForOrigin"}
+    assert cleared == set(RESET_ORIGINS) | {"https://shop.example:8443"}
+    assert pool.stats()["idle"] == 1
+    pool.close()
+
+
+def test_driver_that_cannot_be_reset_is_discarded():
+    driver = RecordingDriver(["https://www.google.com/maps"])
+    driver.execute_cdp_cmd = None  # not a Chrome driver
+    pool = make_pool(driver)
+    pool.checkin(pool.checkout())
+
+    assert pool.stats()["idle"] == 0
+    assert pool.stats()["created"] == 0
+    pool.close()
+
+
+def test_pss_splits_shared_pages_and_falls_back_to_rss(tmp_path, monkeypatch):
+    (tmp_path / "10").mkdir()
+    (tmp_path / "10" / "smaps_rollup").write_text("Rss:  4096 kB\nPss:  1024 kB\n")
+    (tmp_path / "11").mkdir()
+    (tmp_path / "11" / "statm").write_text("100 2 0 0 0 0 0\n")
+    monkeypatch.setattr(browser_watchdog, "_PROC", str(tmp_path))
+    monkeypatch.setattr(browser_watchdog, "_page_size", lambda: 4096)
+
+    assert browser_watchdog.pss_bytes([10, 11, 12]) == 1024 * 1024 + 2 * 4096
@@ -0,0 +1,42 @@
+from email_extraction import best_email, decode_cfemail, find_email_candidates, rank_emails
+
+
+def cfemail(email, key=0x2a):
+    return bytes([key]).hex() + bytes(b ^ key for b in email.encode()).hex()
+
+
+def test_plain_and_mailto_addresses():
+    page = b'<p>Write to Sales@Shop.in.</p><a href="mailto:info%40shop.in?subject=Hi">Mail</a>'
+    assert find_email_candidates(page) == {"sales@shop.in", "info@shop.in"}
+
+
+def test_html_entities():
+    page = b"<p>info&#64;shop.in or hello&#x40;shop.in or team&commat;shop.in</p>"
+    assert find_email_candidates(page) == {"info@shop.in", "hello@shop.in", "team@shop.in"}
+
+
+def test_cloudflare_protected_addresses():
+    assert decode_cfemail(cfemail("info@shop.in")) == "info@shop.in"
+    assert decode_cfemail("zz") is None
+    page = (f'<a class="__cf_email__" data-cfemail="{cfemail("info@shop.in")}">[email protected]</a>'
+            f'<a href="/cdn-cgi/l/email-protection#{cfemail("sales@shop.in", 0x11)}">Mail</a>').encode()
+    assert find_email_candidates(page) == {"info@shop.in", "sales@shop.in"}
+
+
+def test_json_escaped_addresses():
+    page = b'<script>{"text":"\\u003cb\\u003einfo@shop.in\\u003c/b\\u003e","link":"mailto:sales@shop.in\\""}</script>'
+    assert find_email_candidates(page) == {"info@shop.in", "sales@shop.in"}
+
+
+def test_asset_names_and_placeholders_are_not_emails():
+    page = b'<img src="logo@2x.png"> lodash@4.17.21 you@example.com 3f9a6c1b2d4e5f60a7b8@sentry.io'
+    assert find_email_candidates(page) == set()
+
+
+def test_site_domain_and_role_inboxes_rank_first():
+    candidates = ["ravi.kumar@gmail.com", "ravi@shop.in", "info@shop.in", "info@agency.com"]
+    assert rank_emails(candidates, "https://www.shop.in") == [
+        "info@shop.in", "ravi@shop.in", "info@agency.com", "ravi.kumar@gmail.com",
+    ]
+    assert best_email(["<p>nothing here</p>"], "shop.in") == "N/A"
+    assert best_email(["<p>ravi@shop.in</p>", b"<p>info@shop.in</p>"], "shop.in") == "info@shop.in"
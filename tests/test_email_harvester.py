@@ -0,0 +1,77 @@
+import scraper
+from driver_pool import DriverPool
+from email_cache import EmailCache
+from email_harvester import EmailHarvester, looks_js_rendered
+
+PAGE = b"<html><body>" + b"<p>Fresh coffee roasted daily in Pune.</p>" * 10 + b"%s</body></html>"
+JS_SHELL = b'<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+
+
+def harvester(pages, fallback=None):
+    """A harvester reading `pages` (url -> html) instead of the network"""
+    cache = EmailCache()
+    harvester = EmailHarvester(max_concurrency=2, browser_fallback=fallback, cache=cache)
+    harvester.fetch = pages.get
+    return harvester, cache
+
+
+def test_email_found_over_http_is_cached():
+    pages = {"https://shop.in": PAGE % b'<a href="mailto:info@shop.in">Mail us</a>'}
+    harvest, cache = harvester(pages)
+    assert harvest.harvest("shop.in") == "info@shop.in"
+    pages.clear()
+    assert harvest.harvest("https://www.shop.in/") == "info@shop.in"
+    assert cache.stats()["hits"] == 1
+
+
+def test_site_without_email_is_cached_as_a_miss():
+    harvest, cache = harvester({"https://shop.in": PAGE % b"", "https://shop.in/contact": PAGE % b""})
+    assert harvest.harvest("https://shop.in") == "N/A"
+    assert cache.get("https://shop.in") == "N/A"
+
+
+def test_unreachable_site_is_not_cached():
+    harvest, cache = harvester({})
+    assert harvest.harvest("https://shop.in") == "N/A"
+    assert cache.get("https://shop.in") is None
+
+
+def test_failed_browser_fallback_is_not_cached():
+    assert looks_js_rendered(JS_SHELL)
+    harvest, cache = harvester({"https://shop.in": JS_SHELL}, fallback=lambda url: None)
+    assert harvest.harvest("https://shop.in") == "N/A"
+    assert cache.get("https://shop.in") is None
+    assert harvest.stats["browser_fallback"] == 1
+
+
+def test_browser_fallback_result_is_cached():
+    harvest, cache = harvester({"https://shop.in": JS_SHELL}, fallback=lambda url: "hello@shop.in")
+    assert harvest.harvest("https://shop.in") == "hello@shop.in"
+    assert cache.get("https://shop.in") == "hello@shop.in"
+
+
+class IdleDriver:
+    window_handles = ["main"]
+
+    def execute_script(self, script, *args):
+        return 1
+
+    def quit(self):
+        pass
+
+
+def test_browser_fallback_gives_up_when_the_pool_is_busy(monkeypatch):
+    pool = DriverPool(lambda **_: IdleDriver(), size=1, max_size=1)
+    busy = pool.checkout()
+    monkeypatch.setattr(scraper, "get_driver_pool", lambda: pool)
+    monkeypatch.setattr(scraper, "BROWSER_FALLBACK_TIMEOUT", 0.1)
+    try:
+        assert scraper.harvest_with_browser("https://shop.in") is None
+    finally:
+        pool.checkin(busy)
+        pool.close()
+
+
+def test_pool_leaves_a_slot_for_the_browser_fallback():
+    # Search driver plus one per detail worker still leaves room for the fallback
+    assert scraper.DRIVER_POOL_MAX_SIZE > scraper.DETAIL_WORKERS + 1
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import threading
+import time
+
+import scraper
+from database import DatabaseManager
+from jobs import JobWorkerPool, run_job
+
+
+def run(path, operation):
+    async def _run():
+        async with DatabaseManager(str(path)) as db:
+            return await operation(db)
+    return asyncio.run(_run())
+
+
+def record(i):
+    return {"Name": f"Cafe {i}", "Address": "FC Road", "Phone": "", "Website": "", "Email": f"hi@cafe{i}.in",
+            "position": i}
+
+
+def test_claims_go_to_the_least_served_owner_first(tmp_path):
+    async def claims(db):
+        a1 = await db.enqueue_job("cafes", owner="a")
+        a2 = await db.enqueue_job("bakeries", owner="a")
+        b1 = await db.enqueue_job("gyms", owner="b")
+        order = [(await db.claim_next_job("w1"))["id"], (await db.claim_next_job("w2"))["id"]]
+        third = await db.claim_next_job("w3")
+        return [a1, b1], order, third["id"], a2, await db.get_session_stats(a2)
+
+    expected, order, third, a2, session = run(tmp_path / "leads.db", claims)
+    assert order == expected
+    assert third == a2
+    assert session["status"] == "running" and session["worker_id"] == "w3"
+
+
+def test_heartbeats_keep_jobs_and_stale_ones_are_requeued(tmp_path):
+    async def jobs(db):
+        live = await db.enqueue_job("cafes")
+        dead = await db.enqueue_job("gyms")
+        await db.claim_next_job("w1")
+        await db.claim_next_job("w2")
+        await db.heartbeat_job(live, {"leads": 3})
+        async with db._transaction() as conn:
+            await conn.execute("UPDATE scrape_sessions SET heartbeat_at = datetime('now', '-1 hour') WHERE id = ?",
+                               (dead,))
+        requeued = await db.requeue_stale_jobs(300)
+        return requeued, await db.get_session_stats(live), await db.get_session_stats(dead)
+
+    requeued, live, dead = run(tmp_path / "leads.db", jobs)
+    assert requeued == 1
+    assert live["status"] == "running" and json.loads(live["progress"]) == {"leads": 3}
+    assert dead["status"] == "queued" and dead["worker_id"] is None
+
+
+def claimed_run(tmp_path, monkeypatch, stream, stop=None):
+    monkeypatch.setattr(scraper, "iter_scrape_google_maps", lambda query, **kwargs: stream(**kwargs))
+
+    async def job(db):
+        session_id = await db.enqueue_job("cafes in pune")
+        await run_job(db, await db.claim_next_job("w1"), "w1", stop)
+        return await db.get_session_stats(session_id), await db.get_businesses_by_session(session_id)
+
+    return run(tmp_path / "leads.db", job)
+
+
+def test_job_writes_its_records_and_completes(tmp_path, monkeypatch):
+    session, rows = claimed_run(tmp_path, monkeypatch, lambda **kwargs: (record(i) for i in (1, 2)))
+    assert session["status"] == "completed" and session["total_businesses"] == 2
+    assert [row["name"] for row in rows] == ["Cafe 1", "Cafe 2"]
+
+
+def test_failed_scrape_fails_the_job(tmp_path, monkeypatch):
+    def stream(**kwargs):
+        yield record(1)
+        raise RuntimeError("no results feed")
+
+    session, rows = claimed_run(tmp_path, monkeypatch, stream)
+    assert session["status"] == "failed" and "no results feed" in session["error"]
+    assert [row["name"] for row in rows] == ["Cafe 1"]
+
+
+def test_stopped_job_keeps_its_records_and_is_queued_again(tmp_path, monkeypatch):
+    stop = threading.Event()
+
+    def stream(**kwargs):
+        yield record(1)
+        stop.set()
+        time.sleep(3)  # a scrape still busy when its worker is stopped
+        yield record(2)
+
+    session, rows = claimed_run(tmp_path, monkeypatch, stream, stop)
+    assert session["status"] == "queued" and session["worker_id"] is None
+    assert [row["name"] for row in rows] == ["Cafe 1"]
+
+
+def test_idle_workers_stop_without_being_terminated(tmp_path):
+    run(tmp_path / "leads.db", lambda db: db.flush())
+    pool = JobWorkerPool(str(tmp_path / "leads.db"), concurrency=1)
+    pool.start()
+    processes = list(pool._processes)
+    time.sleep(1)
+    pool.stop(timeout=30)
+    assert [process.exitcode for process in processes] == [0]
@@ -0,0 +1,31 @@
+import asyncio
+
+from database import DatabaseManager
+from metrics import load_summaries
+
+
+def run(path, operation):
+    async def _run():
+        async with DatabaseManager(str(path)) as db:
+            return await operation(db)
+    return asyncio.run(_run())
+
+
+def test_session_summaries_are_not_limited_to_the_recent_window(tmp_path):
+    path = tmp_path / "leads.db"
+
+    async def record(db):
+        session_id = await db.create_session("old scrape", 1)
+        await db.save_spans(session_id, [
+            {"name": "detail", "offset": 0.0, "seconds": 2.0, "ok": True, "attrs": {}},
+            {"name": "detail", "offset": 2.0, "seconds": 4.0, "ok": False, "attrs": {}},
+        ])
+        async with db._transaction() as conn:
+            await conn.execute("UPDATE scrape_metrics SET recorded_at = datetime('now', '-3 days')")
+        return session_id
+    session_id = run(path, record)
+
+    assert load_summaries(str(path)) == {}
+    summary = load_summaries(str(path), window_seconds=None, session_id=session_id)["detail"]
+    assert summary["count"] == 2
+    assert summary["total"] == 6.0
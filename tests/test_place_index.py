@@ -0,0 +1,62 @@
+import asyncio
+
+from database import DatabaseManager
+from place_index import PlaceIndex, href_place_key
+
+FID_HREF = "https://www.google.com/maps/place/Blue+Cafe/data=!4m7!3m6!1s0x3bc2c1:0xa1b2!8m2"
+CID_HREF = "https://maps.google.com/?cid=42"
+
+
+def run(path, operation):
+    async def _run():
+        async with DatabaseManager(str(path)) as db:
+            return await operation(db)
+    return asyncio.run(_run())
+
+
+def test_only_links_with_a_maps_id_are_indexed():
+    assert href_place_key(FID_HREF) == "fid:0x3bc2c1:0xa1b2"
+    assert href_place_key(CID_HREF) == "cid:42"
+    assert href_place_key("https://www.google.com/maps/search/cafes") is None
+
+    index = PlaceIndex()
+    index.record("https://www.google.com/maps/search/cafes", "Search")
+    index.record(FID_HREF, "Blue Cafe")
+    assert index.is_known(FID_HREF)
+    assert not index.is_known(CID_HREF)
+    assert len(index) == 1
+    assert index.pop_pending() == [("fid:0x3bc2c1:0xa1b2", FID_HREF, "Blue Cafe")]
+    assert index.pop_pending() == []
+
+
+def test_saved_places_are_known_to_the_next_run(tmp_path):
+    async def runs(db):
+        first = PlaceIndex()
+        first.record(FID_HREF, "Blue Cafe")
+        assert await first.save(db) == 1
+        second = await PlaceIndex.load(db)
+        # Not seen within the last -1 days, so due for a refresh
+        stale = await PlaceIndex.load(db, refresh_days=-1)
+        return second, stale
+
+    second, stale = run(tmp_path / "leads.db", runs)
+    assert second.is_known(FID_HREF)
+    assert not stale.is_known(FID_HREF)
+
+
+def test_known_places_are_linked_to_the_session_that_passed_them_over(tmp_path):
+    async def sessions(db):
+        first = await db.create_session("cafes in pune", 1)
+        await db.insert_business({"Name": "Blue Cafe", "Address": "MG Road", "Email": "hi@blue.in",
+                                  "query": "cafes in pune", "position": 1, "href": FID_HREF}, first)
+        await db.end_session(first)
+        second = await db.create_session("coffee in pune", 1)
+        linked = await db.link_known_places(second, "coffee in pune", [
+            {"href": FID_HREF, "position": 4},
+            {"href": CID_HREF, "position": 5},  # read before but never stored as a business
+        ])
+        return linked, await db.get_businesses_by_session(second)
+
+    linked, rows = run(tmp_path / "leads.db", sessions)
+    assert linked == 1
+    assert [(row["name"], row["position"]) for row in rows] == [("Blue Cafe", 1)]
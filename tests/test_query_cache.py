@@ -0,0 +1,79 @@
+import asyncio
+
+from database import DatabaseManager
+from query_cache import lookup
+
+
+def business(name):
+    return {"Name": name, "Address": "MG Road", "Email": "hi@shop.in", "query": "cafes in pune", "position": 1}
+
+
+def run(path, operation):
+    async def _run():
+        async with DatabaseManager(str(path)) as db:
+            return await operation(db)
+    return asyncio.run(_run())
+
+
+async def age(db, session_id, column, seconds):
+    async with db._transaction() as conn:
+        await conn.execute(f"UPDATE scrape_sessions SET {column} = datetime('now', ?) WHERE id = ?",
+                           (f"-{seconds} seconds", session_id))
+
+
+def test_latest_session_skips_failed_and_empty_sessions(tmp_path):
+    async def scrape(db):
+        found = await db.create_session("Cafes in  Pune", 1)
+        await db.insert_business(business("Blue Cafe"), found)
+        await db.end_session(found)
+        latest = await db.find_latest_session("cafes in pune")
+        failed = await db.create_session("cafes in pune", 1)
+        await db.insert_business(business("Red Cafe"), failed)
+        await db.end_session(failed, status="failed")
+        empty = await db.create_session("cafes in pune", 1)
+        await db.end_session(empty)
+        return found, latest, await db.find_latest_session("cafes in pune"), await db.find_latest_session("tea")
+
+    found, latest, after_failures, other = run(tmp_path / "leads.db", scrape)
+    assert latest["id"] == found
+    assert after_failures["id"] == found
+    assert other is None
+
+
+def test_lookup_serves_fresh_and_revalidates_stale_results(tmp_path):
+    async def lookups(db):
+        miss = await lookup(db, "cafes in pune")
+        session_id = await db.create_session("cafes in pune", 1)
+        await db.insert_business(business("Blue Cafe"), session_id)
+        await db.end_session(session_id)
+        fresh = await lookup(db, "Cafes in Pune", fresh_seconds=600)
+        await age(db, session_id, "end_time", 3600)
+        stale = await lookup(db, "cafes in pune", fresh_seconds=600)
+        again = await lookup(db, "cafes in pune", fresh_seconds=600)
+        return miss, fresh, stale, again
+
+    miss, fresh, stale, again = run(tmp_path / "leads.db", lookups)
+    assert miss["status"] == "miss" and miss["session"] is None
+    assert fresh["status"] == "fresh" and fresh["refresh_job"] is None
+    assert stale["status"] == "stale" and stale["refresh_job"] is not None
+    # The queued refresh is joined rather than queued twice
+    assert again["refresh_job"] is None and again["active_job"] == stale["refresh_job"]
+
+
+def test_only_live_jobs_count_as_active(tmp_path):
+    async def jobs(db):
+        # A batch session: running, but no worker and no heartbeat
+        batch = await db.create_session("cafes in pune", 1)
+        await db.update_session(batch, status="running")
+        no_worker = await db.find_active_job("cafes in pune")
+        job = await db.enqueue_job("cafes in pune")
+        queued = await db.find_active_job("cafes in pune")
+        await db.claim_next_job("worker-1")
+        running = await db.find_active_job("cafes in pune")
+        await age(db, job, "heartbeat_at", 3600)
+        return batch, job, no_worker, queued, running, await db.find_active_job("cafes in pune")
+
+    batch, job, no_worker, queued, running, dead = run(tmp_path / "leads.db", jobs)
+    assert no_worker is None
+    assert queued == running == job
+    assert dead is None
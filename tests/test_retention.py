@@ -0,0 +1,77 @@
+import asyncio
+import gzip
+import json
+
+from database import DatabaseManager
+from retention import purge_expired
+
+
+def run(path, operation):
+    async def _run():
+        async with DatabaseManager(str(path)) as db:
+            return await operation(db)
+    return asyncio.run(_run())
+
+
+async def scrape(db, query, count):
+    session_id = await db.create_session(query, 1)
+    for i in range(count):
+        await db.insert_business({"Name": f"{query} {i}", "Address": "FC Road", "Email": f"hi{i}@x.in",
+                                  "query": query, "position": i}, session_id)
+        await db.insert_skipped_entry({"Position": i, "Name": "x", "Reason": "no email"}, session_id)
+    await db.end_session(session_id)
+    return session_id
+
+
+async def backdate(db, session_id, days):
+    age = (f"-{days} days",)
+    async with db._transaction() as conn:
+        await conn.execute("UPDATE scrape_sessions SET start_time = datetime('now', ?) WHERE id = ?", age + (session_id,))
+        for table, column in [("businesses", "scraped_at"), ("session_businesses", "found_at"),
+                              ("skipped_entries", "skipped_at")]:
+            await conn.execute(f"UPDATE {table} SET {column} = datetime('now', ?) WHERE session_id = ?",
+                               age + (session_id,))
+
+
+def test_expired_rows_are_deleted_in_batches_and_archived(tmp_path):
+    async def purge(db):
+        old = await scrape(db, "old", 25)
+        new = await scrape(db, "new", 5)
+        await backdate(db, old, 40)
+        report = await purge_expired(db, days=30, batch_size=10, archive_dir=str(tmp_path / "archive"), pause=0)
+        return report, await db.get_businesses_by_session(old), await db.get_businesses_by_session(new), \
+            await db.get_session_stats(old)
+
+    report, old_rows, new_rows, old_session = run(tmp_path / "leads.db", purge)
+    assert report["deleted"]["businesses"] == 25
+    assert report["deleted"]["skipped_entries"] == 25
+    assert report["deleted"]["session_businesses"] == 25
+    assert report["deleted"]["scrape_sessions"] == 1
+    assert old_rows == [] and not old_session
+    assert len(new_rows) == 5
+
+    archived = {path.rsplit("/", 1)[-1].split("-")[0]: path for path in report["archives"]}
+    with gzip.open(archived["businesses"], "rt") as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(row["name"] for row in rows) == sorted(f"old {i}" for i in range(25))
+    assert "_rowid" not in rows[0]
+
+
+def test_live_sessions_are_kept_and_dead_running_ones_purged(tmp_path):
+    async def purge(db):
+        live = await db.enqueue_job("live")
+        dead = await db.enqueue_job("dead")
+        queued = await db.enqueue_job("queued")
+        await db.claim_next_job("w1")
+        await db.claim_next_job("w2")
+        async with db._transaction() as conn:
+            await conn.execute("UPDATE scrape_sessions SET start_time = datetime('now', '-40 days')")
+            await conn.execute("UPDATE scrape_sessions SET heartbeat_at = datetime('now', '-2 days') WHERE id = ?",
+                               (dead,))
+        await purge_expired(db, days=30, pause=0)
+        return [await db.get_session_stats(session_id) for session_id in (live, dead, queued)]
+
+    live, dead, queued = run(tmp_path / "leads.db", purge)
+    assert live["status"] == "running"
+    assert not dead
+    assert queued["status"] == "queued"
@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import scraper
+from driver_pool import DriverPool
+from place_index import PlaceIndex, href_place_key
+
+
+class FakeFeed:
+    """A Maps results feed that shows `step` more place cards per scroll"""
+
+    def __init__(self, total=30, step=6, lead_every=6, websites=False):
+        self.total = total
+        self.step = step
+        self.lead_every = lead_every
+        self.websites = websites
+
+
+class FakeDriver:
+    window_handles = ["main"]
+
+    def __init__(self, feed):
+        self.feed = feed
+        self.url = None
+        self.shown = feed.step
+
+    @property
+    def switch_to(self):
+        return self
+
+    def window(self, handle):
+        pass
+
+    def get(self, url):
+        self.url = url
+
+    def find_element(self, *args):
+        return self
+
+    def find_elements(self, *args):
+        return [self] * self.shown
+
+    def execute_async_script(self, script, *args):
+        return self.shown
+
+    def execute_cdp_cmd(self, *args):
+        pass
+
+    def get_log(self, kind):
+        return []
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def execute_script(self, script, *args):
+        if script == "return 1":
+            return 1
+        if "scrollHeight" in script:
+            self.shown = min(self.feed.total, self.shown + self.feed.step)
+            return 100
+        if "cardSelector" in script:
+            return [{"href": href(i), "Name": f"n{i}", "Rating": None} for i in range(self.shown)]
+        if "selectors" in script:
+            i = int(self.url.rsplit("/", 1)[1])
+            time.sleep(0.02)
+            email = f"e{i}@shop.in" if i % self.feed.lead_every == 0 else None
+            website = f"https://shop{i}.in" if self.feed.websites else None
+            return {"Name": f"n{i}", "Address": "a", "Phone": "1", "Website": website, "Email": email}
+
+
+class FakeHarvester:
+    executor = ThreadPoolExecutor(2)
+
+    def submit(self, website):
+        return self.executor.submit(lambda: None)
+
+
+class StuckHarvester:
+    """Email crawls that never finish"""
+
+    def submit(self, website):
+        return Future()
+
+
+def href(i):
+    return f"https://maps/place/data=!1s0x{i:x}:0x1/{i}"
+
+
+def scrape(feed, **kwargs):
+    pool = DriverPool(lambda **_: FakeDriver(feed), size=2, max_size=6)
+    logs = []
+    kwargs.setdefault("harvester", FakeHarvester())
+    try:
+        results = scraper.scrape_google_maps("cafes", logger=logs.append, pool=pool, **kwargs)
+    finally:
+        pool.close()
+    return results, logs
+
+
+def test_known_places_are_passed_over_and_reported():
+    known_places = PlaceIndex(href_place_key(href(i)) for i in range(6))
+    known = []
+    results, logs = scrape(FakeFeed(total=12, lead_every=1), budget_seconds=30, known_places=known_places,
+                           on_known=known.append)
+    assert [card["href"] for card in known] == [href(i) for i in range(6)]
+    assert [card["position"] for card in known] == [1, 2, 3, 4, 5, 6]
+    assert sorted(record["href"] for record in results) == [href(i) for i in range(6, 12)]
+
+
+def test_places_still_waiting_for_an_email_are_not_recorded_as_known():
+    known_places = PlaceIndex()
+    results, logs = scrape(FakeFeed(total=6, lead_every=3, websites=True), budget_seconds=3, known_places=known_places,
+                           harvester=StuckHarvester())
+    recorded = sorted(row[1] for row in known_places.pop_pending())
+    # Only the places with an email on their page were yielded; the rest never got theirs
+    assert recorded == sorted(record["href"] for record in results) == [href(0), href(3)]
+
+
+def test_scrolling_resumes_when_the_first_cards_yield_too_few_leads():
+    # One lead per six cards, well below the budget's prior
+    results, logs = scrape(FakeFeed(lead_every=6), budget_seconds=30, target_leads=3)
+    assert len(results) == 3
+    assert any("Reached the target" in line for line in logs)
+
+
+def test_finishing_below_target_with_budget_left_is_logged():
+    results, logs = scrape(FakeFeed(total=12, lead_every=6), budget_seconds=30, target_leads=3)
+    assert len(results) == 2
+    assert any("2 of 3 target leads" in line and "no more results in the feed" in line for line in logs)
@@ -0,0 +1,53 @@
+import asyncio
+
+from database import DatabaseManager, fts_query
+
+
+def run(path, operation):
+    async def _run():
+        async with DatabaseManager(str(path)) as db:
+            return await operation(db)
+    return asyncio.run(_run())
+
+
+async def store(db, names):
+    session_id = await db.create_session("cafes in pune", 1)
+    for position, name in enumerate(names, start=1):
+        await db.insert_business({"Name": name, "Address": "FC Road, Pune", "Email": f"hi{position}@cafe.in",
+                                  "query": "cafes in pune", "position": position}, session_id)
+    await db.end_session(session_id)
+
+
+def test_fts_query_quotes_every_word_as_a_prefix():
+    assert fts_query('Cafe "OR" NEAR(pune') == '"cafe"* "or"* "near"* "pune"*'
+    assert fts_query(None) == ""
+
+
+def test_search_matches_word_prefixes(tmp_path):
+    async def search(db):
+        await store(db, ["Blue Tokai Coffee", "Tea Villa", "Coffee House"])
+        return (await db.search_businesses("coff"), await db.search_businesses("blue coffee"),
+                await db.search_businesses('pune OR "'))
+
+    prefix, both, operators = run(tmp_path / "leads.db", search)
+    assert sorted(row["name"] for row in prefix["rows"]) == ["Blue Tokai Coffee", "Coffee House"]
+    assert [row["name"] for row in both["rows"]] == ["Blue Tokai Coffee"]
+    # "OR" is searched for as a word, not parsed as an operator
+    assert operators["rows"] == []
+
+
+def test_pages_follow_the_cursor_without_gaps(tmp_path):
+    names = [f"Cafe {i:02d}" for i in range(7)]
+
+    async def pages(db):
+        await store(db, names)
+        seen, cursor = [], None
+        while True:
+            # Every score ties, so the id keeps the pages in insertion order
+            page = await db.search_businesses("cafe", limit=3, cursor=cursor, order="quality")
+            seen.append([row["name"] for row in page["rows"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    assert run(tmp_path / "leads.db", pages) == [names[:3], names[3:6], names[6:]]
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from validation import assess_record, normalize_emails, normalize_phones, quality_score, validate_frame, website_domains
+
+PHONES = ["098765 43210", "98765 43210", "+1 555 123 4567", "0044 20 7946 0958", "919876543210", "2345678"]
+
+
+def leads(**columns):
+    size = len(next(iter(columns.values())))
+    frame = {field: ["x"] * size if field in ("Name", "Address") else [None] * size
+             for field in ("Name", "Address", "Phone", "Website", "Email")}
+    frame.update(columns)
+    return pd.DataFrame(frame)
+
+
+def test_national_numbers_get_the_indian_country_code():
+    assert normalize_phones(pd.Series(PHONES)).tolist() == [
+        "+919876543210", "+919876543210", "+15551234567", "+442079460958", "+919876543210", "+912345678",
+    ]
+
+
+def test_guessed_country_code_is_not_a_valid_phone():
+    checked = validate_frame(leads(Phone=PHONES, Name=[f"n{i}" for i in range(len(PHONES))]))
+    assert checked["phone_guessed"].tolist() == [False, False, False, False, False, True]
+    assert checked["validation_status"].iloc[0] == "partial"
+    assert checked["validation_status"].iloc[-1] == "invalid"
+    assert checked["quality_score"].iloc[-1] < checked["quality_score"].iloc[0]
+
+
+def test_unusable_values_are_missing():
+    assert normalize_phones(pd.Series(["N/A", "", None, "12"])).isna().all()
+    emails = normalize_emails(pd.Series(["logo@2x.png", "me@example.com", "nope", "MAILTO:Info@Shop.in"]))
+    assert emails.isna().tolist() == [True, True, True, False]
+    assert emails.iloc[-1] == "info@shop.in"
+    domains = website_domains(pd.Series(["https://www.shop.in/contact", "localhost", None]))
+    assert domains.isna().tolist() == [False, True, True]
+    assert domains.iloc[0] == "shop.in"
+
+
+def test_duplicates_are_found_across_chunks():
+    seen = set()
+    first = validate_frame(leads(Phone=["098765 43210", "+91 98765 43210"]), seen)
+    second = validate_frame(leads(Phone=["9876543210", "022 2345 6789"]), seen)
+    assert first["is_duplicate"].tolist() == [False, True]
+    assert second["is_duplicate"].tolist() == [True, False]
+    assert second["validation_status"].iloc[0] == "duplicate"
+
+
+def test_scalar_assessment_matches_the_vectorized_one():
+    records = [
+        {"Name": f"Shop {i}", "Address": "MG Road", "Phone": phone, "Website": website, "Email": email}
+        for i, phone in enumerate(PHONES + [None, "N/A"])
+        for website, email in [("https://shop.in", "info@shop.in"), (None, "logo@2x.png"), ("nope", None)]
+    ]
+    checked = validate_frame(pd.DataFrame(records))
+    # One record at a time cannot be a duplicate, so compare rows that are not
+    scalar = [assess_record(record) for record, duplicate in zip(records, checked["is_duplicate"]) if not duplicate]
+    vectorized = checked[~checked["is_duplicate"]]
+    assert [score for score, _ in scalar] == vectorized["quality_score"].tolist()
+    assert [status for _, status in scalar] == vectorized["validation_status"].tolist()
+    assert [quality_score(record) for record in records] == checked["quality_score"].tolist()
@@ -0,0 +1,180 @@
+"""
+Event-driven waits for the Google Maps scraper
+
+Each wait returns as soon as the page is ready instead of sleeping for a
+fixed time, but never sooner than a small random jitter floor so request
+pacing stays polite. Every wait's real duration is recorded in WaitStats
+for tuning.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+JITTER_FLOOR_SECONDS: Tuple[float, float] = (0.25, 0.75)
+POLL_SECONDS = 0.1
+NETWORK_IDLE_SECONDS = 0.5
+NETWORK_IDLE_MAX_INFLIGHT = 2  # long-poll and beacon requests may never finish
+
+# Resolves with the feed's card count once it exceeds `previous`, or with
+# the unchanged count after `timeoutMs`.
+_FEED_GROWTH_JS = """
+const [feed, selector, previous, timeoutMs, done] = arguments;
+const count = () => feed.querySelectorAll(selector).length;
+if (count() > previous) { done(count()); return; }
+let timer = null;
+const observer = new MutationObserver(() => {
+    if (count() > previous) {
+        observer.disconnect();
+        clearTimeout(timer);
+        done(count());
+    }
+});
+observer.observe(feed, {childList: true, subtree: true});
+timer = setTimeout(() => { observer.disconnect(); done(count()); }, timeoutMs);
+"""
+
+
+class WaitStats:
+    """Durations of every wait, grouped by name. Safe to share between threads."""
+
+    def __init__(self):
+        self._durations: Dict[str, List[float]] = {}
+        self._timeouts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, satisfied: bool = True):
+        with self._lock:
+            self._durations.setdefault(name, []).append(seconds)
+            if not satisfied:
+                self._timeouts[name] = self._timeouts.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Per-name count, timeouts, mean, p50, p95 and max seconds"""
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items()}
+            timeouts = dict(self._timeouts)
+        return {
+            name: {
+                "count": len(values),
+                "timeouts": timeouts.get(name, 0),
+                "mean": sum(values) / len(values),
+                "p50": values[(len(values) - 1) // 2],
+                "p95": values[max(0, int(round(0.95 * len(values))) - 1)],
+                "max": values[-1],
+            }
+            for name, values in durations.items()
+        }
+
+    def summary(self) -> str:
+        parts = [
+            f"{name} n={s['count']} p50={s['p50']:.2f}s p95={s['p95']:.2f}s timeouts={s['timeouts']}"
+            for name, s in sorted(self.snapshot().items())
+        ]
+        return "⏱️ Waits: " + ("; ".join(parts) if parts else "none")
+
+
+def _finish(name: str, start: float, satisfied: bool, stats: Optional[WaitStats],
+            jitter_floor: Optional[Tuple[float, float]]):
+    """Pad the wait up to a random floor, then record how long it took"""
+    if jitter_floor:
+        remaining = random.uniform(*jitter_floor) - (time.time() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+    if stats is not None:
+        stats.record(name, time.time() - start, satisfied)
+
+
+def wait_for(
+    driver,
+    condition: Callable,
+    timeout: float,
+    name: str,
+    stats: Optional[WaitStats] = None,
+    jitter_floor: Optional[Tuple[float, float]] = JITTER_FLOOR_SECONDS,
+    required: bool = False,
+):
+    """WebDriverWait on `condition`; returns its value, or None on timeout unless required"""
+    start = time.time()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=POLL_SECONDS).until(condition)
+    except TimeoutException as e:
+        _finish(name, start, False, stats, jitter_floor)
+        if required:
+            # Named, so a failed job's error says which wait gave up
+            raise TimeoutException(f"Timed out after {timeout:.0f}s waiting for {name}") from e
+        return None
+    _finish(name, start, True, stats, jitter_floor)
+    return result
+
+
+def wait_for_feed_growth(
+    driver,
+    feed,
+    card_selector: str,
+    previous_count: int,
+    timeout: float,
+    stats: Optional[WaitStats] = None,
+    jitter_floor: Optional[Tuple[float, float]] = JITTER_FLOOR_SECONDS,
+) -> int:
+    """Block until the feed holds more than previous_count cards; returns the new count"""
+    start = time.time()
+    try:
+        count = driver.execute_async_script(
+            _FEED_GROWTH_JS, feed, card_selector, previous_count, int(timeout * 1000)
+        )
+    except TimeoutException:
+        count = previous_count
+    _finish("feed_growth", start, count > previous_count, stats, jitter_floor)
+    return count
+
+
+def wait_for_network_idle(
+    driver,
+    timeout: float,
+    name: str = "network_idle",
+    idle_seconds: float = NETWORK_IDLE_SECONDS,
+    max_inflight: int = NETWORK_IDLE_MAX_INFLIGHT,
+    network=None,
+    stats: Optional[WaitStats] = None,
+    jitter_floor: Optional[Tuple[float, float]] = JITTER_FLOOR_SECONDS,
+) -> bool:
+    """Block until at most max_inflight requests are open and nothing changed for idle_seconds
+
+    Reads CDP Network events from Chrome's performance log, which this
+    drains; pass the scrape's NetworkStats as `network` so they still count.
+    Without the log it falls back to returning after the jitter floor.
+    """
+    start = last_activity = time.time()
+    inflight = set()
+    satisfied = False
+    while True:
+        try:
+            messages = [entry["message"] for entry in driver.get_log("performance")]
+        except Exception:
+            break
+        if network is not None:
+            network.add_events(messages)
+        for message in messages:
+            if "Network.requestWillBeSent" in message:
+                inflight.add(json.loads(message)["message"]["params"]["requestId"])
+                last_activity = time.time()
+            elif "Network.loadingFinished" in message or "Network.loadingFailed" in message:
+                inflight.discard(json.loads(message)["message"]["params"]["requestId"])
+                last_activity = time.time()
+        now = time.time()
+        if len(inflight) <= max_inflight and now - last_activity >= idle_seconds:
+            satisfied = True
+            break
+        if now - start >= timeout:
+            break
+        time.sleep(POLL_SECONDS)
+    _finish(name, start, satisfied, stats, jitter_floor)
+    return satisfied